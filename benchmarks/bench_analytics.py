@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /summary data loading, SQLite SUM/GROUP BY vs the NumPy analytics cache.
+
+Seeds users with growing transaction histories and measures, for each
+/summary period, the median latency of the two SQL queries against a lookup
+in the user's warm running totals. Also reports the one-off load time and
+the memory each cached user takes.
+
+Usage: python -m benchmarks.bench_analytics [--txns 1000,10000,100000] [--repeat N]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.seed import seed_database
+from database.db_operations import DatabaseOperations
+from utils.analytics_cache import AnalyticsCache
+
+def periods():
+    """The whole-day ranges /summary asks for."""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    end = today + timedelta(days=1, seconds=-1)
+    return {
+        'today': (today, end),
+        'week': (today - timedelta(days=today.weekday()), end),
+        'month': (today.replace(day=1), end),
+        'year': (today.replace(month=1, day=1), end)
+    }
+
+async def sql(ops: DatabaseOperations, cache: AnalyticsCache, user_id: int, start, end):
+    spending = await ops.get_spending_by_category(user_id, start, end, 'USD')
+    sum(spending.values())
+
+async def cached(ops: DatabaseOperations, cache: AnalyticsCache, user_id: int, start, end):
+    spending = await cache.spending_by_category(user_id, start, end, 'USD')
+    sum(spending.values())
+
+async def measure(func, ops, cache, user_id: int, start, end, repeat: int) -> float:
+    """Return the median latency in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        await func(ops, cache, user_id, start, end)
+        samples.append((time.perf_counter() - began) * 1000)
+    return statistics.median(samples)
+
+async def run(tmp: str, txn_counts, repeat: int):
+    rows = []
+    for txns in txn_counts:
+        db_path = os.path.join(tmp, f'analytics-{txns}.db')
+        seed_database(db_path, users=1, txns_per_user=txns, budgets_per_user=0)
+        ops = DatabaseOperations(db_path)
+        cache = AnalyticsCache()
+        cache.attach(ops)
+        
+        start, end = periods()['month']
+        began = time.perf_counter()
+        await cache.spending_by_category(1, start, end, 'USD')
+        load_ms = (time.perf_counter() - began) * 1000
+        size = cache.stats()['size_bytes']
+        
+        for period, (start, end) in periods().items():
+            rows.append((
+                txns, period,
+                await measure(sql, ops, cache, 1, start, end, repeat),
+                await measure(cached, ops, cache, 1, start, end, repeat),
+                load_ms, size
+            ))
+        ops.close()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--txns', default='1000,10000,100000', help='comma-separated transactions per user')
+    parser.add_argument('--repeat', type=int, default=50, help='samples per measurement')
+    args = parser.parse_args()
+    txn_counts = [int(n) for n in args.txns.split(',')]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = asyncio.run(run(tmp, txn_counts, args.repeat))
+    
+    print(f"{'txns':>8} {'period':>6} {'sql ms':>8} {'cache ms':>9} {'speedup':>8} {'load ms':>8} {'cached KiB':>11}")
+    for txns, period, sql_ms, cache_ms, load_ms, size in rows:
+        print(f"{txns:>8} {period:>6} {sql_ms:>8.3f} {cache_ms:>9.3f} {sql_ms / cache_ms:>7.1f}x "
+              f"{load_ms:>8.1f} {size / 1024:>11.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /viewbudgets data loading, N+1 lookups vs get_budget_status.
+
+For a growing number of budgets, measures the latency of fetching every
+budget together with its month-to-date spending.
+
+Usage: python -m benchmarks.bench_budget_status [--budgets 1,5,10,20,50] [--repeat N]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db_setup import create_tables
+from database.db_operations import DatabaseOperations, current_year_month
+
+async def n_plus_one(ops: DatabaseOperations, user_id: int):
+    """The previous handler flow: one spending lookup per budget."""
+    budgets = await ops.get_budgets(user_id)
+    for budget in budgets:
+        budget['spent'] = await ops.get_current_month_spending_by_category(user_id, budget['category'])
+    return budgets
+
+async def single_query(ops: DatabaseOperations, user_id: int):
+    """The current handler flow: one LEFT JOIN over budgets and the rollup."""
+    return await ops.get_budget_status(user_id, current_year_month())
+
+async def measure(ops: DatabaseOperations, func, user_id: int, repeat: int) -> float:
+    """Return the median latency in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func(ops, user_id)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+async def run(db_path: str, budget_counts, repeat: int):
+    ops = DatabaseOperations(db_path)
+    rows = []
+    for user_id, count in enumerate(budget_counts, start=1):
+        await ops.add_user(user_id, 'USD')
+        for i in range(count):
+            category = f'#cat{i}'
+            await ops.set_budget(user_id, category, 100000)
+            await ops.log_expense(user_id, 1000 + 100 * i, category)
+        rows.append((
+            count,
+            await measure(ops, n_plus_one, user_id, repeat),
+            await measure(ops, single_query, user_id, repeat)
+        ))
+    ops.close()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budgets', default='1,5,10,20,50', help='comma-separated budget counts')
+    parser.add_argument('--repeat', type=int, default=200, help='samples per measurement')
+    args = parser.parse_args()
+    budget_counts = [int(n) for n in args.budgets.split(',')]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'budgets.db')
+        create_tables(db_path)
+        rows = asyncio.run(run(db_path, budget_counts, args.repeat))
+    
+    print(f"{'budgets':>8} {'N+1 (ms)':>10} {'single (ms)':>12} {'speedup':>8}")
+    for count, old, new in rows:
+        print(f"{count:>8} {old:>10.3f} {new:>12.3f} {old / new:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark: a year's /summary over mixed-currency history.
+
+Seeds one user whose transactions are spread over several currencies and
+measures three ways to get the year's spending per category in the user's
+reporting currency: SQLite GROUP BY (category, currency) with the group
+sums converted in Python, fetching every row and converting it one by one,
+and the NumPy analytics cache. The first and last must agree exactly.
+
+Usage: python -m benchmarks.bench_currency [--txns 100000] [--currencies USD,EUR,GBP,JPY] [--repeat N]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.seed import seed_database
+from database.db_operations import DatabaseOperations
+from utils.analytics_cache import AnalyticsCache
+from utils.money import conversion_factor
+
+RATES = {'USD': 1.0, 'EUR': 0.92, 'GBP': 0.79, 'JPY': 151.6, 'INR': 83.4, 'CAD': 1.37, 'AUD': 1.52}
+
+ROWS_QUERY = '''
+    SELECT category, currency, amount FROM transactions
+    WHERE user_id = ? AND ts BETWEEN ? AND ?
+'''
+
+def year_range():
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return today.replace(month=1, day=1), today + timedelta(days=1, seconds=-1)
+
+async def grouped(ops: DatabaseOperations, cache: AnalyticsCache, currency: str, start, end):
+    return await ops.get_spending_by_category(1, start, end, currency)
+
+async def row_by_row(ops: DatabaseOperations, cache: AnalyticsCache, currency: str, start, end):
+    rows = await ops.execute_query(ROWS_QUERY, (1, int(start.timestamp()), int(end.timestamp())), fetch_all=True)
+    rates = await ops.get_exchange_rates()
+    spending = {}
+    for category, row_currency, amount in rows:
+        spending[category] = spending.get(category, 0) + amount * conversion_factor(row_currency, currency, rates)
+    return {category: round(total) for category, total in spending.items()}
+
+async def cached(ops: DatabaseOperations, cache: AnalyticsCache, currency: str, start, end):
+    return await cache.spending_by_category(1, start, end, currency)
+
+async def measure(func, ops, cache, currency: str, start, end, repeat: int) -> float:
+    """Return the median latency in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        await func(ops, cache, currency, start, end)
+        samples.append((time.perf_counter() - began) * 1000)
+    return statistics.median(samples)
+
+async def run(db_path: str, txns: int, currencies, repeat: int):
+    seed_database(db_path, users=1, txns_per_user=txns, budgets_per_user=0, currencies=currencies)
+    ops = DatabaseOperations(db_path)
+    await ops.set_exchange_rates({currency: RATES.get(currency, 1.0) for currency in currencies})
+    cache = AnalyticsCache()
+    cache.attach(ops)
+    start, end = year_range()
+    currency = currencies[0]
+    
+    exact = await grouped(ops, cache, currency, start, end)
+    assert await cached(ops, cache, currency, start, end) == exact
+    # Row-by-row float sums can drift from the exact group sums by a unit or so
+    drift = max(abs(total - exact.get(category, 0))
+                for category, total in (await row_by_row(ops, cache, currency, start, end)).items())
+    groups = len(await ops.execute_query(
+        "SELECT DISTINCT category, currency FROM transactions WHERE user_id = 1", fetch_all=True))
+    
+    results = [(name, await measure(func, ops, cache, currency, start, end, repeat))
+               for name, func in (('group by + convert', grouped), ('row by row', row_by_row), ('numpy cache', cached))]
+    ops.close()
+    return results, groups, drift
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--txns', type=int, default=100_000, help='transactions for the user')
+    parser.add_argument('--currencies', default='USD,EUR,GBP,JPY', help='comma-separated, reporting currency first')
+    parser.add_argument('--repeat', type=int, default=10, help='samples per measurement')
+    args = parser.parse_args()
+    currencies = [code.strip().upper() for code in args.currencies.split(',')]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        results, groups, drift = asyncio.run(run(os.path.join(tmp, 'currency.db'), args.txns, currencies, args.repeat))
+    
+    print(f"{args.txns} transactions in {len(currencies)} currencies, {groups} (category, currency) groups; "
+          f"row-by-row drift up to {drift} minor units")
+    baseline = results[0][1]
+    print(f"{'method':>20} {'ms':>9} {'vs group by':>12}")
+    for name, ms in results:
+        print(f"{name:>20} {ms:>9.2f} {baseline / ms:>11.1f}x")
+
+if __name__ == '__main__':
+    main()
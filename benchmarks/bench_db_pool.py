@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: connect-per-query vs pooled connections in DatabaseOperations.
+
+Replays the queries behind a single /log (user lookup, insert, budget lookup,
+month spending) and reports queries per second for both strategies.
+
+Usage: python -m benchmarks.bench_db_pool [--logs N] [--concurrency C]
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db_setup import create_tables
+from database.db_operations import DatabaseOperations
+
+QUERIES_PER_LOG = 4
+
+class ConnectPerQueryOperations(DatabaseOperations):
+    """The original strategy: a fresh connection and commit for every statement."""
+    
+    async def execute_query(self, query: str, params: tuple = (), fetch_one: bool = False, fetch_all: bool = False):
+        def _execute():
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, params)
+                if fetch_one:
+                    result = cursor.fetchone()
+                elif fetch_all:
+                    result = cursor.fetchall()
+                else:
+                    result = cursor.rowcount
+                conn.commit()
+                return result
+            finally:
+                conn.close()
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, _execute)
+
+async def simulate_log(ops: DatabaseOperations, user_id: int):
+    """Issue the same queries as one /log command."""
+    await ops.get_user(user_id)
+    await ops.log_expense(user_id, 4200, '#food', 'benchmark')
+    await ops.get_budget_for_category(user_id, '#food')
+    await ops.get_current_month_spending_by_category(user_id, '#food')
+
+async def run(ops: DatabaseOperations, logs: int, concurrency: int, users: int) -> float:
+    """Run the workload and return queries per second."""
+    for user_id in range(users):
+        await ops.add_user(user_id, 'USD')
+        await ops.set_budget(user_id, '#food', 500000)
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one(i: int):
+        async with semaphore:
+            await simulate_log(ops, i % users)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(logs)))
+    elapsed = time.perf_counter() - start
+    return logs * QUERIES_PER_LOG / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logs', type=int, default=2000, help='number of simulated /log commands')
+    parser.add_argument('--concurrency', type=int, default=8, help='commands in flight at once')
+    parser.add_argument('--users', type=int, default=100, help='distinct users')
+    args = parser.parse_args()
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, cls in (('connect-per-query', ConnectPerQueryOperations), ('pooled', DatabaseOperations)):
+            db_path = os.path.join(tmp, f'{name}.db')
+            create_tables(db_path)
+            ops = cls(db_path)
+            results[name] = asyncio.run(run(ops, args.logs, args.concurrency, args.users))
+            ops.close()
+    
+    print(f"{'strategy':<20} {'queries/sec':>12}")
+    for name, qps in results.items():
+        print(f"{name:<20} {qps:>12.0f}")
+    print(f"speedup: {results['pooled'] / results['connect-per-query']:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streaming /export throughput and peak memory.
+
+Seeds one user with many transactions, streams them through the same path
+as /export (fetchmany -> incremental encoding -> gzip -> spooled temp file)
+and reports rows per second and peak RSS growth.
+
+Pages of the database file mapped through mmap_size count toward RSS, so run
+with DB_MMAP_SIZE=0 to see the export's own memory, which stays flat as rows
+grow (bounded by one fetchmany batch, the page cache and the 1 MB spool).
+
+Usage: python -m benchmarks.bench_export [--rows N] [--format csv|jsonl]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db_setup import create_tables
+from database.db_operations import DatabaseOperations
+from utils.exporter import TransactionExportWriter
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def seed(db_path: str, user_id: int, rows: int):
+    """Insert synthetic transactions directly, spread over two years."""
+    conn = sqlite3.connect(db_path)
+    categories = ['#food', '#transport', '#bills', '#coffee', '#shopping', '#health']
+    with conn:
+        conn.execute("INSERT INTO users (user_id, currency) VALUES (?, 'USD')", (user_id,))
+        conn.executemany(
+            "INSERT INTO transactions (user_id, amount, category, description, transaction_date) VALUES (?, ?, ?, ?, ?)",
+            (
+                (user_id, random.randint(100, 50000), random.choice(categories), f'purchase {i}',
+                 f'202{3 + i % 2}-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:00:00')
+                for i in range(rows)
+            )
+        )
+    conn.close()
+
+async def export(db_path: str, user_id: int, fmt: str):
+    ops = DatabaseOperations(db_path)
+    writer = TransactionExportWriter(fmt)
+    start = time.perf_counter()
+    exported = await ops.export_transactions(user_id, writer.write_rows)
+    export_file = writer.finish()
+    elapsed = time.perf_counter() - start
+    size = export_file.seek(0, 2)
+    writer.file.close()
+    ops.close()
+    return exported, elapsed, size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000, help='transactions for the exported user')
+    parser.add_argument('--format', default='csv', choices=['csv', 'jsonl'])
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'export.db')
+        create_tables(db_path)
+        seed(db_path, 1, args.rows)
+        
+        baseline_mb = peak_rss_mb()
+        exported, elapsed, size = asyncio.run(export(db_path, 1, args.format))
+        peak_mb = peak_rss_mb()
+    
+    print(f"rows exported:   {exported}")
+    print(f"rows/sec:        {exported / elapsed:,.0f}")
+    print(f"gzip size:       {size / 1024 / 1024:.2f} MB")
+    print(f"peak RSS:        {peak_mb:.1f} MB (+{peak_mb - baseline_mb:.1f} MB during export)")
+
+if __name__ == '__main__':
+    main()
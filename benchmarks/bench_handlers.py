@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Benchmark: end-to-end handler latency against a seeded database.
+
+Seeds a temporary SQLite file with synthetic users and transactions, then
+drives /log (single and ten per message), /listhistory, /viewbudgets and /summary through stub Update and
+Context objects exactly as CommandHandler would call them. Reports p50, p95
+and p99 latency and throughput per handler, optionally writes the results as
+JSON, and can compare a run against a saved baseline to flag regressions.
+
+Usage: python -m benchmarks.bench_handlers [--users N] [--txns N] [--iterations N]
+       [--concurrency N] [--output results.json] [--compare baseline.json] [--threshold 0.20]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.seed import seed_database, CATEGORIES
+from benchmarks.stubs import make_update
+from database.db_operations import db_ops
+from utils.chart_cache import chart_cache
+from utils.chart_service import chart_service
+from handlers.expenses import log_expense_command, list_history_command
+from handlers.budgets import view_budgets_command
+from handlers.reports import summary_command
+
+def log_text(rng: random.Random) -> str:
+    return f"/log {rng.uniform(1, 300):.2f} on {rng.choice(CATEGORIES)} for bench"
+
+def log_batch_text(rng: random.Random) -> str:
+    """A day's receipts in one message, one expense per line."""
+    return "/log " + "\n".join(f"{rng.uniform(1, 300):.2f} on {rng.choice(CATEGORIES)} for bench" for _ in range(10))
+
+SCENARIOS = {
+    'log': (log_expense_command, log_text),
+    'log10': (log_expense_command, log_batch_text),
+    'listhistory': (list_history_command, lambda rng: '/listhistory'),
+    'viewbudgets': (view_budgets_command, lambda rng: '/viewbudgets'),
+    'summary': (summary_command, lambda rng: '/summary'),
+}
+
+def percentile(samples, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(samples)))
+    return samples[min(rank, len(samples)) - 1]
+
+async def run_scenario(handler, make_text, users: int, iterations: int, concurrency: int,
+                       rng: random.Random) -> dict:
+    """Call one handler `iterations` times for random users, `concurrency` at a time."""
+    samples = []
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one_call():
+        nonlocal failures
+        update, context = make_update(rng.randint(1, users), make_text(rng))
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(update, context)
+            samples.append((time.perf_counter() - start) * 1000)
+        if not update.message.replies and not update.message.photos:
+            failures += 1
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(iterations)))
+    elapsed = time.perf_counter() - started
+    
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'no_reply': failures,
+        'p50_ms': percentile(samples, 50),
+        'p95_ms': percentile(samples, 95),
+        'p99_ms': percentile(samples, 99),
+        'max_ms': samples[-1],
+        'throughput_per_sec': iterations / elapsed if elapsed else 0.0,
+    }
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    results = {}
+    for name in args.handlers:
+        handler, make_text = SCENARIOS[name]
+        # One untimed pass per handler so lazy imports and worker start-up are not measured
+        await run_scenario(handler, make_text, args.users, min(args.warmup, args.iterations), 1, rng)
+        results[name] = await run_scenario(handler, make_text, args.users, args.iterations,
+                                           args.concurrency, rng)
+    await db_ops.flush()
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """Return (handler, metric, baseline, current, change) for every metric that got worse."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('handlers', {}).get(name)
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if previous[metric] > 0 and current[metric] > previous[metric] * (1 + threshold):
+                change = current[metric] / previous[metric] - 1
+                regressions.append((name, metric, previous[metric], current[metric], change))
+        if current['throughput_per_sec'] < previous['throughput_per_sec'] * (1 - threshold):
+            change = current['throughput_per_sec'] / previous['throughput_per_sec'] - 1
+            regressions.append((name, 'throughput_per_sec', previous['throughput_per_sec'],
+                                current['throughput_per_sec'], change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000, help='synthetic users to seed')
+    parser.add_argument('--txns', type=int, default=100, help='transactions seeded per user')
+    parser.add_argument('--iterations', type=int, default=500, help='timed calls per handler')
+    parser.add_argument('--warmup', type=int, default=20, help='untimed calls per handler')
+    parser.add_argument('--concurrency', type=int, default=1, help='handler calls in flight at once')
+    parser.add_argument('--handlers', default=','.join(SCENARIOS), help='comma-separated handlers to run')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for data and users')
+    parser.add_argument('--db', help='reuse an existing seeded database instead of a temporary one')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON from an earlier --output run')
+    parser.add_argument('--threshold', type=float, default=0.20,
+                        help='relative slowdown that counts as a regression (default 0.20)')
+    args = parser.parse_args()
+    args.handlers = [name.strip() for name in args.handlers.split(',') if name.strip()]
+    unknown = set(args.handlers) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown handlers: {', '.join(sorted(unknown))}")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, 'handlers.db')
+        if not args.db or not os.path.exists(args.db):
+            start = time.perf_counter()
+            seed_database(db_path, args.users, args.txns, seed=args.seed)
+            print(f"Seeded {args.users:,} users x {args.txns:,} transactions in {time.perf_counter() - start:.1f}s")
+        
+        db_ops.db_path = db_path
+        chart_cache.attach(db_ops)
+        try:
+            results = asyncio.run(run(args))
+        finally:
+            db_ops.close()
+            chart_service.close()
+    
+    print(f"{'handler':<12} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'ops/sec':>9} {'no reply':>9}")
+    for name, r in results.items():
+        print(f"{name:<12} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+              f"{r['throughput_per_sec']:>9.1f} {r['no_reply']:>9}")
+    
+    report = {
+        'params': {key: getattr(args, key) for key in ('users', 'txns', 'iterations', 'concurrency', 'seed')},
+        'python': platform.python_version(),
+        'handlers': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for name, metric, old, new, change in regressions:
+                print(f"  {name:<12} {metric:<20} {old:>10.2f} -> {new:>10.2f} ({change:+.1%})")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.compare}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark: amounts as REAL currency units vs INTEGER minor units.
+
+Fills two otherwise identical tables with the same synthetic amounts, one
+storing 12.34 as a REAL and one storing 1234 as an INTEGER, each with the
+covering index reports use. Compares their size on disk, a full-table SUM,
+per-user category breakdowns, and how far the REAL sum drifts from the
+exact total.
+
+Usage: python -m benchmarks.bench_money [--rows N] [--users N] [--repeat N]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = 10
+
+def build(conn: sqlite3.Connection, rows: int, users: int):
+    """Create amounts_int with random cents and amounts_real with the same values in whole units."""
+    for table, column_type in (('amounts_int', 'INTEGER'), ('amounts_real', 'REAL')):
+        conn.execute(f'''
+            CREATE TABLE {table} (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                amount {column_type} NOT NULL
+            )
+        ''')
+    with conn:
+        conn.execute(f'''
+            INSERT INTO amounts_int (id, user_id, category, amount)
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {rows})
+            SELECT i, i % {users}, '#c' || (abs(random()) % {CATEGORIES}), 100 + abs(random()) % 29901 FROM n
+        ''')
+        conn.execute("INSERT INTO amounts_real SELECT id, user_id, category, amount / 100.0 FROM amounts_int")
+    for table in ('amounts_int', 'amounts_real'):
+        conn.execute(f"CREATE INDEX idx_{table} ON {table} (user_id, category, amount)")
+    conn.execute("ANALYZE")
+
+def sizes(conn: sqlite3.Connection) -> dict:
+    return dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall())
+
+def timed(conn: sqlite3.Connection, query: str, params=(), repeat: int = 5) -> tuple:
+    """Median milliseconds over repeat runs, and the last result."""
+    samples = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        result = conn.execute(query, params).fetchall()
+        samples.append((time.perf_counter() - began) * 1000)
+    return statistics.median(samples), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000_000, help='rows in each table')
+    parser.add_argument('--users', type=int, default=10_000, help='distinct users the rows are spread over')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'money.db'))
+        began = time.perf_counter()
+        build(conn, args.rows, args.users)
+        print(f"🗄️ Built 2 x {args.rows:,} rows in {time.perf_counter() - began:.1f}s")
+        
+        size = sizes(conn)
+        sample_users = random.Random(1).sample(range(args.users), min(200, args.users))
+        results = {}
+        for table, kind in (('amounts_int', 'INTEGER'), ('amounts_real', 'REAL')):
+            # Scanning the table itself, not the smaller index, like any report that also needs other columns
+            full_ms, full = timed(conn, f"SELECT SUM(amount) FROM {table} NOT INDEXED", repeat=args.repeat)
+            per_user = []
+            for user_id in sample_users:
+                began = time.perf_counter()
+                conn.execute(f"SELECT category, SUM(amount) FROM {table} WHERE user_id = ? GROUP BY category",
+                             (user_id,)).fetchall()
+                per_user.append((time.perf_counter() - began) * 1000)
+            results[kind] = {
+                'table_kib': size[table] / 1024,
+                'index_kib': size[f'idx_{table}'] / 1024,
+                'sum_ms': full_ms,
+                'user_ms': statistics.median(per_user),
+                'total': full[0][0]
+            }
+        conn.close()
+    
+    print(f"{'column':>8} {'table KiB':>11} {'index KiB':>11} {'SUM ms':>9} {'per-user ms':>12}")
+    for kind, r in results.items():
+        print(f"{kind:>8} {r['table_kib']:>11,.0f} {r['index_kib']:>11,.0f} {r['sum_ms']:>9.1f} {r['user_ms']:>12.3f}")
+    integer, real = results['INTEGER'], results['REAL']
+    saved = 1 - (integer['table_kib'] + integer['index_kib']) / (real['table_kib'] + real['index_kib'])
+    print(f"📏 INTEGER is {saved:.0%} smaller and sums {real['sum_ms'] / integer['sum_ms']:.2f}x as fast")
+    exact = integer['total']
+    print(f"🎯 Exact total {exact // 100:,}.{exact % 100:02d}; the REAL sum is {real['total']!r}, "
+          f"off by {abs(real['total'] - exact / 100):.2e}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: update throughput as the number of sharded worker processes grows.
+
+Starts the dispatcher with 1, 2, 4... workers, each running the real
+handlers against its own SQLite shard and replying through a local fake Bot
+API, then routes interleaved /log updates from many users to them. Checks
+afterwards that every user's expenses landed in exactly one shard, in the
+order they were sent. Throughput only scales up to the number of CPU cores.
+
+Usage: python -m benchmarks.bench_sharding [--users N] [--per-user N] [--latency-ms MS] [--workers 1,2,4]
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_bot_api import FakeBotAPI, command_update
+from database.db_setup import create_tables
+from database.sharding import shard_for_user, shard_paths
+from utils.dispatcher import ShardedDispatcher
+
+def seed_users(db_path: str, workers: int, users: int):
+    """Create every shard of the layout and register each user in the shard that owns them."""
+    paths = shard_paths(db_path, workers)
+    for path in paths:
+        create_tables(path)
+    for user_id in range(1, users + 1):
+        conn = sqlite3.connect(paths[shard_for_user(user_id, workers)])
+        conn.execute("INSERT INTO users (user_id, currency) VALUES (?, 'USD')", (user_id,))
+        conn.commit()
+        conn.close()
+
+def check_shards(db_path: str, workers: int, total: int) -> bool:
+    """Every expense stored once, each user in their own shard only, in the order sent."""
+    seen = {}
+    stored = 0
+    for index, path in enumerate(shard_paths(db_path, workers)):
+        conn = sqlite3.connect(path)
+        rows = conn.execute("SELECT user_id, amount FROM transactions ORDER BY id").fetchall()
+        conn.close()
+        stored += len(rows)
+        amounts = {}
+        for user_id, amount in rows:
+            if shard_for_user(user_id, workers) != index:
+                return False
+            amounts.setdefault(user_id, []).append(amount)
+        for user_id, sequence in amounts.items():
+            if user_id in seen or sequence != sorted(sequence):
+                return False
+            seen[user_id] = sequence
+    return stored == total
+
+def run_workers(api: FakeBotAPI, workers: int, users: int, per_user: int, tmp: str, timeout: float = 300) -> dict:
+    """Route users x per_user /log updates through a fresh set of workers and time until every reply is sent."""
+    db_path = os.path.join(tmp, f'sharding-{workers}.db')
+    seed_users(db_path, workers, users)
+    dispatcher = ShardedDispatcher(workers, '123:fake', base_url=api.base_url, db_path=db_path).start()
+    api.sent.clear()
+    
+    total = users * per_user
+    start = time.perf_counter()
+    update_id = 0
+    try:
+        # Interleave users the way real traffic arrives
+        for seq in range(1, per_user + 1):
+            for user_id in range(1, users + 1):
+                update_id += 1
+                dispatcher.submit(dispatcher.route(user_id), command_update(update_id, user_id, f"/log {seq} on #bench"))
+        
+        deadline = time.perf_counter() + timeout
+        while len(api.sent) < total and time.perf_counter() < deadline:
+            time.sleep(0.005)
+        elapsed = time.perf_counter() - start
+    finally:
+        dispatcher.stop()
+    
+    return {
+        'workers': workers,
+        'updates': total,
+        'replied': len(api.sent),
+        'seconds': elapsed,
+        'updates_per_sec': len(api.sent) / elapsed if elapsed else 0.0,
+        'per_worker': dispatcher.dispatched,
+        'consistent': check_shards(db_path, workers, total)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200, help='users sending updates')
+    parser.add_argument('--per-user', type=int, default=10, help='/log updates per user')
+    parser.add_argument('--latency-ms', type=float, default=5, help='simulated Bot API round trip per reply')
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated worker process counts')
+    args = parser.parse_args()
+    args.workers = [int(n) for n in args.workers.split(',')]
+    # One INFO line per Bot API request would swamp the results
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    # Workers read config from the environment; every user sends far more than the rate limit allows
+    os.environ['RATE_LIMIT_ENABLED'] = 'false'
+    
+    print(f"🖥️ {os.cpu_count()} CPU cores available")
+    api = FakeBotAPI(latency_ms=args.latency_ms).start()
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for workers in args.workers:
+                results.append(run_workers(api, workers, args.users, args.per_user, tmp))
+    finally:
+        api.stop()
+    
+    baseline = results[0]['updates_per_sec']
+    print(f"{'workers':>7} {'updates':>8} {'seconds':>8} {'updates/s':>10} {'speedup':>8} {'shards':>10}  per worker")
+    for r in results:
+        print(f"{r['workers']:>7} {r['replied']:>8} {r['seconds']:>8.2f} {r['updates_per_sec']:>10.1f} "
+              f"{r['updates_per_sec'] / baseline:>7.1f}x {'ok' if r['consistent'] else 'BROKEN':>10}  "
+              f"{'/'.join(str(n) for n in r['per_worker'])}")
+    if not all(r['consistent'] for r in results):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
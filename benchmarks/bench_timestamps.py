@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark: text transaction_date vs integer epoch ts, and the online backfill between them.
+
+Builds a database the way it looked before migration 5, with every date
+stored as text, upgrades it, and measures /summary-style range queries on
+the text indexes. Then runs the chunked backfill while a simulated user
+keeps sending /log, and measures the same queries on the integer indexes.
+Index sizes come from SQLite's dbstat table.
+
+Usage: python -m benchmarks.bench_timestamps [--users N] [--txns N] [--chunk N] [--repeat N]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import migrations
+from database.db_setup import create_tables
+from database.db_operations import DatabaseOperations
+
+def create_tables_up_to(db_path: str, version: int):
+    """create_tables, stopping after the given migration."""
+    current = list(migrations.MIGRATIONS)
+    migrations.MIGRATIONS[:] = [entry for entry in current if entry[0] <= version]
+    try:
+        create_tables(db_path)
+    finally:
+        migrations.MIGRATIONS[:] = current
+
+def build_text_database(db_path: str, users: int, txns_per_user: int, seed: int = 42):
+    """Create a schema-4 database whose transactions only have text dates."""
+    create_tables_up_to(db_path, 4)
+    
+    rng = random.Random(seed)
+    now = datetime.now()
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany("INSERT INTO users (user_id, currency) VALUES (?, 'USD')",
+                         ((user_id,) for user_id in range(1, users + 1)))
+        conn.executemany(
+            "INSERT INTO transactions (user_id, amount, category, description, transaction_date) VALUES (?, ?, ?, ?, ?)",
+            (
+                (user_id, round(rng.uniform(1, 300), 2), f'#c{rng.randint(0, 9)}', 'seeded',
+                 (now - timedelta(seconds=rng.randint(0, 2 * 365 * 86400))).strftime('%Y-%m-%d %H:%M:%S'))
+                for user_id in range(1, users + 1)
+                for _ in range(txns_per_user)
+            )
+        )
+    conn.close()
+
+def index_sizes(db_path: str) -> dict:
+    """Bytes used by each transactions index."""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT name, SUM(pgsize) FROM dbstat WHERE name LIKE 'idx_transactions_%' GROUP BY name"
+    ).fetchall()
+    conn.close()
+    return dict(rows)
+
+async def range_latency(ops: DatabaseOperations, users: int, repeat: int) -> dict:
+    """Median milliseconds for a /summary month and year on random users."""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    ranges = {
+        'month': (today.replace(day=1), today + timedelta(days=1, seconds=-1)),
+        'year': (today.replace(month=1, day=1), today + timedelta(days=1, seconds=-1))
+    }
+    rng = random.Random(7)
+    results = {}
+    for name, (start, end) in ranges.items():
+        samples = []
+        for _ in range(repeat):
+            user_id = rng.randint(1, users)
+            began = time.perf_counter()
+            spending = await ops.get_spending_by_category(user_id, start, end)
+            sum(spending.values())
+            samples.append((time.perf_counter() - began) * 1000)
+        results[name] = statistics.median(samples)
+    return results
+
+async def backfill_under_load(ops: DatabaseOperations, chunk: int, pause_ms: float, log_interval: float):
+    """Run the backfill while one /log every log_interval seconds keeps arriving; return timings."""
+    latencies = []
+    done = asyncio.Event()
+    
+    async def logger():
+        while not done.is_set():
+            began = time.perf_counter()
+            await ops.log_expense(1, 100, '#c0', 'during backfill')
+            latencies.append((time.perf_counter() - began) * 1000)
+            await asyncio.sleep(log_interval)
+    
+    task = asyncio.create_task(logger())
+    began = time.perf_counter()
+    updated = await ops.backfill_timestamps(chunk_size=chunk, pause_ms=pause_ms)
+    elapsed = time.perf_counter() - began
+    done.set()
+    await task
+    latencies.sort()
+    return {
+        'rows': updated,
+        'seconds': elapsed,
+        'logs': len(latencies),
+        'log_p50': latencies[len(latencies) // 2] if latencies else 0.0,
+        'log_max': latencies[-1] if latencies else 0.0
+    }
+
+async def run(db_path: str, users: int, repeat: int, chunk: int, pause_ms: float) -> dict:
+    began = time.perf_counter()
+    create_tables_up_to(db_path, 5)
+    migrate_seconds = time.perf_counter() - began
+    # The later migrations (integer amounts) have nothing to do with dates
+    create_tables(db_path)
+    
+    ops = DatabaseOperations(db_path)
+    assert not await ops.timestamps_ready()
+    text = await range_latency(ops, users, repeat)
+    text_sizes = index_sizes(db_path)
+    
+    backfill = await backfill_under_load(ops, chunk, pause_ms, log_interval=0.005)
+    assert await ops.timestamps_ready()
+    integer = await range_latency(ops, users, repeat)
+    ops.close()
+    return {
+        'migrate_seconds': migrate_seconds,
+        'text': text,
+        'integer': integer,
+        'text_sizes': text_sizes,
+        'integer_sizes': index_sizes(db_path),
+        'backfill': backfill
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help='users in the seeded database')
+    parser.add_argument('--txns', type=int, default=20_000, help='transactions per user')
+    parser.add_argument('--chunk', type=int, default=1000, help='rows per backfill transaction')
+    parser.add_argument('--pause-ms', type=float, default=10, help='pause between backfill chunks')
+    parser.add_argument('--repeat', type=int, default=50, help='samples per range query')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'timestamps.db')
+        build_text_database(db_path, args.users, args.txns)
+        r = asyncio.run(run(db_path, args.users, args.repeat, args.chunk, args.pause_ms))
+    
+    rows = args.users * args.txns
+    print(f"🗄️ {rows:,} transactions; migration 5 (new columns, triggers, ts indexes) took {r['migrate_seconds']:.2f}s")
+    print(f"{'index':>40} {'KiB':>10}")
+    for name, size in sorted({**r['text_sizes'], **r['integer_sizes']}.items()):
+        print(f"{name:>40} {size / 1024:>10.0f}")
+    text_total = sum(size for name, size in r['text_sizes'].items() if name in migrations.TEXT_DATE_INDEXES)
+    integer_total = sum(size for name, size in r['integer_sizes'].items() if '_ts' in name)
+    print(f"📏 Date indexes: {text_total / 1024:,.0f} KiB as text, {integer_total / 1024:,.0f} KiB as integers "
+          f"({integer_total / text_total:.0%})")
+    
+    b = r['backfill']
+    print(f"🕒 Backfilled {b['rows']:,} rows in {b['seconds']:.2f}s ({b['rows'] / b['seconds']:,.0f} rows/s); "
+          f"{b['logs']} concurrent /log: p50 {b['log_p50']:.1f}ms, max {b['log_max']:.1f}ms")
+    print(f"{'range':>6} {'text ms':>9} {'ts ms':>8} {'speedup':>8}")
+    for name in r['text']:
+        print(f"{name:>6} {r['text'][name]:>9.3f} {r['integer'][name]:>8.3f} {r['text'][name] / r['integer'][name]:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
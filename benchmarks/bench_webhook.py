@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark: update throughput, sequential vs concurrent processing with per-user ordering.
+
+Builds the real Application against a local fake Bot API (with a simulated
+round trip per reply) and feeds it /log updates from many users through the
+update queue, the same path the webhook server uses. Checks that every
+user's expenses were stored in the order they were sent.
+
+Usage: python -m benchmarks.bench_webhook [--users N] [--per-user N] [--latency-ms MS] [--concurrency 1,8,32]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update
+from benchmarks.fake_bot_api import FakeBotAPI, command_update
+from database.db_setup import create_tables
+from database.db_operations import db_ops
+
+async def run_updates(api: FakeBotAPI, concurrency: int, users: int, per_user: int, timeout: float = 120) -> dict:
+    """Push users x per_user /log updates through a fresh Application and time until every reply is sent."""
+    from main import build_application
+    
+    await db_ops.execute_query("DELETE FROM transactions")
+    for user_id in range(1, users + 1):
+        await db_ops.add_user(user_id, 'USD')
+    
+    # Every user sends a burst far above the rate limit; measure update processing, not admission
+    application = build_application('123:fake', concurrent_updates=concurrency, base_url=api.base_url,
+                                    rate_limit=False)
+    await application.initialize()
+    await application.start()
+    api.sent.clear()
+    
+    total = users * per_user
+    start = time.perf_counter()
+    update_id = 0
+    # Interleave users the way real traffic arrives
+    for seq in range(1, per_user + 1):
+        for user_id in range(1, users + 1):
+            update_id += 1
+            data = command_update(update_id, user_id, f"/log {seq} on #bench")
+            await application.update_queue.put(Update.de_json(data, application.bot))
+    
+    deadline = time.perf_counter() + timeout
+    while len(api.sent) < total and time.perf_counter() < deadline:
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - start
+    
+    await application.stop()
+    await application.shutdown()
+    
+    rows = await db_ops.execute_query(
+        "SELECT user_id, amount FROM transactions ORDER BY id", fetch_all=True
+    )
+    sequences = {}
+    for user_id, amount in rows:
+        sequences.setdefault(user_id, []).append(amount)
+    in_order = all(seq == sorted(seq) for seq in sequences.values())
+    return {
+        'concurrency': concurrency,
+        'updates': total,
+        'replied': len(api.sent),
+        'seconds': elapsed,
+        'updates_per_sec': len(api.sent) / elapsed if elapsed else 0.0,
+        'in_order': in_order and len(rows) == total
+    }
+
+async def run(args):
+    api = FakeBotAPI(latency_ms=args.latency_ms).start()
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            results.append(await run_updates(api, concurrency, args.users, args.per_user))
+    finally:
+        api.stop()
+        db_ops.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50, help='users sending updates')
+    parser.add_argument('--per-user', type=int, default=10, help='/log updates per user')
+    parser.add_argument('--latency-ms', type=float, default=20, help='simulated Bot API round trip per reply')
+    parser.add_argument('--concurrency', default='1,8,32,128', help='comma-separated concurrent update limits')
+    args = parser.parse_args()
+    args.concurrency = [int(n) for n in args.concurrency.split(',')]
+    # One INFO line per Bot API request would swamp the results
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_ops.db_path = os.path.join(tmp, 'webhook.db')
+        create_tables(db_ops.db_path)
+        results = asyncio.run(run(args))
+    
+    baseline = results[0]['updates_per_sec']
+    print(f"{'concurrency':>11} {'updates':>8} {'seconds':>8} {'updates/s':>10} {'speedup':>8} {'per-user order':>15}")
+    for r in results:
+        print(f"{r['concurrency']:>11} {r['replied']:>8} {r['seconds']:>8.2f} {r['updates_per_sec']:>10.1f} "
+              f"{r['updates_per_sec'] / baseline:>7.1f}x {'kept' if r['in_order'] else 'BROKEN':>15}")
+    if not all(r['in_order'] for r in results):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
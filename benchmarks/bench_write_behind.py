@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark: expense insert throughput, per-statement commits vs write-behind group commit.
+
+Both modes run with the same synchronous setting (FULL by default, so every
+commit is an fsync and the per-statement path is bound by the disk's fsync rate).
+
+Usage: python -m benchmarks.bench_write_behind [--inserts N] [--concurrency C] [--synchronous FULL|NORMAL]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db_setup import create_tables
+from database.db_operations import DatabaseOperations
+
+async def run(ops: DatabaseOperations, inserts: int, concurrency: int) -> float:
+    """Log expenses from concurrent callers and return inserts per second."""
+    await ops.add_user(1, 'USD')
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one(i: int):
+        async with semaphore:
+            assert await ops.log_expense(1, (i % 500) * 100, '#food', 'benchmark')
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(inserts)))
+    elapsed = time.perf_counter() - start
+    
+    count = await ops.execute_query("SELECT COUNT(*) FROM transactions", fetch_one=True)
+    assert count[0] == inserts, f"expected {inserts} rows, found {count[0]}"
+    return inserts / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--inserts', type=int, default=5000, help='expenses to log')
+    parser.add_argument('--concurrency', type=int, default=64, help='callers in flight at once')
+    parser.add_argument('--synchronous', default='FULL', help='SQLite synchronous pragma for both modes')
+    parser.add_argument('--batch-size', type=int, default=256, help='write-behind max batch size')
+    parser.add_argument('--linger-ms', type=float, default=2, help='write-behind max linger')
+    args = parser.parse_args()
+    
+    modes = {
+        'per-statement': dict(write_behind=False),
+        'write-behind': dict(write_behind=True, write_batch_size=args.batch_size, write_linger_ms=args.linger_ms)
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, options in modes.items():
+            db_path = os.path.join(tmp, f'{name}.db')
+            create_tables(db_path)
+            ops = DatabaseOperations(db_path, synchronous=args.synchronous, **options)
+            results[name] = asyncio.run(run(ops, args.inserts, args.concurrency))
+            ops.close()
+    
+    print(f"synchronous={args.synchronous}, concurrency={args.concurrency}")
+    print(f"{'mode':<16} {'inserts/sec':>12}")
+    for name, rate in results.items():
+        print(f"{name:<16} {rate:>12.0f}")
+    print(f"speedup: {results['write-behind'] / results['per-statement']:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+A local stand-in for the Telegram Bot API, for driving the real Application end to end.
+
+Answers getMe and the send* methods the handlers use, with an optional
+artificial latency per call to mimic the round trip to Telegram, and records
+every message it was asked to send.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 resets connections when many updates reply at once
+    request_queue_size = 1024
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+
+class FakeBotAPI:
+    """Serves the Bot API over HTTP on 127.0.0.1; point build_application(base_url=...) at base_url."""
+    
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.sent: List[Dict] = []
+        self._lock = threading.Lock()
+        self._message_id = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+    
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/bot"
+    
+    def start(self) -> 'FakeBotAPI':
+        api = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                method = self.path.rsplit('/', 1)[-1]
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode('utf-8') if length else ''
+                params = {key: values[0] for key, values in parse_qs(body).items()}
+                payload = json.dumps({'ok': True, 'result': api.handle(method, params)}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self._server = Server(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self._server.serve_forever, name='fake-bot-api', daemon=True).start()
+        return self
+    
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+    
+    def handle(self, method: str, params: Dict[str, str]):
+        """Return the result object the real Bot API would send back for a method call."""
+        if method == 'getMe':
+            return BOT_USER
+        if self.latency:
+            time.sleep(self.latency)
+        if method.startswith('send') or method.startswith('edit'):
+            with self._lock:
+                self._message_id += 1
+                chat_id = int(params.get('chat_id', 0))
+                self.sent.append({'method': method, 'chat_id': chat_id, 'text': params.get('text', '')})
+                return {
+                    'message_id': self._message_id,
+                    'date': int(time.time()),
+                    'chat': {'id': chat_id, 'type': 'private'},
+                    'from': BOT_USER,
+                    'text': params.get('text', '')
+                }
+        return True
+
+def command_update(update_id: int, user_id: int, text: str) -> Dict:
+    """Build the JSON of a private-chat command message as Telegram would deliver it."""
+    command = text.split()[0]
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'},
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        }
+    }
@@ -0,0 +1,51 @@
+"""
+Stand-ins for telegram Update/Context objects so handlers can be driven without the Bot API.
+
+Replies are captured instead of sent; photos and documents are read to
+completion to account for the bytes a real upload would transfer.
+"""
+
+from types import SimpleNamespace
+from typing import List, Optional
+
+class StubMessage:
+    """Captures what a handler would send back to the chat."""
+    
+    def __init__(self, text: str = ''):
+        self.text = text
+        self.document = None
+        self.reply_to_message = None
+        self.replies: List[str] = []
+        self.photos: List[object] = []
+        self.documents: List[object] = []
+    
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+        return StubMessage(text)
+    
+    async def reply_photo(self, photo, caption=None, **kwargs):
+        if hasattr(photo, 'read'):
+            photo.read()
+            file_id = f'stub-{id(photo)}'
+        else:
+            file_id = photo
+        self.photos.append(file_id)
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=file_id)])
+    
+    async def reply_document(self, document, filename=None, caption=None, **kwargs):
+        if hasattr(document, 'read'):
+            document.read()
+        self.documents.append(filename)
+        return SimpleNamespace(document=SimpleNamespace(file_id=f'stub-doc-{filename}'))
+
+def make_update(user_id: int, text: str, first_name: str = 'Bench'):
+    """Build an (update, context) pair the way CommandHandler would pass them."""
+    message = StubMessage(text)
+    update = SimpleNamespace(
+        effective_user=SimpleNamespace(id=user_id, first_name=first_name),
+        effective_chat=SimpleNamespace(id=user_id),
+        message=message,
+        callback_query=None
+    )
+    context = SimpleNamespace(args=text.split()[1:], bot_data={}, user_data={})
+    return update, context
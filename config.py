@@ -6,6 +6,16 @@ load_dotenv()
 # Telegram Config
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 
+# Update Delivery
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # Public HTTPS URL Telegram posts updates to (--webhook)
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')  # Interface the webhook server binds, behind a proxy
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))  # Local port of the webhook server
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')  # URL path updates are posted to
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '') or None  # Checked on every webhook request
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '32'))  # Updates processed at once in webhook mode
+DROP_PENDING_UPDATES = os.getenv('DROP_PENDING_UPDATES', 'false').lower() == 'true'  # Discard updates sent while down
+WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', '1'))  # Worker processes, each with its own database shard
+
 # Bot Configuration
 BOT_NAME = "💰 Personal Finance Co-Pilot"
 BOT_USERNAME = "PersonalFinanceCoPlitBot"  # You can set this via BotFather
@@ -20,9 +30,76 @@ BOT_PERSONALITY = {
     'encouraging': True
 }
 
+# Database Settings
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'personal_finance.db')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', str(os.cpu_count() or 4)))  # Read-only connections; writes use one writer
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '16384'))  # Page cache per connection
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(64 * 1024 * 1024)))  # Memory-mapped I/O window
+DB_STATEMENT_CACHE_SIZE = 128  # Prepared statements kept per connection
+DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL').upper()  # FULL fsyncs every commit
+DB_WRITE_BEHIND = os.getenv('DB_WRITE_BEHIND', 'false').lower() == 'true'  # Group-commit expense inserts
+DB_WRITE_BATCH_SIZE = int(os.getenv('DB_WRITE_BATCH_SIZE', '256'))  # Max inserts per group commit
+DB_WRITE_LINGER_MS = float(os.getenv('DB_WRITE_LINGER_MS', '5'))  # Wait for more inserts before committing
+DB_BACKFILL_CHUNK = int(os.getenv('DB_BACKFILL_CHUNK', '1000'))  # Rows per transaction in online backfills
+DB_BACKFILL_PAUSE_MS = float(os.getenv('DB_BACKFILL_PAUSE_MS', '10'))  # Gap between chunks for the bot's own writes
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))  # User rows kept in memory, 0 to disable
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '300'))  # Seconds before a cached user is re-read
+ANALYTICS_CACHE_ENABLED = os.getenv('ANALYTICS_CACHE_ENABLED', 'false').lower() == 'true'  # NumPy /summary engine
+ANALYTICS_CACHE_MAX_BYTES = int(os.getenv('ANALYTICS_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))  # Arrays kept in memory
+
+# Chart Rendering
+CHART_RENDER_WORKERS = int(os.getenv('CHART_RENDER_WORKERS', '2'))  # Renderer processes
+CHART_QUEUE_DEPTH = int(os.getenv('CHART_QUEUE_DEPTH', '8'))  # Renders allowed to wait for a worker
+CHART_RENDER_TIMEOUT = float(os.getenv('CHART_RENDER_TIMEOUT', '30'))  # Seconds before giving up
+CHART_CACHE_MAX_BYTES = int(os.getenv('CHART_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))  # In-memory PNG cache
+CHART_CACHE_DIR = os.getenv('CHART_CACHE_DIR', '')  # Optional on-disk cache tier, empty to disable
+CHART_CACHE_DISK_MAX_BYTES = int(os.getenv('CHART_CACHE_DISK_MAX_BYTES', str(256 * 1024 * 1024)))  # On-disk tier budget
+CHART_FILE_ID_MAX_ENTRIES = int(os.getenv('CHART_FILE_ID_MAX_ENTRIES', '10000'))  # Uploaded charts remembered
+
+# Statement Import
+IMPORT_CHUNK_SIZE = 500  # Rows inserted per transaction during /import
+IMPORT_PROGRESS_EVERY = 5000  # Rows between progress messages
+IMPORT_MAX_FILE_BYTES = 20 * 1024 * 1024  # Telegram's bot download limit
+
+# Data Export
+EXPORT_BATCH_SIZE = 1000  # Rows fetched per round trip while streaming /export
+
+# Currency Conversion
+EXCHANGE_RATES_CSV = os.getenv('EXCHANGE_RATES_CSV', '')  # currency,rate file loaded into the database at startup
+
+# Metrics
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'  # Time handlers and queries
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))  # Prometheus endpoint port, 0 to disable
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')  # Keep the endpoint local by default
+ADMIN_USER_IDS = {int(uid) for uid in os.getenv('ADMIN_USER_IDS', '').replace(',', ' ').split()}  # Allowed to use /stats
+
+# Admission Control
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'  # Per-user token buckets
+RATE_LIMIT_PER_MINUTE = float(os.getenv('RATE_LIMIT_PER_MINUTE', '30'))  # Cost units each user regains per minute
+RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', '15'))  # Cost units a user can spend back to back
+RATE_LIMIT_COSTS = {
+    command: float(cost)
+    for command, cost in (
+        item.split('=') for item in os.getenv('RATE_LIMIT_COSTS', 'summary=5,export=5,import=5,listhistory=2')
+        .replace(',', ' ').split()
+    )
+}  # Cost per command; anything not listed costs 1
+EXPENSIVE_COMMANDS = set(os.getenv('EXPENSIVE_COMMANDS', 'summary,export,import').replace(',', ' ').split())
+MAX_EXPENSIVE_CONCURRENT = int(os.getenv('MAX_EXPENSIVE_CONCURRENT', '4'))  # Expensive commands running at once
+EXPENSIVE_QUEUE_TIMEOUT = float(os.getenv('EXPENSIVE_QUEUE_TIMEOUT', '0'))  # Seconds to wait for a free slot, 0 to reject at once
+
+# Sampling Profiler
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))  # Fraction of handler calls profiled, 0 disables
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')  # Where .prof and allocation reports are written
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '200'))  # Newest reports kept, older ones deleted
+PROFILE_MIN_MS = float(os.getenv('PROFILE_MIN_MS', '0'))  # Only keep sampled calls at least this slow
+PROFILE_TRACEMALLOC = os.getenv('PROFILE_TRACEMALLOC', 'true').lower() == 'true'  # Record top allocation sites
+PROFILE_TOP_ALLOCATIONS = 25  # Allocation sites listed per report
+
 # Default Settings
 DEFAULT_CURRENCY = 'INR'
 MAX_HISTORY_LIMIT = 50
+MAX_EXPENSES_PER_MESSAGE = 50  # Expenses one /log message may hold, one per line or ';'
 DEFAULT_HISTORY_LIMIT = 10
 
 # Supported Currencies with friendly names
@@ -36,6 +113,18 @@ SUPPORTED_CURRENCIES = {
     'AUD': 'A$'
 }
 
+# Digits after the decimal point; amounts are stored as integer minor units (cents, paise; whole yen)
+CURRENCY_EXPONENTS = {
+    'INR': 2,
+    'USD': 2,
+    'EUR': 2,
+    'GBP': 2,
+    'JPY': 0,
+    'CAD': 2,
+    'AUD': 2
+}
+DEFAULT_CURRENCY_EXPONENT = 2
+
 CURRENCY_NAMES = {
     'INR': 'Indian Rupee (₹)',
     'USD': 'US Dollar ($)',
@@ -1,79 +1,522 @@
 import sqlite3
 import asyncio
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Callable, List, Dict, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from config import (
+    DATABASE_PATH, DB_POOL_SIZE, DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_STATEMENT_CACHE_SIZE,
+    DB_SYNCHRONOUS, DB_WRITE_BEHIND, DB_WRITE_BATCH_SIZE, DB_WRITE_LINGER_MS, DB_BACKFILL_CHUNK,
+    DB_BACKFILL_PAUSE_MS, CHART_FILE_ID_MAX_ENTRIES, EXPORT_BATCH_SIZE, DEFAULT_CURRENCY
+)
+from database.exchange_rates import save_rates
+from database.migrations import TEXT_DATE_INDEXES, drop_text_date_indexes
+from database.user_cache import UserCache
+from utils.money import conversion_factor, convert_totals
 
-DATABASE_PATH = 'personal_finance.db'
+logger = logging.getLogger(__name__)
+
+def open_connection(db_path: str = DATABASE_PATH, synchronous: str = DB_SYNCHRONOUS,
+                    readonly: bool = False) -> sqlite3.Connection:
+    """Open a SQLite connection tuned for a long-lived, pooled lifetime."""
+    conn = sqlite3.connect(
+        db_path,
+        timeout=30,
+        check_same_thread=False,
+        cached_statements=DB_STATEMENT_CACHE_SIZE
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL + NORMAL only fsyncs on checkpoint, which is still safe against corruption;
+    # FULL also fsyncs each commit so it survives power loss
+    conn.execute(f"PRAGMA synchronous={synchronous}")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    if readonly:
+        # Readers see a WAL snapshot and can never take the write lock
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+# Statements that only read and can run on the reader pool; everything else goes to the writer
+READ_QUERY_RE = re.compile(r'^\s*(?:SELECT|EXPLAIN)\b', re.IGNORECASE)
+
+# Rows are built by transaction_row, which stores each date both as text and as epoch seconds
+INSERT_TRANSACTION_QUERY = (
+    "INSERT INTO transactions (user_id, amount, category, description, transaction_date, ts, currency) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+def format_timestamp(value: Optional[datetime]) -> Optional[str]:
+    """Format a datetime the way CURRENT_TIMESTAMP stores it ('YYYY-MM-DD HH:MM:SS', UTC for aware values)."""
+    if value and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+def local_timestamp(value: str, tz: tzinfo) -> str:
+    """A stored UTC 'YYYY-MM-DD HH:MM:SS' value as wall time in tz, in the same format."""
+    moment = datetime.fromisoformat(value).replace(tzinfo=timezone.utc).astimezone(tz)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+def to_epoch(value: datetime) -> int:
+    """Epoch seconds of a datetime; naive values are UTC wall time, like CURRENT_TIMESTAMP."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+def user_timezone(user: Optional[Dict]) -> ZoneInfo:
+    """The user's time zone for day and month boundaries, UTC if unset or unknown."""
+    try:
+        return ZoneInfo((user or {}).get('timezone') or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+def transaction_row(user_id: int, amount: int, category: str, description: Optional[str],
+                    transaction_date: Optional[datetime], currency: Optional[str] = None) -> Tuple:
+    """
+    Parameters for INSERT_TRANSACTION_QUERY, dated now (UTC) unless transaction_date is given.
+    
+    amount is in minor units of currency; without one, the row takes the
+    user's currency when it is inserted.
+    """
+    if transaction_date is None:
+        transaction_date = datetime.now(timezone.utc).replace(microsecond=0)
+    return (user_id, amount, category, description, format_timestamp(transaction_date), to_epoch(transaction_date),
+            currency)
+
+def cursor_value(value, column: str):
+    """Convert a history cursor to the type of the column pages are sorted by."""
+    is_epoch = isinstance(value, int) or (isinstance(value, str) and value.lstrip('-').isdigit())
+    if column == 'ts':
+        return int(value) if is_epoch else to_epoch(datetime.fromisoformat(value))
+    return format_timestamp(datetime.fromtimestamp(int(value), timezone.utc)) if is_epoch else value
+
+def current_year_month() -> str:
+    """Return the current month as the 'YYYY-MM' key used by the rollup table, which is keyed by UTC dates."""
+    return datetime.now(timezone.utc).strftime('%Y-%m')
 
 class DatabaseOperations:
-    def __init__(self):
-        self.db_path = DATABASE_PATH
+    def __init__(self, db_path: str = DATABASE_PATH, pool_size: int = DB_POOL_SIZE,
+                 synchronous: str = DB_SYNCHRONOUS, write_behind: bool = DB_WRITE_BEHIND,
+                 write_batch_size: int = DB_WRITE_BATCH_SIZE, write_linger_ms: float = DB_WRITE_LINGER_MS):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.synchronous = synchronous
+        self.write_behind = write_behind
+        self.write_batch_size = write_batch_size
+        self.write_linger = write_linger_ms / 1000
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._readers: Optional[ThreadPoolExecutor] = None
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._listeners: Dict[str, List[Callable]] = {}
+        self._timestamps_ready: Optional[bool] = None
+        self._exchange_rates: Optional[Dict[str, float]] = None
+        self.user_cache = UserCache()
+    
+    def add_listener(self, event: str, callback: Callable):
+        """
+        Call callback(user_id=..., **details) after a write succeeds.
+        
+        Events: 'expense_logged', 'expenses_imported', 'transaction_deleted'.
+        expense_logged and transaction_deleted carry the row's amount (minor
+        units), currency (None when it was left to the user's), category and
+        transaction_date ('YYYY-MM-DD HH:MM:SS' in UTC).
+        'pool_wait' is called with seconds=... and pool='read' or 'write' from
+        the worker thread each time a pooled call starts, with how long it
+        waited for that thread.
+        """
+        self._listeners.setdefault(event, []).append(callback)
+    
+    def _notify(self, event: str, **details):
+        """
+        Run the listeners registered for an event.
+        
+        The write they report has already committed, so a failing listener
+        is logged and the rest still run; it never fails the write itself.
+        """
+        for callback in self._listeners.get(event, ()):
+            try:
+                callback(**details)
+            except Exception:
+                logger.exception(f"Listener {callback!r} for '{event}' failed")
+    
+    def _get_writer(self) -> ThreadPoolExecutor:
+        """Get the single writer thread, starting it on first use."""
+        with self._lock:
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+            return self._writer
+    
+    def _get_readers(self) -> ThreadPoolExecutor:
+        """Get the reader thread pool, starting it on first use."""
+        with self._lock:
+            if self._readers is None:
+                self._readers = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='db-reader')
+            return self._readers
+    
+    async def _run_in_pool(self, func: Callable, *args, write: bool):
+        """
+        Run a blocking call on the writer thread or a reader thread.
+        
+        Every mutation is queued to the one writer, so writers never contend for
+        SQLite's lock, and long reports on the readers never hold up a /log.
+        """
+        executor = self._get_writer() if write else self._get_readers()
+        if not self._listeners.get('pool_wait'):
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        
+        submitted_at = time.perf_counter()
+        pool = 'write' if write else 'read'
+        
+        def _timed():
+            self._notify('pool_wait', seconds=time.perf_counter() - submitted_at, pool=pool)
+            return func(*args)
+        
+        return await asyncio.get_running_loop().run_in_executor(executor, _timed)
+    
+    def _get_connection(self, readonly: bool = False) -> sqlite3.Connection:
+        """Get the calling worker thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = open_connection(self.db_path, self.synchronous, readonly)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+    
+    async def timestamps_ready(self) -> bool:
+        """
+        Whether every transaction has its integer ts yet.
+        
+        On a database upgraded with history, backfill_timestamps fills ts in
+        while the bot runs; until it finishes, date filters and ordering use
+        the text transaction_date column and its indexes instead.
+        """
+        if self._timestamps_ready is None:
+            def _check():
+                placeholders = ', '.join('?' * len(TEXT_DATE_INDEXES))
+                row = self._get_connection(readonly=True).execute(
+                    f"SELECT 1 FROM sqlite_master WHERE type = 'index' AND name IN ({placeholders})",
+                    TEXT_DATE_INDEXES
+                ).fetchone()
+                return row is None
+            
+            self._timestamps_ready = await self._run_in_pool(_check, write=False)
+        return self._timestamps_ready
+    
+    async def _date_column(self) -> Tuple[str, Callable[[datetime], object]]:
+        """The column to filter and sort transactions by, and how to turn a datetime into a bound for it."""
+        if await self.timestamps_ready():
+            return 'ts', to_epoch
+        return 'transaction_date', format_timestamp
+    
+    async def backfill_timestamps(self, chunk_size: int = DB_BACKFILL_CHUNK,
+                                  pause_ms: float = DB_BACKFILL_PAUSE_MS) -> int:
+        """
+        Fill in ts for transactions stored before the column existed.
+        
+        Works through rowid ranges of chunk_size, each one short transaction
+        on the writer thread with a pause after it, so /log and /delete keep
+        flowing while a large history is converted. Once no row is left
+        without a ts, the text-date indexes are dropped and date queries
+        switch to the integer column. Returns the number of rows updated.
+        """
+        if await self.timestamps_ready():
+            return 0
+        # Rows added from now on get their ts on insert, so only ids up to here need a look
+        max_id = (await self.execute_query("SELECT MAX(id) FROM transactions", fetch_one=True))[0] or 0
+        
+        def _fill(low: int, high: int) -> int:
+            conn = self._get_connection()
+            with conn:
+                return conn.execute(
+                    "UPDATE transactions SET ts = CAST(strftime('%s', transaction_date) AS INTEGER) "
+                    "WHERE id > ? AND id <= ? AND ts IS NULL",
+                    (low, high)
+                ).rowcount
+        
+        updated = 0
+        for low in range(0, max_id, chunk_size):
+            updated += await self._run_in_pool(_fill, low, low + chunk_size, write=True)
+            if pause_ms:
+                await asyncio.sleep(pause_ms / 1000)
+        
+        # Dates that don't parse can never get a ts; they don't hold up the switch
+        missing = await self.execute_query(
+            "SELECT 1 FROM transactions WHERE ts IS NULL AND strftime('%s', transaction_date) IS NOT NULL LIMIT 1",
+            fetch_one=True
+        )
+        if missing is None:
+            await self._run_in_pool(lambda: drop_text_date_indexes(self._get_connection()), write=True)
+            self._timestamps_ready = True
+        return updated
     
     async def execute_query(self, query: str, params: tuple = (), fetch_one: bool = False, fetch_all: bool = False):
-        """Execute a database query asynchronously."""
+        """Execute a database query asynchronously: SELECTs on a reader, anything else on the writer."""
+        write = not READ_QUERY_RE.match(query)
+        
         def _execute():
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            conn = self._get_connection(readonly=not write)
             try:
-                cursor.execute(query, params)
+                cursor = conn.execute(query, params)
                 if fetch_one:
                     result = cursor.fetchone()
                 elif fetch_all:
                     result = cursor.fetchall()
                 else:
                     result = cursor.rowcount
-                conn.commit()
+                # Reads never open a transaction, so only writes pay for a commit
+                if conn.in_transaction:
+                    conn.commit()
                 return result
+            except Exception:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+        
+        # Run in the pool's threads to avoid blocking
+        return await self._run_in_pool(_execute, write=write)
+    
+    def _get_write_queue(self) -> asyncio.Queue:
+        """Get the write-behind queue, starting its writer task on the running loop."""
+        if self._writer_task is None or self._writer_task.done() or self._writer_task.get_loop() is not asyncio.get_running_loop():
+            self._write_queue = asyncio.Queue()
+            self._writer_task = asyncio.get_running_loop().create_task(self._drain_writes(self._write_queue))
+        return self._write_queue
+    
+    async def _drain_writes(self, queue: asyncio.Queue):
+        """Commit queued expense inserts in batches, one transaction per batch."""
+        def _insert_batch(rows):
+            conn = self._get_connection()
+            with conn:
+                conn.executemany(INSERT_TRANSACTION_QUERY, rows)
+        
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.write_batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            # Linger briefly so concurrent /log commands share one commit
+            if len(batch) < self.write_batch_size and self.write_linger > 0:
+                await asyncio.sleep(self.write_linger)
+                while len(batch) < self.write_batch_size and not queue.empty():
+                    batch.append(queue.get_nowait())
+            
+            try:
+                await self._run_in_pool(_insert_batch, [row for row, _ in batch], write=True)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                # Every /log in the batch is answered before any listener runs
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(True)
+                for row, _ in batch:
+                    self._notify('expense_logged', user_id=row[0], category=row[2], amount=row[1],
+                                 currency=row[6], transaction_date=row[4])
             finally:
-                conn.close()
+                for _ in batch:
+                    queue.task_done()
+    
+    async def flush(self):
+        """
+        Wait until every queued write-behind insert has been committed, then stop the drain task.
         
-        # Run in thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, _execute)
+        The next write-behind insert starts a new one, so flush() is safe to
+        call mid-run as well as at shutdown.
+        """
+        task = self._writer_task
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            return
+        if not task.done():
+            await self._write_queue.join()
+            task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        if self._writer_task is task:
+            self._writer_task = None
+    
+    def close(self):
+        """Stop the writer and reader threads and close every pooled connection; flush() first to keep queued inserts."""
+        task, self._writer_task = self._writer_task, None
+        if task is not None and not task.done() and not task.get_loop().is_closed():
+            task.cancel()
+        with self._lock:
+            executors = [self._writer, self._readers]
+            self._writer = self._readers = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=True)
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+        # The pool may reopen on another database file
+        self.user_cache.clear()
+        self._timestamps_ready = None
+        self._exchange_rates = None
     
     async def add_user(self, user_id: int, currency: str = 'INR') -> bool:
         """Add a new user to the database."""
         query = "INSERT OR IGNORE INTO users (user_id, currency) VALUES (?, ?)"
-        result = await self.execute_query(query, (user_id, currency))
+        try:
+            result = await self.execute_query(query, (user_id, currency))
+        finally:
+            self.user_cache.invalidate(user_id)
         return result > 0
     
     async def get_user(self, user_id: int) -> Optional[Dict]:
-        """Get user information."""
-        query = "SELECT user_id, currency, created_at FROM users WHERE user_id = ?"
+        """Get user information, from the user cache when possible."""
+        user = self.user_cache.get(user_id)
+        if user is not None:
+            return user
+        
+        generation = self.user_cache.generation
+        query = "SELECT user_id, currency, created_at, timezone FROM users WHERE user_id = ?"
         result = await self.execute_query(query, (user_id,), fetch_one=True)
         if result:
-            return {
+            user = {
                 'user_id': result[0],
                 'currency': result[1],
-                'created_at': result[2]
+                'created_at': result[2],
+                'timezone': result[3]
             }
+            self.user_cache.put(user_id, user, generation)
+            return user
         return None
     
     async def update_user_currency(self, user_id: int, currency: str) -> bool:
-        """Update user's currency preference."""
-        query = "UPDATE users SET currency = ? WHERE user_id = ?"
-        result = await self.execute_query(query, (currency, user_id))
+        """
+        Update user's currency preference, the currency reports are shown in.
+        
+        Transactions keep the currency they were logged in. Budgets are limits
+        in the user's currency, so they are converted at the current rates in
+        the same transaction.
+        """
+        rates = await self.get_exchange_rates()
+        
+        def _update() -> bool:
+            conn = self._get_connection()
+            with conn:
+                row = conn.execute("SELECT currency FROM users WHERE user_id = ?", (user_id,)).fetchone()
+                if row is None:
+                    return False
+                if row[0] != currency:
+                    factor = conversion_factor(row[0], currency, rates)
+                    conn.execute(
+                        "UPDATE budgets SET amount = CAST(ROUND(amount * ?) AS INTEGER) WHERE user_id = ?",
+                        (factor, user_id)
+                    )
+                conn.execute("UPDATE users SET currency = ? WHERE user_id = ?", (currency, user_id))
+                return True
+        
+        try:
+            return await self._run_in_pool(_update, write=True)
+        finally:
+            self.user_cache.invalidate(user_id)
+    
+    async def update_user_timezone(self, user_id: int, timezone_name: str) -> bool:
+        """Update user's time zone, an IANA name such as 'Europe/Berlin'."""
+        query = "UPDATE users SET timezone = ? WHERE user_id = ?"
+        try:
+            result = await self.execute_query(query, (timezone_name, user_id))
+        finally:
+            self.user_cache.invalidate(user_id)
         return result > 0
     
-    async def log_expense(self, user_id: int, amount: float, category: str, description: str = None) -> bool:
-        """Log a new expense."""
-        query = "INSERT INTO transactions (user_id, amount, category, description) VALUES (?, ?, ?, ?)"
-        result = await self.execute_query(query, (user_id, amount, category, description))
+    async def log_expense(self, user_id: int, amount: int, category: str, description: str = None,
+                          transaction_date: Optional[datetime] = None, currency: Optional[str] = None) -> bool:
+        """Log a new expense of amount minor units of currency (the user's if not given), dated now unless transaction_date is given."""
+        if self.write_behind:
+            # Resolves once the batch holding this insert has committed
+            future = asyncio.get_running_loop().create_future()
+            row = transaction_row(user_id, amount, category, description, transaction_date, currency)
+            self._get_write_queue().put_nowait((row, future))
+            return await future
+        
+        params = transaction_row(user_id, amount, category, description, transaction_date, currency)
+        result = await self.execute_query(INSERT_TRANSACTION_QUERY, params)
+        if result > 0:
+            self._notify('expense_logged', user_id=user_id, category=category, amount=amount,
+                         currency=currency, transaction_date=params[4])
         return result > 0
     
+    async def log_expenses_bulk(self, user_id: int, expenses: List[Tuple], currency: Optional[str] = None) -> int:
+        """
+        Insert many (amount, category, description, transaction_date) expenses in one transaction.
+        
+        Amounts are minor units of currency, the user's if not given.
+        Returns the number of rows inserted.
+        """
+        rows = [
+            transaction_row(user_id, amount, category, description, transaction_date, currency)
+            for amount, category, description, transaction_date in expenses
+        ]
+        
+        def _insert():
+            conn = self._get_connection()
+            with conn:
+                conn.executemany(INSERT_TRANSACTION_QUERY, rows)
+            return len(rows)
+        
+        inserted = await self._run_in_pool(_insert, write=True)
+        if inserted:
+            self._notify('expenses_imported', user_id=user_id, count=inserted)
+        return inserted
+    
+    async def log_expenses(self, user_id: int, expenses: List[Tuple], currency: Optional[str] = None) -> int:
+        """
+        Log several (amount, category, description) expenses dated now in one transaction.
+        
+        Amounts are minor units of currency, the user's if not given. Unlike
+        log_expenses_bulk this announces every row, so caches update in place.
+        Returns the number of rows inserted.
+        """
+        rows = [
+            transaction_row(user_id, amount, category, description, None, currency)
+            for amount, category, description in expenses
+        ]
+        
+        def _insert():
+            conn = self._get_connection()
+            with conn:
+                conn.executemany(INSERT_TRANSACTION_QUERY, rows)
+            return len(rows)
+        
+        inserted = await self._run_in_pool(_insert, write=True)
+        for row in rows:
+            self._notify('expense_logged', user_id=user_id, category=row[2], amount=row[1],
+                         currency=currency, transaction_date=row[4])
+        return inserted
+    
     async def delete_transaction(self, user_id: int, transaction_id: int) -> bool:
         """Delete a transaction if it belongs to the user."""
-        query = "DELETE FROM transactions WHERE id = ? AND user_id = ?"
-        result = await self.execute_query(query, (transaction_id, user_id))
-        return result > 0
+        query = (
+            "DELETE FROM transactions WHERE id = ? AND user_id = ? "
+            "RETURNING amount, category, transaction_date, currency"
+        )
+        row = await self.execute_query(query, (transaction_id, user_id), fetch_one=True)
+        if row:
+            self._notify('transaction_deleted', user_id=user_id, transaction_id=transaction_id,
+                         amount=row[0], category=row[1], transaction_date=row[2], currency=row[3])
+        return row is not None
     
     async def get_transaction_history(self, user_id: int, limit: int = 10) -> List[Dict]:
         """Get user's transaction history."""
-        query = '''
-            SELECT id, amount, category, description, transaction_date 
+        column, _ = await self._date_column()
+        query = f'''
+            SELECT id, amount, category, description, transaction_date, currency
             FROM transactions 
             WHERE user_id = ? 
-            ORDER BY transaction_date DESC 
+            ORDER BY {column} DESC, id DESC
             LIMIT ?
         '''
         results = await self.execute_query(query, (user_id, limit), fetch_all=True)
@@ -85,12 +528,126 @@ class DatabaseOperations:
                 'amount': row[1],
                 'category': row[2],
                 'description': row[3],
-                'date': row[4]
+                'date': row[4],
+                'currency': row[5]
             })
         return transactions
     
-    async def set_budget(self, user_id: int, category: str, amount: float) -> bool:
-        """Set or update a budget for a category."""
+    async def get_transaction_page(self, user_id: int, before_cursor: Optional[Tuple[object, int]] = None,
+                                   page_size: int = 10, after_cursor: Optional[Tuple[object, int]] = None) -> Dict:
+        """
+        Get one page of history, newest first, using keyset pagination on (ts, id).
+        
+        Pass before_cursor to page towards older transactions or after_cursor to
+        page back towards newer ones. Every page is a single index seek, no
+        matter how deep the user has scrolled.
+        
+        Returns {'transactions', 'has_older', 'has_newer'}; a page's cursors are
+        the ('cursor', 'id') of its first and last transaction. Cursors may be
+        given as strings, as they come back from callback data.
+        """
+        column, _ = await self._date_column()
+        columns = f"SELECT id, amount, category, description, transaction_date, {column}, currency FROM transactions"
+        if after_cursor is not None:
+            query = f'''
+                {columns}
+                WHERE user_id = ? AND ({column}, id) > (?, ?)
+                ORDER BY {column}, id
+                LIMIT ?
+            '''
+            params = (user_id, cursor_value(after_cursor[0], column), after_cursor[1], page_size + 1)
+        elif before_cursor is not None:
+            query = f'''
+                {columns}
+                WHERE user_id = ? AND ({column}, id) < (?, ?)
+                ORDER BY {column} DESC, id DESC
+                LIMIT ?
+            '''
+            params = (user_id, cursor_value(before_cursor[0], column), before_cursor[1], page_size + 1)
+        else:
+            query = f'''
+                {columns}
+                WHERE user_id = ?
+                ORDER BY {column} DESC, id DESC
+                LIMIT ?
+            '''
+            params = (user_id, page_size + 1)
+        results = await self.execute_query(query, params, fetch_all=True)
+        
+        # One extra row tells us whether there is another page in that direction
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if after_cursor is not None:
+            results.reverse()
+        
+        transactions = []
+        for row in results:
+            transactions.append({
+                'id': row[0],
+                'amount': row[1],
+                'category': row[2],
+                'description': row[3],
+                'date': row[4],
+                'cursor': row[5],
+                'currency': row[6]
+            })
+        return {
+            'transactions': transactions,
+            'has_older': has_more if after_cursor is None else True,
+            'has_newer': has_more if after_cursor is not None else before_cursor is not None
+        }
+    
+    async def export_transactions(self, user_id: int, write_rows: Callable[[List[Tuple]], None],
+                                  start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                                  batch_size: int = EXPORT_BATCH_SIZE, tz: Optional[tzinfo] = None) -> int:
+        """
+        Stream a user's transactions, oldest first, to write_rows in batches.
+        
+        Rows are (id, date, amount, category, description, currency), dates as
+        wall time in tz if given, else UTC. start_date is inclusive and end_date
+        exclusive. The cursor is drained with fetchmany on a pool thread, so
+        only one batch is ever held in memory.
+        """
+        column, bound = await self._date_column()
+        query = f'''
+            SELECT id, transaction_date, amount, category, description, currency
+            FROM transactions
+            WHERE user_id = ? AND {column} >= ? AND {column} < ?
+            ORDER BY {column}, id
+        '''
+        if column == 'ts':
+            params = (
+                user_id,
+                to_epoch(start_date) if start_date else -2 ** 63,
+                to_epoch(end_date) if end_date else 2 ** 63 - 1
+            )
+        else:
+            # Open bounds use full timestamps: the column's NUMERIC affinity would turn '9999' into a number
+            params = (
+                user_id,
+                format_timestamp(start_date) or '0000-01-01 00:00:00',
+                format_timestamp(end_date) or '9999-12-31 23:59:59'
+            )
+        
+        def _export():
+            cursor = self._get_connection(readonly=True).execute(query, params)
+            exported = 0
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        return exported
+                    if tz is not None:
+                        rows = [(row[0], local_timestamp(row[1], tz)) + row[2:] for row in rows]
+                    write_rows(rows)
+                    exported += len(rows)
+            finally:
+                cursor.close()
+        
+        return await self._run_in_pool(_export, write=False)
+    
+    async def set_budget(self, user_id: int, category: str, amount: int) -> bool:
+        """Set or update a budget for a category, in minor units."""
         query = "INSERT OR REPLACE INTO budgets (user_id, category, amount) VALUES (?, ?, ?)"
         result = await self.execute_query(query, (user_id, category, amount))
         return result > 0
@@ -108,46 +665,159 @@ class DatabaseOperations:
             })
         return budgets
     
-    async def get_spending_by_category(self, user_id: int, start_date: datetime, end_date: datetime) -> Dict[str, float]:
-        """Get spending by category for a date range."""
+    async def get_exchange_rates(self) -> Dict[str, float]:
+        """Exchange rates by currency code, read once and kept until set_exchange_rates or close."""
+        if self._exchange_rates is None:
+            results = await self.execute_query("SELECT currency, rate FROM exchange_rates", fetch_all=True)
+            self._exchange_rates = dict(results)
+        return self._exchange_rates
+    
+    async def set_exchange_rates(self, rates: Dict[str, float]) -> int:
+        """Replace the stored exchange rates (units per one unit of a common base); returns how many were saved."""
+        def _save():
+            save_rates(self._get_connection(), rates)
+        
+        await self._run_in_pool(_save, write=True)
+        self._exchange_rates = dict(rates)
+        return len(rates)
+    
+    async def _reporting_currency(self, user_id: int, currency: Optional[str]) -> str:
+        """The currency to report in: the one asked for, else the user's."""
+        if currency:
+            return currency
+        user = await self.get_user(user_id)
+        return user['currency'] if user else DEFAULT_CURRENCY
+    
+    async def _convert(self, totals: List[Tuple], user_id: int, currency: Optional[str]) -> Dict:
+        """Add up (key, currency, minor units) sums in the reporting currency, per key."""
+        to_currency = await self._reporting_currency(user_id, currency)
+        # Rates are only read once some sum is in another currency
+        rates = await self.get_exchange_rates() if any(row[1] != to_currency for row in totals) else {}
+        return convert_totals(totals, to_currency, rates)
+    
+    async def get_budget_status(self, user_id: int, year_month: str, currency: Optional[str] = None) -> List[Dict]:
+        """Get every budget with its spending for a 'YYYY-MM' month in one query, in the user's currency."""
         query = '''
-            SELECT category, SUM(amount) as total
-            FROM transactions 
-            WHERE user_id = ? AND transaction_date BETWEEN ? AND ?
-            GROUP BY category
+            SELECT b.category, b.amount, m.currency, m.total
+            FROM budgets b
+            LEFT JOIN monthly_category_totals m
+                ON m.user_id = b.user_id AND m.year_month = ? AND m.category = b.category
+            WHERE b.user_id = ?
+            ORDER BY b.category
         '''
-        results = await self.execute_query(query, (user_id, start_date.isoformat(), end_date.isoformat()), fetch_all=True)
+        results = await self.execute_query(query, (year_month, user_id), fetch_all=True)
         
-        spending = {}
-        for row in results:
-            spending[row[0]] = row[1]
-        return spending
+        # One row per currency the category was spent in
+        spent = await self._convert([(row[0], row[2], row[3]) for row in results if row[2] is not None],
+                                    user_id, currency)
+        budgets = []
+        for category, amount in dict((row[0], row[1]) for row in results).items():
+            budgets.append({
+                'category': category,
+                'amount': amount,
+                'spent': spent.get(category, 0)
+            })
+        return budgets
     
-    async def get_total_spending(self, user_id: int, start_date: datetime, end_date: datetime) -> float:
-        """Get total spending for a date range."""
-        query = '''
-            SELECT SUM(amount) 
+    async def get_spending_by_category(self, user_id: int, start_date: datetime, end_date: datetime,
+                                       currency: Optional[str] = None) -> Dict[str, int]:
+        """
+        Get spending by category for a date range, in minor units of the user's currency.
+        
+        SQLite sums each (category, currency) exactly; only those sums are converted.
+        """
+        column, bound = await self._date_column()
+        query = f'''
+            SELECT category, currency, SUM(amount) as total
             FROM transactions 
-            WHERE user_id = ? AND transaction_date BETWEEN ? AND ?
+            WHERE user_id = ? AND {column} BETWEEN ? AND ?
+            GROUP BY category, currency
         '''
-        result = await self.execute_query(query, (user_id, start_date.isoformat(), end_date.isoformat()), fetch_one=True)
-        return result[0] if result[0] else 0.0
+        params = (user_id, bound(start_date), bound(end_date))
+        results = await self.execute_query(query, params, fetch_all=True)
+        return await self._convert(results, user_id, currency)
+    
+    async def get_total_spending(self, user_id: int, start_date: datetime, end_date: datetime,
+                                 currency: Optional[str] = None) -> int:
+        """Get total spending for a date range, in minor units of the user's currency."""
+        # Sum of the converted categories, so a breakdown always adds up to its total
+        spending = await self.get_spending_by_category(user_id, start_date, end_date, currency)
+        return sum(spending.values())
     
-    async def get_current_month_spending_by_category(self, user_id: int, category: str) -> float:
+    async def get_current_month_spending_by_category(self, user_id: int, category: str,
+                                                     currency: Optional[str] = None) -> int:
         """Get current month spending for a specific category."""
-        now = datetime.now()
-        start_of_month = datetime(now.year, now.month, 1)
-        end_of_month = datetime(now.year, now.month + 1, 1) - timedelta(seconds=1) if now.month < 12 else datetime(now.year + 1, 1, 1) - timedelta(seconds=1)
-        
+        # A lookup per currency in the rollup kept current by the transactions triggers
         query = '''
-            SELECT SUM(amount) 
-            FROM transactions 
-            WHERE user_id = ? AND category = ? AND transaction_date BETWEEN ? AND ?
+            SELECT category, currency, total
+            FROM monthly_category_totals
+            WHERE user_id = ? AND year_month = ? AND category = ?
+        '''
+        results = await self.execute_query(query, (user_id, current_year_month(), category), fetch_all=True)
+        return (await self._convert(results, user_id, currency)).get(category, 0)
+    
+    async def get_month_spending_by_category(self, user_id: int, year_month: str,
+                                             currency: Optional[str] = None) -> Dict[str, int]:
+        """Get spending by category for a 'YYYY-MM' month from the rollup, in the user's currency."""
+        query = '''
+            SELECT category, currency, total
+            FROM monthly_category_totals
+            WHERE user_id = ? AND year_month = ?
+        '''
+        results = await self.execute_query(query, (user_id, year_month), fetch_all=True)
+        return await self._convert(results, user_id, currency)
+    
+    async def get_chart_file_id(self, chart_key: str) -> Optional[str]:
+        """Get the Telegram file_id of an already uploaded chart and mark it as used."""
+        query = "UPDATE chart_file_ids SET last_used_at = ? WHERE chart_key = ? RETURNING file_id"
+        result = await self.execute_query(query, (int(time.time()), chart_key), fetch_one=True)
+        return result[0] if result else None
+    
+    async def save_chart_file_id(self, chart_key: str, file_id: str, max_entries: int = CHART_FILE_ID_MAX_ENTRIES) -> bool:
+        """Remember an uploaded chart's file_id, evicting the least recently used beyond max_entries."""
+        query = "INSERT OR REPLACE INTO chart_file_ids (chart_key, file_id, last_used_at) VALUES (?, ?, ?)"
+        result = await self.execute_query(query, (chart_key, file_id, int(time.time())))
+        
+        evict_query = '''
+            DELETE FROM chart_file_ids
+            WHERE chart_key IN (
+                SELECT chart_key FROM chart_file_ids
+                ORDER BY last_used_at DESC
+                LIMIT -1 OFFSET ?
+            )
+        '''
+        await self.execute_query(evict_query, (max_entries,))
+        return result > 0
+    
+    async def delete_chart_file_id(self, chart_key: str) -> bool:
+        """Forget a file_id that Telegram no longer accepts."""
+        query = "DELETE FROM chart_file_ids WHERE chart_key = ?"
+        result = await self.execute_query(query, (chart_key,))
+        return result > 0
+    
+    async def get_category_budget_status(self, user_id: int, category: str, year_month: str,
+                                         currency: Optional[str] = None) -> Optional[Dict]:
+        """Get one category's budget and its spending for a 'YYYY-MM' month, or None without a budget."""
+        statuses = await self.get_categories_budget_status(user_id, [category], year_month, currency)
+        return statuses.get(category)
+    
+    async def get_categories_budget_status(self, user_id: int, categories: List[str], year_month: str,
+                                           currency: Optional[str] = None) -> Dict[str, Dict]:
+        """Get budget and spending for several categories in one query, keyed by category; those without a budget are left out."""
+        placeholders = ', '.join('?' for _ in categories)
+        query = f'''
+            SELECT b.category, b.amount, m.currency, m.total
+            FROM budgets b
+            LEFT JOIN monthly_category_totals m
+                ON m.user_id = b.user_id AND m.year_month = ? AND m.category = b.category
+            WHERE b.user_id = ? AND b.category IN ({placeholders})
         '''
-        result = await self.execute_query(query, (user_id, category, start_of_month.isoformat(), end_of_month.isoformat()), fetch_one=True)
-        return result[0] if result[0] else 0.0
+        results = await self.execute_query(query, (year_month, user_id, *categories), fetch_all=True)
+        spent = await self._convert([(row[0], row[2], row[3]) for row in results if row[2] is not None],
+                                    user_id, currency)
+        return {row[0]: {'amount': row[1], 'spent': spent.get(row[0], 0)} for row in results}
     
-    async def get_budget_for_category(self, user_id: int, category: str) -> Optional[float]:
+    async def get_budget_for_category(self, user_id: int, category: str) -> Optional[int]:
         """Get budget amount for a specific category."""
         query = "SELECT amount FROM budgets WHERE user_id = ? AND category = ?"
         result = await self.execute_query(query, (user_id, category), fetch_one=True)
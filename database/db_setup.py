@@ -1,12 +1,14 @@
 import sqlite3
 import os
 from datetime import datetime
+from config import DATABASE_PATH
+from database.migrations import run_migrations
 
-DATABASE_PATH = 'personal_finance.db'
-
-def create_tables():
+def create_tables(db_path: str = DATABASE_PATH):
     """Create the database tables if they don't exist."""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = sqlite3.connect(db_path, timeout=30)
+    # WAL is persistent, so pooled connections never have to switch modes under load
+    conn.execute("PRAGMA journal_mode=WAL")
     cursor = conn.cursor()
     
     # Create users table
@@ -44,6 +46,9 @@ def create_tables():
     ''')
     
     conn.commit()
+    
+    # Bring indexes and later schema changes up to date
+    run_migrations(conn)
     conn.close()
     print("Database tables created successfully!")
 
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Load exchange rates into the database from a CSV file, with no network access.
+
+The file needs a header row with `currency` and `rate` columns. A rate is how
+many units of that currency one unit of a common base buys, so the base
+itself is 1 (with USD as the base: USD 1, EUR 0.92, INR 83.2, JPY 151).
+Loading replaces every stored rate, since rates against different bases
+can't be mixed. A running bot reads the rates when it starts.
+
+Usage: python -m database.exchange_rates FILE [--db PATH]
+"""
+
+import argparse
+import csv
+import math
+import re
+import sqlite3
+import sys
+import time
+from typing import Dict
+from config import DATABASE_PATH
+
+CURRENCY_CODE_RE = re.compile(r'^[A-Z]{3}$')
+
+def read_rates_csv(path: str) -> Dict[str, float]:
+    """Parse a currency,rate file; raises ValueError naming the first bad line."""
+    with open(path, newline='', encoding='utf-8-sig') as stream:
+        reader = csv.DictReader(stream)
+        columns = {name.strip().lower(): name for name in reader.fieldnames or []}
+        if 'currency' not in columns or 'rate' not in columns:
+            raise ValueError("The header row needs 'currency' and 'rate' columns")
+        
+        rates = {}
+        for line_number, row in enumerate(reader, start=2):
+            code = (row[columns['currency']] or '').strip().upper()
+            if not CURRENCY_CODE_RE.match(code):
+                raise ValueError(f"Line {line_number}: '{code}' is not a three-letter currency code")
+            try:
+                rate = float(row[columns['rate']] or '')
+            except ValueError:
+                raise ValueError(f"Line {line_number}: invalid rate '{row[columns['rate']]}'")
+            if not math.isfinite(rate) or rate <= 0:
+                raise ValueError(f"Line {line_number}: rates must be positive")
+            rates[code] = rate
+    if not rates:
+        raise ValueError("No rates found")
+    return rates
+
+def save_rates(conn: sqlite3.Connection, rates: Dict[str, float]):
+    """Replace the stored rates with these, in one transaction."""
+    updated_at = int(time.time())
+    with conn:
+        conn.execute("DELETE FROM exchange_rates")
+        conn.executemany(
+            "INSERT INTO exchange_rates (currency, rate, updated_at) VALUES (?, ?, ?)",
+            [(code, rate, updated_at) for code, rate in rates.items()]
+        )
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file', help='CSV file with currency and rate columns')
+    parser.add_argument('--db', default=DATABASE_PATH, help='database file to load the rates into')
+    args = parser.parse_args()
+    
+    try:
+        rates = read_rates_csv(args.file)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    
+    from database.db_setup import create_tables
+    create_tables(args.db)
+    conn = sqlite3.connect(args.db)
+    try:
+        save_rates(conn, rates)
+    finally:
+        conn.close()
+    print(f"💱 Loaded {len(rates)} exchange rates; restart the bot to use them")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,392 @@
+import sqlite3
+import logging
+from typing import Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Ordered (version, description, migrate) entries. A migration receives a
+# connection that is already inside a transaction and must not commit itself.
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = []
+
+def migration(version: int, description: str):
+    """Register a schema migration for the given version."""
+    def decorator(func: Callable[[sqlite3.Connection], None]):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return func
+    return decorator
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Read the schema version recorded in the database header."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def run_migrations(conn: sqlite3.Connection) -> int:
+    """Apply every pending migration in order and return the resulting version."""
+    current = get_schema_version(conn)
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Applying migration {version}: {description}")
+        conn.execute("BEGIN")
+        try:
+            migrate(conn)
+            # user_version lives in the database header and commits with the migration
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        current = version
+    return current
+
+@migration(1, "Covering indexes for per-user transaction queries")
+def add_transaction_indexes(conn: sqlite3.Connection):
+    # Date-range reports and history: SUM(amount) GROUP BY category is answered from the index alone
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+        ON transactions (user_id, transaction_date, category, amount)
+    ''')
+    # Budget checks: month-to-date spending for one category
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_category_date
+        ON transactions (user_id, category, transaction_date, amount)
+    ''')
+
+@migration(2, "Monthly per-category spending rollup maintained by triggers")
+def add_monthly_category_totals(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS monthly_category_totals (
+            user_id INTEGER NOT NULL,
+            year_month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            txn_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, year_month, category)
+        ) WITHOUT ROWID
+    ''')
+    # Triggers fire inside the statement's own transaction, so the rollup can
+    # never disagree with transactions after a commit or a rollback.
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_insert
+        AFTER INSERT ON transactions
+        BEGIN
+            INSERT INTO monthly_category_totals (user_id, year_month, category, total, txn_count)
+            VALUES (NEW.user_id, substr(NEW.transaction_date, 1, 7), NEW.category, NEW.amount, 1)
+            ON CONFLICT (user_id, year_month, category)
+            DO UPDATE SET total = total + excluded.total, txn_count = txn_count + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_delete
+        AFTER DELETE ON transactions
+        BEGIN
+            UPDATE monthly_category_totals
+            SET total = total - OLD.amount, txn_count = txn_count - 1
+            WHERE user_id = OLD.user_id
+              AND year_month = substr(OLD.transaction_date, 1, 7)
+              AND category = OLD.category;
+            DELETE FROM monthly_category_totals
+            WHERE user_id = OLD.user_id
+              AND year_month = substr(OLD.transaction_date, 1, 7)
+              AND category = OLD.category
+              AND txn_count <= 0;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_update
+        AFTER UPDATE OF user_id, amount, category, transaction_date ON transactions
+        BEGIN
+            UPDATE monthly_category_totals
+            SET total = total - OLD.amount, txn_count = txn_count - 1
+            WHERE user_id = OLD.user_id
+              AND year_month = substr(OLD.transaction_date, 1, 7)
+              AND category = OLD.category;
+            DELETE FROM monthly_category_totals
+            WHERE user_id = OLD.user_id
+              AND year_month = substr(OLD.transaction_date, 1, 7)
+              AND category = OLD.category
+              AND txn_count <= 0;
+            INSERT INTO monthly_category_totals (user_id, year_month, category, total, txn_count)
+            VALUES (NEW.user_id, substr(NEW.transaction_date, 1, 7), NEW.category, NEW.amount, 1)
+            ON CONFLICT (user_id, year_month, category)
+            DO UPDATE SET total = total + excluded.total, txn_count = txn_count + 1;
+        END
+    ''')
+    # Backfill from existing history
+    conn.execute('DELETE FROM monthly_category_totals')
+    conn.execute('''
+        INSERT INTO monthly_category_totals (user_id, year_month, category, total, txn_count)
+        SELECT user_id, substr(transaction_date, 1, 7), category, SUM(amount), COUNT(*)
+        FROM transactions
+        GROUP BY user_id, substr(transaction_date, 1, 7), category
+    ''')
+
+@migration(3, "Telegram file_id of uploaded charts, keyed by chart content hash")
+def add_chart_file_ids(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS chart_file_ids (
+            chart_key TEXT PRIMARY KEY,
+            file_id TEXT NOT NULL,
+            last_used_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_chart_file_ids_last_used
+        ON chart_file_ids (last_used_at)
+    ''')
+
+@migration(4, "Keyset pagination index on (user_id, transaction_date, id)")
+def add_history_index(conn: sqlite3.Connection):
+    # The rowid (id) is implicitly the last index column, which gives a total
+    # order for (transaction_date, id) cursors without a temp B-tree sort
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_history
+        ON transactions (user_id, transaction_date)
+    ''')
+
+# Text-date indexes that the integer ts indexes replace once every row has a ts
+TEXT_DATE_INDEXES = (
+    'idx_transactions_user_date', 'idx_transactions_user_category_date', 'idx_transactions_user_history'
+)
+
+def drop_text_date_indexes(conn: sqlite3.Connection):
+    for name in TEXT_DATE_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+@migration(5, "Integer epoch timestamps (ts) on transactions and a time zone per user")
+def add_epoch_timestamps(conn: sqlite3.Connection):
+    # ts is UTC epoch seconds; transaction_date stays as the display value and rollup key.
+    # Existing rows are filled in by DatabaseOperations.backfill_timestamps while the bot runs.
+    conn.execute("ALTER TABLE transactions ADD COLUMN ts INTEGER")
+    conn.execute("ALTER TABLE users ADD COLUMN timezone TEXT NOT NULL DEFAULT 'UTC'")
+    # Writers that only set transaction_date (seed scripts, resharding, older code) still get a ts
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_ts_insert
+        AFTER INSERT ON transactions
+        WHEN NEW.ts IS NULL
+        BEGIN
+            UPDATE transactions SET ts = CAST(strftime('%s', NEW.transaction_date) AS INTEGER)
+            WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_ts_update
+        AFTER UPDATE OF transaction_date ON transactions
+        BEGIN
+            UPDATE transactions SET ts = CAST(strftime('%s', NEW.transaction_date) AS INTEGER)
+            WHERE id = NEW.id;
+        END
+    ''')
+    # Same shapes as the text indexes: covering for range sums and per-category totals, and (ts, rowid) for keyset pages
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_ts
+        ON transactions (user_id, ts, category, amount)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_category_ts
+        ON transactions (user_id, category, ts, amount)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_ts_history
+        ON transactions (user_id, ts)
+    ''')
+    # Nothing to backfill in a new database: switch to the integer indexes right away
+    if conn.execute("SELECT 1 FROM transactions LIMIT 1").fetchone() is None:
+        drop_text_date_indexes(conn)
+
+def rebuild_table(conn: sqlite3.Connection, table: str, create_sql: str, select_sql: str):
+    """
+    Replace a table with a new definition, the only way SQLite can change a column's type.
+    
+    create_sql creates "{table}_new"; select_sql fills it from the old
+    table. The table's indexes and triggers are recreated from their stored
+    SQL, and an AUTOINCREMENT counter never moves backwards.
+    """
+    schema = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (table,)
+    )]
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    conn.execute(create_sql)
+    conn.execute(f"INSERT INTO {table}_new {select_sql}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    for sql in schema:
+        conn.execute(sql)
+    if sequence is not None:
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table))
+
+@migration(6, "Amounts as INTEGER minor units of the user's currency")
+def store_minor_units(conn: sqlite3.Connection):
+    # The exponents as they were when this migration was written, not config's current ones,
+    # so version 6 means the same conversion whenever a database is upgraded
+    exponents = {'INR': 2, 'USD': 2, 'EUR': 2, 'GBP': 2, 'JPY': 0, 'CAD': 2, 'AUD': 2}
+    default_exponent = 2
+    factor = "CASE u.currency {} ELSE {} END".format(
+        ' '.join(f"WHEN '{code}' THEN {10 ** exponent}" for code, exponent in exponents.items()),
+        10 ** default_exponent
+    )
+    rebuild_table(conn, 'transactions', '''
+        CREATE TABLE transactions_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            description TEXT,
+            transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ts INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    ''', f'''
+        SELECT t.id, t.user_id, CAST(ROUND(t.amount * {factor}) AS INTEGER), t.category, t.description,
+               t.transaction_date, t.ts
+        FROM transactions t LEFT JOIN users u ON u.user_id = t.user_id
+    ''')
+    rebuild_table(conn, 'budgets', '''
+        CREATE TABLE budgets_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            UNIQUE(user_id, category),
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    ''', f'''
+        SELECT b.id, b.user_id, b.category, CAST(ROUND(b.amount * {factor}) AS INTEGER)
+        FROM budgets b LEFT JOIN users u ON u.user_id = b.user_id
+    ''')
+    # The rollup is derived data: recreate it from the converted amounts.
+    # Dropped in place, not renamed, since the transactions triggers refer to it by name
+    conn.execute("DROP TABLE monthly_category_totals")
+    conn.execute('''
+        CREATE TABLE monthly_category_totals (
+            user_id INTEGER NOT NULL,
+            year_month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            txn_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, year_month, category)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        INSERT INTO monthly_category_totals (user_id, year_month, category, total, txn_count)
+        SELECT user_id, substr(transaction_date, 1, 7), category, SUM(amount), COUNT(*)
+        FROM transactions
+        GROUP BY user_id, substr(transaction_date, 1, 7), category
+    ''')
+
+# Currency of a row inserted without one: its user's, as set at that moment
+ROW_CURRENCY = "COALESCE(NEW.currency, (SELECT currency FROM users WHERE user_id = NEW.user_id), 'INR')"
+
+@migration(7, "Original currency per transaction, exchange rates, and a rollup per currency")
+def add_transaction_currency(conn: sqlite3.Connection):
+    # Until now every amount was in its user's current currency
+    conn.execute("ALTER TABLE transactions ADD COLUMN currency TEXT")
+    conn.execute('''
+        UPDATE transactions
+        SET currency = COALESCE((SELECT currency FROM users WHERE users.user_id = transactions.user_id), 'INR')
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_currency_insert
+        AFTER INSERT ON transactions
+        WHEN NEW.currency IS NULL
+        BEGIN
+            UPDATE transactions SET currency = {ROW_CURRENCY} WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS exchange_rates (
+            currency TEXT PRIMARY KEY,
+            rate REAL NOT NULL,
+            updated_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    
+    # Covering indexes carry the currency too, so per-currency sums never touch the table.
+    # The per-category ones order by (category, currency) for GROUP BY without a sort
+    covering = {
+        'idx_transactions_user_date': '(user_id, transaction_date, category, currency, amount)',
+        'idx_transactions_user_category_date': '(user_id, category, currency, transaction_date, amount)',
+        'idx_transactions_user_ts': '(user_id, ts, category, currency, amount)',
+        'idx_transactions_user_category_ts': '(user_id, category, currency, ts, amount)'
+    }
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    for name, columns in covering.items():
+        # The text-date ones may already be gone after the timestamp backfill
+        if name in existing:
+            conn.execute(f"DROP INDEX {name}")
+            conn.execute(f"CREATE INDEX {name} ON transactions {columns}")
+    
+    # Sums in different currencies can't be added, so the rollup gets currency in its key
+    for trigger in ('insert', 'delete', 'update'):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_transactions_rollup_{trigger}")
+    conn.execute("DROP TABLE monthly_category_totals")
+    conn.execute('''
+        CREATE TABLE monthly_category_totals (
+            user_id INTEGER NOT NULL,
+            year_month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            txn_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, year_month, category, currency)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER trg_transactions_rollup_insert
+        AFTER INSERT ON transactions
+        BEGIN
+            INSERT INTO monthly_category_totals (user_id, year_month, category, currency, total, txn_count)
+            VALUES (NEW.user_id, substr(NEW.transaction_date, 1, 7), NEW.category, {ROW_CURRENCY}, NEW.amount, 1)
+            ON CONFLICT (user_id, year_month, category, currency)
+            DO UPDATE SET total = total + excluded.total, txn_count = txn_count + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER trg_transactions_rollup_delete
+        AFTER DELETE ON transactions
+        BEGIN
+            UPDATE monthly_category_totals
+            SET total = total - OLD.amount, txn_count = txn_count - 1
+            WHERE user_id = OLD.user_id
+              AND year_month = substr(OLD.transaction_date, 1, 7)
+              AND category = OLD.category
+              AND currency = OLD.currency;
+            DELETE FROM monthly_category_totals
+            WHERE user_id = OLD.user_id
+              AND year_month = substr(OLD.transaction_date, 1, 7)
+              AND category = OLD.category
+              AND currency = OLD.currency
+              AND txn_count <= 0;
+        END
+    ''')
+    # Filling in the currency of a row inserted without one moves nothing: the insert trigger already used it
+    conn.execute(f'''
+        CREATE TRIGGER trg_transactions_rollup_update
+        AFTER UPDATE OF user_id, amount, category, transaction_date, currency ON transactions
+        WHEN OLD.currency IS NOT NULL
+        BEGIN
+            UPDATE monthly_category_totals
+            SET total = total - OLD.amount, txn_count = txn_count - 1
+            WHERE user_id = OLD.user_id
+              AND year_month = substr(OLD.transaction_date, 1, 7)
+              AND category = OLD.category
+              AND currency = OLD.currency;
+            DELETE FROM monthly_category_totals
+            WHERE user_id = OLD.user_id
+              AND year_month = substr(OLD.transaction_date, 1, 7)
+              AND category = OLD.category
+              AND currency = OLD.currency
+              AND txn_count <= 0;
+            INSERT INTO monthly_category_totals (user_id, year_month, category, currency, total, txn_count)
+            VALUES (NEW.user_id, substr(NEW.transaction_date, 1, 7), NEW.category, {ROW_CURRENCY}, NEW.amount, 1)
+            ON CONFLICT (user_id, year_month, category, currency)
+            DO UPDATE SET total = total + excluded.total, txn_count = txn_count + 1;
+        END
+    ''')
+    conn.execute('''
+        INSERT INTO monthly_category_totals (user_id, year_month, category, currency, total, txn_count)
+        SELECT user_id, substr(transaction_date, 1, 7), category, currency, SUM(amount), COUNT(*)
+        FROM transactions
+        GROUP BY user_id, substr(transaction_date, 1, 7), category, currency
+    ''')
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Move users between SQLite shard files when the number of worker processes changes.
+
+Reads every shard of the old layout and writes each user's profile, budgets
+and transactions into the shard that owns them in the new layout. The
+monthly rollup is rebuilt by the transactions triggers as rows arrive, the
+exchange rates are copied to every shard, and cached chart file_ids are not
+copied. Transactions get new IDs in their new shard, so IDs shown by
+/listhistory change. Stop the bot before resharding. The old files are
+left in place until you delete them (or pass --delete-old).
+
+Usage: python -m database.reshard --from N --to M [--db PATH] [--delete-old]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+from typing import Dict, List
+from config import DATABASE_PATH
+from database.db_setup import create_tables
+from database.sharding import shard_for_user, shard_paths
+
+TRANSACTION_COLUMNS = "user_id, amount, category, description, transaction_date, currency"
+
+def _totals(paths: List[str]) -> Dict[str, int]:
+    """Row counts and amount sums per currency across a set of shard files, to verify nothing was lost."""
+    totals = {'users': 0, 'budgets': 0, 'transactions': 0}
+    for path in paths:
+        conn = sqlite3.connect(path)
+        try:
+            totals['users'] += conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+            totals['budgets'] += conn.execute("SELECT COUNT(*) FROM budgets").fetchone()[0]
+            totals['transactions'] += conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+            for currency, amount in conn.execute("SELECT currency, SUM(amount) FROM transactions GROUP BY currency"):
+                totals[f'amount_{currency}'] = totals.get(f'amount_{currency}', 0) + amount
+        finally:
+            conn.close()
+    return totals
+
+def reshard(base_path: str, old_count: int, new_count: int, delete_old: bool = False) -> Dict[str, int]:
+    """
+    Redistribute every user from the old_count layout into the new_count layout.
+    
+    Returns how many users landed in each new shard file.
+    """
+    if old_count == new_count:
+        raise ValueError("Old and new shard counts are the same; nothing to do")
+    old_paths = [path for path in shard_paths(base_path, old_count) if os.path.exists(path)]
+    if not old_paths:
+        raise FileNotFoundError(f"No shard files found for {old_count} shard(s) of {base_path}")
+    new_paths = shard_paths(base_path, new_count)
+    existing = [path for path in new_paths if os.path.exists(path)]
+    if existing:
+        raise FileExistsError(f"Target shard files already exist: {', '.join(existing)}")
+    
+    # Build the new layout under temporary names so a failed run leaves nothing half-written
+    building = [path + '.resharding' for path in new_paths]
+    for path in building:
+        for leftover in (path, path + '-wal', path + '-shm'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        create_tables(path)
+    targets = [sqlite3.connect(path) for path in building]
+    moved = {path: 0 for path in new_paths}
+    
+    try:
+        # Every shard converts with the same exchange rates
+        source = sqlite3.connect(old_paths[0])
+        try:
+            rates = source.execute("SELECT currency, rate, updated_at FROM exchange_rates").fetchall()
+        finally:
+            source.close()
+        for target in targets:
+            target.executemany("INSERT INTO exchange_rates (currency, rate, updated_at) VALUES (?, ?, ?)", rates)
+        
+        for source_path in old_paths:
+            source = sqlite3.connect(source_path)
+            try:
+                user_ids = [row[0] for row in source.execute(
+                    "SELECT user_id FROM users UNION SELECT user_id FROM budgets "
+                    "UNION SELECT user_id FROM transactions"
+                )]
+                for user_id in user_ids:
+                    index = shard_for_user(user_id, new_count)
+                    target = targets[index]
+                    target.executemany(
+                        "INSERT INTO users (user_id, currency, created_at, timezone) VALUES (?, ?, ?, ?)",
+                        source.execute(
+                            "SELECT user_id, currency, created_at, timezone FROM users WHERE user_id = ?", (user_id,)
+                        )
+                    )
+                    target.executemany(
+                        "INSERT INTO budgets (user_id, category, amount) VALUES (?, ?, ?)",
+                        source.execute("SELECT user_id, category, amount FROM budgets WHERE user_id = ?", (user_id,))
+                    )
+                    target.executemany(
+                        f"INSERT INTO transactions ({TRANSACTION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                        source.execute(
+                            f"SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE user_id = ? "
+                            "ORDER BY transaction_date, id",
+                            (user_id,)
+                        )
+                    )
+                    moved[new_paths[index]] += 1
+            finally:
+                source.close()
+        for target in targets:
+            target.commit()
+    finally:
+        for target in targets:
+            target.close()
+    
+    before, after = _totals(old_paths), _totals(building)
+    # Amounts are integer minor units, so the sums must match exactly
+    if before != after:
+        for path in building:
+            os.remove(path)
+        raise RuntimeError(f"Resharded data does not match the source: before {before}, after {after}")
+    
+    for path, final in zip(building, new_paths):
+        os.replace(path, final)
+    if delete_old:
+        for path in old_paths:
+            for leftover in (path, path + '-wal', path + '-shm'):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+    return moved
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--from', dest='old_count', type=int, required=True, help='current number of shards')
+    parser.add_argument('--to', dest='new_count', type=int, required=True, help='new number of shards')
+    parser.add_argument('--db', default=DATABASE_PATH, help='base database path the shard names derive from')
+    parser.add_argument('--delete-old', action='store_true', help='remove the old shard files afterwards')
+    args = parser.parse_args()
+    
+    try:
+        moved = reshard(args.db, args.old_count, args.new_count, args.delete_old)
+    except (ValueError, FileNotFoundError, FileExistsError, RuntimeError) as e:
+        print(f"❌ {e}")
+        return 1
+    for path, users in moved.items():
+        print(f"📦 {path}: {users} users")
+    print(f"✅ Resharded {sum(moved.values())} users from {args.old_count} to {args.new_count} shard(s)")
+    if not args.delete_old:
+        print("🗂️ The old shard files were kept; delete them once the bot runs fine on the new layout")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
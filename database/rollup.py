@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Consistency checker for the monthly_category_totals rollup.
+
+Rebuilds the rollup from raw transactions and diffs it against the stored
+table. Run with --repair to replace the stored rollup with the rebuilt one.
+
+Usage: python -m database.rollup [--db PATH] [--repair]
+"""
+
+import argparse
+import sqlite3
+import sys
+from typing import Dict, List, Tuple
+from config import DATABASE_PATH
+
+RollupKey = Tuple[int, str, str, str]
+
+REBUILD_QUERY = '''
+    SELECT user_id, substr(transaction_date, 1, 7), category, currency, SUM(amount), COUNT(*)
+    FROM transactions
+    GROUP BY user_id, substr(transaction_date, 1, 7), category, currency
+'''
+
+def rebuild_rollup(conn: sqlite3.Connection) -> Dict[RollupKey, Tuple[int, int]]:
+    """Compute the rollup from raw transactions."""
+    return {(row[0], row[1], row[2], row[3]): (row[4], row[5]) for row in conn.execute(REBUILD_QUERY)}
+
+def load_rollup(conn: sqlite3.Connection) -> Dict[RollupKey, Tuple[int, int]]:
+    """Load the incrementally maintained rollup."""
+    rows = conn.execute(
+        "SELECT user_id, year_month, category, currency, total, txn_count FROM monthly_category_totals"
+    )
+    return {(row[0], row[1], row[2], row[3]): (row[4], row[5]) for row in rows}
+
+def check_rollup(conn: sqlite3.Connection) -> List[Dict]:
+    """Return every rollup row that disagrees with the raw transactions."""
+    expected = rebuild_rollup(conn)
+    actual = load_rollup(conn)
+    
+    differences = []
+    for key in sorted(expected.keys() | actual.keys()):
+        # Totals are integer minor units, so they must match exactly
+        want = expected.get(key, (0, 0))
+        have = actual.get(key, (0, 0))
+        if want != have:
+            differences.append({
+                'user_id': key[0],
+                'year_month': key[1],
+                'category': key[2],
+                'currency': key[3],
+                'expected_total': want[0],
+                'actual_total': have[0],
+                'expected_count': want[1],
+                'actual_count': have[1]
+            })
+    return differences
+
+def repair_rollup(conn: sqlite3.Connection):
+    """Replace the stored rollup with one rebuilt from raw transactions."""
+    with conn:
+        conn.execute("DELETE FROM monthly_category_totals")
+        conn.execute(f'''
+            INSERT INTO monthly_category_totals (user_id, year_month, category, currency, total, txn_count)
+            {REBUILD_QUERY}
+        ''')
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=DATABASE_PATH, help='database file to check')
+    parser.add_argument('--repair', action='store_true', help='rebuild the rollup when differences are found')
+    args = parser.parse_args()
+    
+    conn = sqlite3.connect(args.db)
+    try:
+        differences = check_rollup(conn)
+        for diff in differences:
+            print(
+                f"user {diff['user_id']} {diff['year_month']} {diff['category']} {diff['currency']}: "
+                f"expected {diff['expected_total']} ({diff['expected_count']} txns), "
+                f"found {diff['actual_total']} ({diff['actual_count']} txns)"
+            )
+        if not differences:
+            print("✅ Rollup is consistent with transactions")
+            return 0
+        if args.repair:
+            repair_rollup(conn)
+            print(f"🔧 Rebuilt rollup ({len(differences)} rows differed)")
+            return 0
+        print(f"❌ {len(differences)} rollup rows differ (use --repair to rebuild)")
+        return 1
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
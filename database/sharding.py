@@ -0,0 +1,32 @@
+import os
+import zlib
+from typing import List
+
+def shard_for_user(user_id: int, shard_count: int) -> int:
+    """
+    Pick the shard that owns a user's data.
+    
+    crc32 spreads sequential Telegram IDs evenly and, unlike hash(), gives
+    the same answer in every process.
+    """
+    if shard_count <= 1:
+        return 0
+    return zlib.crc32(str(user_id).encode('ascii')) % shard_count
+
+def shard_path(base_path: str, index: int, shard_count: int) -> str:
+    """
+    Return the SQLite file for one shard.
+    
+    A single shard is the plain database file. Otherwise the shard count is
+    part of the name ('personal_finance.shard-2-of-4.db'), so the files of
+    two layouts never overlap and resharding can build the new set beside
+    the old one.
+    """
+    if shard_count <= 1:
+        return base_path
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.shard-{index + 1}-of-{shard_count}{ext}"
+
+def shard_paths(base_path: str, shard_count: int) -> List[str]:
+    """Return every shard file of a layout, in shard order."""
+    return [shard_path(base_path, index, shard_count) for index in range(max(shard_count, 1))]
@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from config import USER_CACHE_SIZE, USER_CACHE_TTL
+
+class UserCache:
+    """
+    Bounded LRU cache of user rows with a time-to-live.
+    
+    Every command starts by loading the user just to read their currency, so
+    DatabaseOperations.get_user answers from here and only goes to SQLite on
+    a miss. Writes to the users table invalidate the entry; the TTL bounds how
+    stale an entry can get if the row is changed behind the bot's back.
+    """
+    
+    def __init__(self, max_entries: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[int, Tuple[float, Dict]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, user_id: int) -> Optional[Dict]:
+        """Return a copy of the cached user, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                expires_at, user = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return dict(user)
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+    
+    @property
+    def generation(self) -> int:
+        """Changes on every invalidation; pass it to put() to drop reads that raced a write."""
+        return self._generation
+    
+    def put(self, user_id: int, user: Dict, generation: Optional[int] = None):
+        """Cache a user row, unless it was read before an invalidation that has since happened."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl, dict(user))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, user_id: int):
+        """Forget a user after their row changed."""
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(user_id, None)
+    
+    def clear(self):
+        """Forget every user."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        """Return hit, miss and eviction counters along with the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
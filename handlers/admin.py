@@ -0,0 +1,94 @@
+from telegram import Update
+from telegram.ext import ContextTypes
+from config import ADMIN_USER_IDS, ANALYTICS_CACHE_ENABLED
+from database.db_operations import db_ops
+from utils.metrics import metrics
+from utils.chart_service import chart_service
+from utils.chart_cache import chart_cache
+from utils.admission import admission
+from utils.analytics_cache import analytics_cache
+
+STATS_TOP_N = 8  # Rows shown per section of /stats
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the /stats command: latency and error counters for bot admins."""
+    if update.effective_user.id not in ADMIN_USER_IDS:
+        await update.message.reply_text("🔒 /stats is only available to the bot's admins.")
+        return
+    
+    sections = [
+        format_latency_section("🤖 Handlers", 'bot_handler_seconds', 'bot_handler_errors_total', 'handler'),
+        format_latency_section("🗄️ Database", 'bot_db_call_seconds', 'bot_db_errors_total', 'method')
+    ]
+    
+    for key, pool_wait in sorted(metrics.histograms('bot_db_pool_wait_seconds').items()):
+        if pool_wait.count:
+            sections.append(
+                f"⏳ DB {dict(key).get('pool', '?')} queue wait: avg {pool_wait.sum / pool_wait.count * 1000:.2f}ms, "
+                f"p95 ≤{format_ms(pool_wait.quantile(0.95))} over {pool_wait.count:,} calls"
+            )
+    
+    users = db_ops.user_cache.stats()
+    sections.append(f"👤 User cache: {users['entries']:,} users, hit ratio {users['hit_ratio']:.0%}")
+    if ANALYTICS_CACHE_ENABLED:
+        series = analytics_cache.stats()
+        sections.append(
+            f"🧮 Analytics cache: {series['users']:,} users in {series['size_bytes'] / 1024 / 1024:.1f} MiB, "
+            f"hit ratio {series['hit_ratio']:.0%}"
+        )
+    
+    restarts = context.bot_data.get('worker_restarts')
+    if restarts is not None:
+        restarted = [f"#{index + 1} × {count}" for index, count in enumerate(restarts) if count]
+        sections.append(f"🧩 Workers: {len(restarts)}, restarted after dying: {', '.join(restarted) or 'none'}")
+    
+    limits = admission.stats()
+    sections.append(
+        f"🚦 Admission: {limits['admitted']:,} admitted, {limits['rejected']:,} rate-limited, "
+        f"{limits['busy']:,} turned away busy, {limits['tracked_users']:,} users tracked"
+    )
+    
+    stages = metrics.histograms('bot_chart_stage_seconds')
+    if stages:
+        lines = ["📈 Charts"]
+        for key, histogram in sorted(stages.items()):
+            stage = dict(key).get('stage', '?')
+            lines.append(
+                f"• {stage}: {histogram.count:,} × avg {histogram.sum / histogram.count * 1000:.1f}ms, "
+                f"p95 ≤{format_ms(histogram.quantile(0.95))}"
+            )
+        service = chart_service.metrics
+        cache = chart_cache.stats()
+        lines.append(
+            f"• rejected {service['rejected']}, timeouts {service['timeouts']}, errors {service['errors']}, "
+            f"cache hit ratio {cache['hit_ratio']:.0%}"
+        )
+        sections.append('\n'.join(lines))
+    
+    await update.message.reply_text('📊 Bot Stats\n\n' + '\n\n'.join(sections))
+
+def format_latency_section(title: str, histogram_name: str, errors_name: str, label: str) -> str:
+    """List the series with the most total time, with call counts, p95 and errors."""
+    histograms = metrics.histograms(histogram_name)
+    if not histograms:
+        return f"{title}\n• no calls yet"
+    errors = {dict(key).get(label): count for key, count in metrics.counters(errors_name).items()}
+    
+    lines = [title]
+    busiest = sorted(histograms.items(), key=lambda item: -item[1].sum)[:STATS_TOP_N]
+    for key, histogram in busiest:
+        name = dict(key).get(label, '?')
+        line = (
+            f"• {name}: {histogram.count:,} calls, avg {histogram.sum / histogram.count * 1000:.2f}ms, "
+            f"p95 ≤{format_ms(histogram.quantile(0.95))}"
+        )
+        if errors.get(name):
+            line += f", ❌ {errors[name]:g} errors"
+        lines.append(line)
+    return '\n'.join(lines)
+
+def format_ms(seconds: float) -> str:
+    """Format a histogram bucket bound in milliseconds."""
+    if seconds == float('inf'):
+        return '∞'
+    return f"{seconds * 1000:g}ms"
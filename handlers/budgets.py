@@ -1,8 +1,9 @@
-import re
 from telegram import Update
 from telegram.ext import ContextTypes
-from database.db_operations import db_ops
+from database.db_operations import db_ops, current_year_month
 from utils.chart_generator import format_currency
+from utils.expense_parser import BUDGET_RE
+from utils.money import parse_amount
 
 async def budget_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the /budget command to set budgets."""
@@ -27,8 +28,7 @@ async def budget_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Parse the budget using regex
     # Pattern: #category amount
-    pattern = r'^(#\w+)\s+(\d+(?:\.\d+)?)$'
-    match = re.match(pattern, text, re.IGNORECASE)
+    match = BUDGET_RE.match(text)
     
     if not match:
         await update.message.reply_text(
@@ -42,7 +42,7 @@ async def budget_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     category = match.group(1).lower()  # Convert to lowercase for consistency
-    amount = float(match.group(2))
+    amount = parse_amount(match.group(2), user['currency'])
     
     if amount <= 0:
         await update.message.reply_text("❌ Budget amount must be greater than 0.")
@@ -69,8 +69,8 @@ async def view_budgets_command(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.message.reply_text("Please start with /start first!")
         return
     
-    # Get all budgets
-    budgets = await db_ops.get_budgets(user_id)
+    # Get all budgets with this month's spending in a single query
+    budgets = await db_ops.get_budget_status(user_id, current_year_month(), user['currency'])
     
     if not budgets:
         await update.message.reply_text(
@@ -80,15 +80,12 @@ async def view_budgets_command(update: Update, context: ContextTypes.DEFAULT_TYP
         )
         return
     
-    # Get current month spending for each category
     message = "📊 Your Monthly Budgets:\n\n"
     
     for budget in budgets:
         category = budget['category']
         budget_amount = budget['amount']
-        
-        # Get current spending for this category
-        current_spending = await db_ops.get_current_month_spending_by_category(user_id, category)
+        current_spending = budget['spent']
         
         # Calculate percentage
         percentage = (current_spending / budget_amount) * 100 if budget_amount > 0 else 0
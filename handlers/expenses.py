@@ -1,9 +1,12 @@
-import re
 from datetime import datetime
-from telegram import Update
+from typing import Optional
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from database.db_operations import db_ops
+from config import DEFAULT_HISTORY_LIMIT, MAX_EXPENSES_PER_MESSAGE, MAX_HISTORY_LIMIT
+from database.db_operations import db_ops, current_year_month
 from utils.chart_generator import format_currency
+from utils.expense_parser import EXPENSE_RE, split_expenses
+from utils.money import parse_amount
 
 async def log_expense_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the /log and /spent commands."""
@@ -37,12 +40,27 @@ async def log_expense_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return
     
-    # Parse the expense using regex
-    # Pattern: amount on #category [for description]
-    pattern = r'^(\d+(?:\.\d+)?)\s+on\s+(#\w+)(?:\s+for\s+(.+))?$'
-    match = re.match(pattern, text, re.IGNORECASE)
+    entries = split_expenses(text)
+    if len(entries) > MAX_EXPENSES_PER_MESSAGE:
+        await update.message.reply_text(
+            f"😅 That's a lot of receipts! Please log at most {MAX_EXPENSES_PER_MESSAGE} expenses per message."
+        )
+        return
     
-    if not match:
+    # Parse every entry before saving any, so a typo doesn't leave half a message logged
+    expenses = []
+    invalid = []
+    for entry in entries:
+        match = EXPENSE_RE.match(entry)
+        if not match:
+            invalid.append(entry)
+            continue
+        # Minor units straight from the typed digits, so 0.1 + 0.2 adds up to exactly 0.3
+        amount = parse_amount(match.group(1), user['currency'])
+        category = match.group(2).lower()  # Convert to lowercase for consistency
+        expenses.append((amount, category, match.group(3) or None))
+    
+    if invalid and len(entries) == 1:
         await update.message.reply_text(
             "🤖 Hmm, I didn't understand that format!\n\n"
             "**Correct format:** `/log <amount> on #<category> [for <description>]`\n\n"
@@ -55,13 +73,21 @@ async def log_expense_command(update: Update, context: ContextTypes.DEFAULT_TYPE
             parse_mode='Markdown'
         )
         return
+    if invalid:
+        lines = '\n'.join(f"• `{entry}`" for entry in invalid)
+        await update.message.reply_text(
+            f"🤖 I couldn't read these, so nothing was logged:\n{lines}\n\n"
+            "**Each expense:** `<amount> on #<category> [for <description>]`\n"
+            "Put one per line or separate them with `;` 💪",
+            parse_mode='Markdown'
+        )
+        return
     
-    amount = float(match.group(1))
-    category = match.group(2).lower()  # Convert to lowercase for consistency
-    description = match.group(3) if match.group(3) else None
-    
-    # Log the expense
-    success = await db_ops.log_expense(user_id, amount, category, description)
+    # Log the expenses: a single one can share a write-behind commit, several go in one transaction
+    if len(expenses) == 1:
+        success = await db_ops.log_expense(user_id, *expenses[0], currency=user['currency'])
+    else:
+        success = await db_ops.log_expenses(user_id, expenses, user['currency']) == len(expenses)
     
     if not success:
         await update.message.reply_text(
@@ -70,29 +96,52 @@ async def log_expense_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return
     
+    # Budgets of every category in the message, in one query
+    categories = list(dict.fromkeys(category for _, category, _ in expenses))
+    budgets = await db_ops.get_categories_budget_status(user_id, categories, current_year_month(), user['currency'])
+    
     # Format confirmation message
-    formatted_amount = format_currency(amount, user['currency'])
-    confirmation = f"✅ **Logged successfully!**\n💰 {formatted_amount} on {category}"
-    if description:
-        confirmation += f"\n📝 {description}"
-    
-    # Check budget and add warning if necessary
-    budget_amount = await db_ops.get_budget_for_category(user_id, category)
-    if budget_amount:
-        current_spending = await db_ops.get_current_month_spending_by_category(user_id, category)
-        percentage = (current_spending / budget_amount) * 100
-        
-        if percentage >= 100:
-            confirmation += f"\n\n🚨 **Budget Alert!** You've exceeded your {category} budget by {percentage-100:.1f}%! 😱"
-        elif percentage >= 80:
-            confirmation += f"\n\n⚠️ **Heads up!** You've spent {percentage:.1f}% of your {category} budget this month. 🤔"
-        else:
-            confirmation += f"\n\n📊 Budget status: {percentage:.1f}% of {category} budget used 👍"
+    if len(expenses) == 1:
+        amount, category, description = expenses[0]
+        confirmation = f"✅ **Logged successfully!**\n💰 {format_currency(amount, user['currency'])} on {category}"
+        if description:
+            confirmation += f"\n📝 {description}"
     else:
-        confirmation += f"\n\n💡 **Tip:** Set a budget for {category} with `/budget {category} <amount>`"
+        confirmation = f"✅ **Logged {len(expenses)} expenses!**"
+        for amount, category, description in expenses:
+            confirmation += f"\n💰 {format_currency(amount, user['currency'])} on {category}"
+            if description:
+                confirmation += f" 📝 {description}"
+        total = sum(amount for amount, _, _ in expenses)
+        confirmation += f"\n🧾 **Total:** {format_currency(total, user['currency'])}"
+    
+    # Check budgets and add warnings if necessary
+    confirmation += "\n"
+    unbudgeted = []
+    for category in categories:
+        budget = budgets.get(category)
+        if budget and budget['amount']:
+            confirmation += f"\n{format_budget_status(category, budget)}"
+        else:
+            unbudgeted.append(category)
+    if unbudgeted:
+        category = unbudgeted[0] if len(unbudgeted) == 1 else '<category>'
+        confirmation += (
+            f"\n💡 **Tip:** Set a budget for {', '.join(unbudgeted)} with `/budget {category} <amount>`"
+        )
     
     await update.message.reply_text(confirmation, parse_mode='Markdown')
 
+def format_budget_status(category: str, budget: dict) -> str:
+    """One line on how much of a category's monthly budget is used."""
+    percentage = (budget['spent'] / budget['amount']) * 100
+    
+    if percentage >= 100:
+        return f"🚨 **Budget Alert!** You've exceeded your {category} budget by {percentage-100:.1f}%! 😱"
+    elif percentage >= 80:
+        return f"⚠️ **Heads up!** You've spent {percentage:.1f}% of your {category} budget this month. 🤔"
+    return f"📊 Budget status: {percentage:.1f}% of {category} budget used 👍"
+
 async def delete_transaction_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the /delete command."""
     user_id = update.effective_user.id
@@ -132,27 +181,73 @@ async def list_history_command(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.message.reply_text("Please start with /start first!")
         return
     
-    # Get limit from args
-    limit = 10  # default
+    # Get page size from args
+    limit = DEFAULT_HISTORY_LIMIT
     if context.args:
         try:
             limit = int(context.args[0])
-            if limit <= 0 or limit > 50:
-                await update.message.reply_text("Please provide a limit between 1 and 50.")
+            if limit <= 0 or limit > MAX_HISTORY_LIMIT:
+                await update.message.reply_text(f"Please provide a limit between 1 and {MAX_HISTORY_LIMIT}.")
                 return
         except ValueError:
             await update.message.reply_text("❌ Invalid number. Please provide a valid limit.")
             return
     
-    # Get transaction history
-    transactions = await db_ops.get_transaction_history(user_id, limit)
+    # Get the newest page of transaction history
+    page = await db_ops.get_transaction_page(user_id, page_size=limit)
     
-    if not transactions:
+    if not page['transactions']:
         await update.message.reply_text("No transactions found.")
         return
     
-    # Format the message
-    message = f"📋 Your Last {len(transactions)} Transactions:\n\n"
+    await update.message.reply_text(
+        format_history_page(page, user['currency'], newest=True),
+        reply_markup=build_history_keyboard(page, limit)
+    )
+
+async def history_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the Older/Newer buttons under a /listhistory page."""
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    try:
+        _, direction, page_size, transaction_id, position = query.data.split(':', 4)
+        page_size = min(max(int(page_size), 1), MAX_HISTORY_LIMIT)
+        cursor = (position, int(transaction_id))
+    except ValueError:
+        await query.answer("This page is no longer available.")
+        return
+    
+    user = await db_ops.get_user(user_id)
+    if not user:
+        await query.answer("Please start with /start first!")
+        return
+    
+    if direction == 'older':
+        page = await db_ops.get_transaction_page(user_id, before_cursor=cursor, page_size=page_size)
+    else:
+        page = await db_ops.get_transaction_page(user_id, after_cursor=cursor, page_size=page_size)
+        if not page['transactions']:
+            # Nothing newer any more (e.g. deletions), so go back to the first page
+            page = await db_ops.get_transaction_page(user_id, page_size=page_size)
+    
+    await query.answer()
+    if not page['transactions']:
+        await query.edit_message_text("No more transactions.")
+        return
+    
+    await query.edit_message_text(
+        format_history_page(page, user['currency'], newest=not page['has_newer']),
+        reply_markup=build_history_keyboard(page, page_size)
+    )
+
+def format_history_page(page: dict, currency: str, newest: bool) -> str:
+    """Format one page of transactions, each in the currency it was logged in (currency if unknown)."""
+    transactions = page['transactions']
+    if newest:
+        message = f"📋 Your Last {len(transactions)} Transactions:\n\n"
+    else:
+        message = f"📋 Older Transactions ({len(transactions)}):\n\n"
     
     for transaction in transactions:
         # Parse the date
@@ -160,7 +255,7 @@ async def list_history_command(update: Update, context: ContextTypes.DEFAULT_TYP
         formatted_date = date_obj.strftime("%d-%b")
         
         # Format amount
-        formatted_amount = format_currency(transaction['amount'], user['currency'])
+        formatted_amount = format_currency(transaction['amount'], transaction.get('currency') or currency)
         
         # Create transaction line
         line = f"ID: {transaction['id']} | {formatted_date} | {formatted_amount} | {transaction['category']}"
@@ -171,5 +266,26 @@ async def list_history_command(update: Update, context: ContextTypes.DEFAULT_TYP
         message += line + "\n"
     
     message += f"\n💡 Use /delete <ID> to remove a transaction"
+    return message
+
+def build_history_keyboard(page: dict, page_size: int) -> Optional[InlineKeyboardMarkup]:
+    """
+    Build Newer/Older buttons that carry the page's keyset cursors.
     
-    await update.message.reply_text(message)
+    Callback data is 'hist:<direction>:<page size>:<id>:<cursor>', well under
+    Telegram's 64-byte limit. The cursor is the epoch seconds of the
+    transaction, or its date text while timestamps are still being backfilled.
+    """
+    transactions = page['transactions']
+    buttons = []
+    if page['has_newer']:
+        first = transactions[0]
+        buttons.append(InlineKeyboardButton(
+            "⬅️ Newer", callback_data=f"hist:newer:{page_size}:{first['id']}:{first['cursor']}"
+        ))
+    if page['has_older']:
+        last = transactions[-1]
+        buttons.append(InlineKeyboardButton(
+            "Older ➡️", callback_data=f"hist:older:{page_size}:{last['id']}:{last['cursor']}"
+        ))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime, timedelta
+from telegram import Update
+from telegram.ext import ContextTypes
+from database.db_operations import db_ops, user_timezone
+from utils.exporter import TransactionExportWriter, EXPORT_FORMATS
+
+# Telegram's bot upload limit for documents
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /export [csv|jsonl] [from] [to]: send the full transaction history as a gzip file."""
+    user_id = update.effective_user.id
+    
+    # Get user to make sure they have started
+    user = await db_ops.get_user(user_id)
+    if not user:
+        await update.message.reply_text("Please start with /start first!")
+        return
+    
+    args = list(context.args or [])
+    fmt = 'csv'
+    if args and args[0].lower() in EXPORT_FORMATS:
+        fmt = args.pop(0).lower()
+    
+    # Dates are days in the user's time zone
+    tz = user_timezone(user)
+    try:
+        start_date = datetime.strptime(args[0], '%Y-%m-%d').replace(tzinfo=tz) if len(args) > 0 else None
+        # The end date is inclusive for the user, so export up to the next midnight
+        end_date = datetime.strptime(args[1], '%Y-%m-%d').replace(tzinfo=tz) + timedelta(days=1) if len(args) > 1 else None
+    except ValueError:
+        await update.message.reply_text(
+            "❌ Invalid format!\n\n"
+            "Usage: /export [csv|jsonl] [from] [to]\n"
+            "Examples:\n"
+            "• /export\n"
+            "• /export jsonl\n"
+            "• /export csv 2024-01-01 2024-03-31"
+        )
+        return
+    
+    writer = TransactionExportWriter(fmt)
+    try:
+        exported = await db_ops.export_transactions(user_id, writer.write_rows, start_date, end_date, tz=tz)
+        if exported == 0:
+            await update.message.reply_text("No transactions found to export.")
+            return
+        
+        loop = asyncio.get_running_loop()
+        export_file = await loop.run_in_executor(None, writer.finish)
+        size = export_file.seek(0, 2)
+        export_file.seek(0)
+        if size > MAX_UPLOAD_BYTES:
+            await update.message.reply_text("❌ The export is too large to send. Try a narrower date range.")
+            return
+        
+        filename = f"transactions-{datetime.now().strftime('%Y%m%d')}{writer.filename_suffix}"
+        await update.message.reply_document(
+            document=export_file,
+            filename=filename,
+            caption=f"📤 {exported} transactions exported"
+        )
+    finally:
+        writer.file.close()
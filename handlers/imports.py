@@ -0,0 +1,105 @@
+import os
+import tempfile
+from datetime import tzinfo
+from typing import Optional
+from telegram import Update
+from telegram.ext import ContextTypes
+from database.db_operations import db_ops, user_timezone
+from config import IMPORT_CHUNK_SIZE, IMPORT_PROGRESS_EVERY, IMPORT_MAX_FILE_BYTES
+from utils.statement_import import iter_statement, StatementFormatError
+
+MAX_REPORTED_ERRORS = 5
+
+async def import_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /import: bulk-load expenses from an uploaded CSV statement."""
+    user_id = update.effective_user.id
+    
+    # Get user to make sure they have started
+    user = await db_ops.get_user(user_id)
+    if not user:
+        await update.message.reply_text("Please start with /start first!")
+        return
+    
+    # The CSV is either attached with /import as its caption, or replied to with /import
+    document = update.message.document
+    if document is None and update.message.reply_to_message:
+        document = update.message.reply_to_message.document
+    
+    if document is None or not (document.file_name or '').lower().endswith('.csv'):
+        await update.message.reply_text(
+            "📥 Send me a CSV file with the caption /import (or reply to one with /import).\n\n"
+            "The first row must be a header. Recognised columns:\n"
+            "• amount (required)\n"
+            "• date (e.g. 2024-03-15 or 15/03/2024)\n"
+            "• category (e.g. food or #food)\n"
+            "• description\n\n"
+            "Example:\n"
+            "date,amount,category,description\n"
+            "2024-03-15,150,food,lunch"
+        )
+        return
+    
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_BYTES:
+        await update.message.reply_text("❌ That file is too large. Please split it into files under 20 MB.")
+        return
+    
+    progress = await update.message.reply_text("📥 Importing your statement...")
+    
+    # Download to disk and stream it from there so memory use doesn't grow with the file
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    try:
+        telegram_file = await document.get_file()
+        await telegram_file.download_to_drive(path)
+        
+        imported, skipped, errors = await import_statement(user_id, path, progress, user['currency'], user_timezone(user))
+    except StatementFormatError as e:
+        await progress.edit_text(f"❌ Could not read the CSV: {e}")
+        return
+    except UnicodeDecodeError:
+        await progress.edit_text("❌ Could not read the CSV. Please save it as UTF-8 and try again.")
+        return
+    finally:
+        os.remove(path)
+    
+    message = f"✅ Import finished: {imported} expenses added"
+    if skipped:
+        message += f", {skipped} rows skipped"
+        message += "\n\n⚠️ Problems found:\n" + "\n".join(f"• {error}" for error in errors)
+        if skipped > len(errors):
+            message += f"\n• ...and {skipped - len(errors)} more"
+    await progress.edit_text(message)
+
+async def import_statement(user_id: int, path: str, progress=None, currency: str = 'INR',
+                           tz: Optional[tzinfo] = None):
+    """
+    Stream a CSV file into the database in chunked transactions, reading dates in tz.
+    
+    Returns (imported, skipped, first few error messages).
+    """
+    imported = 0
+    skipped = 0
+    errors = []
+    chunk = []
+    next_progress = IMPORT_PROGRESS_EVERY
+    
+    with open(path, newline='', encoding='utf-8-sig') as stream:
+        for line_number, row, error in iter_statement(stream, currency, tz):
+            if error:
+                skipped += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f"line {line_number}: {error}")
+                continue
+            
+            chunk.append(row)
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                imported += await db_ops.log_expenses_bulk(user_id, chunk, currency)
+                chunk = []
+                
+                if progress is not None and imported >= next_progress:
+                    await progress.edit_text(f"📥 Importing... {imported} expenses so far")
+                    next_progress += IMPORT_PROGRESS_EVERY
+    
+    if chunk:
+        imported += await db_ops.log_expenses_bulk(user_id, chunk, currency)
+    return imported, skipped, errors
@@ -1,3 +1,5 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo, available_timezones
 from telegram import Update
 from telegram.ext import ContextTypes
 from database.db_operations import db_ops
@@ -60,9 +62,12 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "💰 **Expense Tracking** (The main thing!):\n"
         "`/log <amount> on #<category> [for <description>]`\n"
         "   💡 Example: `/log 150 on #food for pizza night`\n"
+        "   💡 Several at once: one per line or separated by `;`\n"
         "`/spent` - Same as /log (shorter to type!)\n"
         "`/listhistory [N]` - Show your last N expenses\n"
-        "`/delete <ID>` - Remove a wrong entry\n\n"
+        "`/delete <ID>` - Remove a wrong entry\n"
+        "`/import` - Send a CSV statement with this caption to backfill history\n"
+        "`/export [csv|jsonl] [from] [to]` - Download your full history\n\n"
         
         "📊 **Budget Management** (Stay on track!):\n"
         "`/budget #<category> <amount>` - Set monthly limit\n"
@@ -75,7 +80,8 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "   💡 Try: `/summary week` or just `/summary`\n\n"
         
         "⚙️ **Settings**:\n"
-        "`/setcurrency <code>` - USD, EUR, INR, GBP, JPY, CAD, AUD\n\n"
+        "`/setcurrency <code>` - USD, EUR, INR, GBP, JPY, CAD, AUD\n"
+        "`/settimezone <zone>` - When your days start, e.g. Asia/Kolkata\n\n"
         
         "🎯 **Pro Tips**:\n"
         "• Use hashtags for categories: #food #transport #fun\n"
@@ -144,7 +150,8 @@ async def setcurrency_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         await update.message.reply_text(
             f"🎉 Perfect, {user_name}! \n\n"
             f"Your currency is now set to **{currency_name}**\n\n"
-            f"💡 All your expenses will now show in {currency}!\n"
+            f"💡 Summaries and budgets will now show in {currency}! Expenses you already logged "
+            f"keep their own currency and are converted at the stored exchange rates.\n"
             f"Ready to log some expenses? Try: `/log 50 on #coffee`",
             parse_mode='Markdown'
         )
@@ -152,3 +159,49 @@ async def setcurrency_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         await update.message.reply_text(
             "😔 Something went wrong updating your currency. Please try again!"
         )
+
+async def settimezone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the /settimezone command."""
+    user_id = update.effective_user.id
+    user_name = update.effective_user.first_name or "there"
+    
+    user = await db_ops.get_user(user_id)
+    if not user:
+        await update.message.reply_text("Please start with /start first!")
+        return
+    
+    if not context.args:
+        await update.message.reply_text(
+            f"Hey {user_name}! 🕒 Your time zone is `{user.get('timezone') or 'UTC'}`.\n\n"
+            "It decides when your days, weeks and months start in /summary and /export.\n\n"
+            "**Usage:** `/settimezone <Region/City>`\n"
+            "**Example:** `/settimezone Asia/Kolkata`",
+            parse_mode='Markdown'
+        )
+        return
+    
+    # Zone names are case-sensitive on disk; accept any capitalisation
+    requested = context.args[0]
+    zones = {name.lower(): name for name in available_timezones()}
+    timezone_name = zones.get(requested.lower())
+    if timezone_name is None:
+        await update.message.reply_text(
+            f"Oops! 😅 `{requested}` isn't a time zone I know.\n\n"
+            "Use a Region/City name like `Europe/London`, `America/New_York` or `Asia/Kolkata`.",
+            parse_mode='Markdown'
+        )
+        return
+    
+    success = await db_ops.update_user_timezone(user_id, timezone_name)
+    
+    if success:
+        await update.message.reply_text(
+            f"🎉 Done, {user_name}! Your time zone is now `{timezone_name}`.\n\n"
+            "🕒 Your days now start at midnight there "
+            f"(it's {datetime.now(ZoneInfo(timezone_name)):%d-%b %H:%M} now).",
+            parse_mode='Markdown'
+        )
+    else:
+        await update.message.reply_text(
+            "😔 Something went wrong updating your time zone. Please try again!"
+        )
@@ -1,8 +1,18 @@
+import io
+import logging
 from datetime import datetime, timedelta
 from telegram import Update, InputMediaPhoto
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
-from database.db_operations import db_ops
-from utils.chart_generator import generate_pie_chart, format_currency
+from config import ANALYTICS_CACHE_ENABLED
+from database.db_operations import db_ops, current_year_month, user_timezone
+from utils.chart_generator import format_currency
+from utils.chart_service import chart_service, ChartRenderError
+from utils.chart_cache import chart_cache, make_chart_key
+from utils.analytics_cache import analytics_cache
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 async def summary_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the /summary command."""
@@ -24,34 +34,45 @@ async def summary_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
     
-    # Calculate date range
-    now = datetime.now()
+    # Calculate date range in the user's own time zone
+    tz = user_timezone(user)
+    now = datetime.now(tz)
     
     if period == 'today':
-        start_date = datetime(now.year, now.month, now.day)
+        start_date = datetime(now.year, now.month, now.day, tzinfo=tz)
         end_date = start_date + timedelta(days=1) - timedelta(seconds=1)
         period_name = "Today"
     elif period == 'week':
         # Start of current week (Monday)
         start_date = now - timedelta(days=now.weekday())
-        start_date = datetime(start_date.year, start_date.month, start_date.day)
+        start_date = datetime(start_date.year, start_date.month, start_date.day, tzinfo=tz)
         end_date = start_date + timedelta(days=7) - timedelta(seconds=1)
         period_name = "This Week"
     elif period == 'month':
-        start_date = datetime(now.year, now.month, 1)
+        start_date = datetime(now.year, now.month, 1, tzinfo=tz)
         if now.month == 12:
-            end_date = datetime(now.year + 1, 1, 1) - timedelta(seconds=1)
+            end_date = datetime(now.year + 1, 1, 1, tzinfo=tz) - timedelta(seconds=1)
         else:
-            end_date = datetime(now.year, now.month + 1, 1) - timedelta(seconds=1)
+            end_date = datetime(now.year, now.month + 1, 1, tzinfo=tz) - timedelta(seconds=1)
         period_name = "This Month"
     else:  # year
-        start_date = datetime(now.year, 1, 1)
-        end_date = datetime(now.year + 1, 1, 1) - timedelta(seconds=1)
+        start_date = datetime(now.year, 1, 1, tzinfo=tz)
+        end_date = datetime(now.year + 1, 1, 1, tzinfo=tz) - timedelta(seconds=1)
         period_name = "This Year"
     
     # Get spending data
-    spending_by_category = await db_ops.get_spending_by_category(user_id, start_date, end_date)
-    total_spending = await db_ops.get_total_spending(user_id, start_date, end_date)
+    spending_by_category = None
+    if ANALYTICS_CACHE_ENABLED:
+        # Two rows of the user's in-memory running totals, loaded from SQLite on first use
+        spending_by_category = await analytics_cache.spending_by_category(user_id, start_date, end_date, user['currency'])
+    if spending_by_category is None and period == 'month' and now.utcoffset() == timedelta(0):
+        # The monthly rollup (UTC months) answers this without scanning the month's transactions
+        spending_by_category = await db_ops.get_month_spending_by_category(user_id, current_year_month(), user['currency'])
+    elif spending_by_category is None:
+        # Expenses logged in other currencies are converted at the stored exchange rates
+        spending_by_category = await db_ops.get_spending_by_category(user_id, start_date, end_date, user['currency'])
+    # The total is the sum of the converted categories, so the breakdown adds up to it
+    total_spending = sum(spending_by_category.values())
     
     if total_spending == 0:
         await update.message.reply_text(f"No expenses recorded for {period_name.lower()}.")
@@ -62,25 +83,55 @@ async def summary_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     summary_text += f"💰 Total Spent: {format_currency(total_spending, user['currency'])}\n\n"
     summary_text += "📈 Category Breakdown:\n"
     
-    # Sort categories by spending amount (descending)
-    sorted_categories = sorted(spending_by_category.items(), key=lambda x: x[1], reverse=True)
+    # Sort categories by spending amount (descending), ties by name so charts are reproducible
+    sorted_categories = sorted(spending_by_category.items(), key=lambda x: (-x[1], x[0]))
     
     for category, amount in sorted_categories:
         percentage = (amount / total_spending) * 100
         formatted_amount = format_currency(amount, user['currency'])
         summary_text += f"• {category}: {formatted_amount} ({percentage:.1f}%)\n"
     
-    # Generate pie chart
-    chart_buffer = generate_pie_chart(spending_by_category, user['currency'])
-    
     # Send text summary first
     await update.message.reply_text(summary_text)
     
-    # Send chart as photo
-    chart_buffer.seek(0)
-    await update.message.reply_photo(
-        photo=chart_buffer,
-        caption=f"📊 {period_name} Spending Chart"
-    )
+    chart_data = dict(sorted_categories)
+    await send_chart(update, user_id, chart_data, user['currency'], f"📊 {period_name} Spending Chart")
+
+async def send_chart(update: Update, user_id: int, chart_data: dict, currency: str, caption: str):
+    """Send a spending pie chart, reusing an already uploaded copy when possible."""
+    chart_key = make_chart_key(chart_data, currency, {'chart': 'pie'})
+    
+    # An identical chart already on Telegram's servers is sent by reference
+    file_id = await db_ops.get_chart_file_id(chart_key)
+    if file_id:
+        try:
+            with metrics.time('bot_chart_stage_seconds', stage='resend'):
+                await update.message.reply_photo(photo=file_id, caption=caption)
+            return
+        except BadRequest as e:
+            logger.info(f"Stored file_id for chart {chart_key[:12]} rejected ({e}), uploading again")
+            await db_ops.delete_chart_file_id(chart_key)
+    
+    # Reuse an identical chart if one was rendered before, otherwise render
+    # the pie chart in a worker process so other updates keep flowing
+    cached_chart = await chart_cache.get(chart_key)
+    if cached_chart is not None:
+        chart_buffer = io.BytesIO(cached_chart)
+    else:
+        try:
+            with metrics.time('bot_chart_stage_seconds', stage='render'):
+                chart_buffer = await chart_service.render_pie_chart(chart_data, currency)
+        except ChartRenderError as e:
+            logger.warning(f"Chart for user {user_id} not rendered: {e}")
+            await update.message.reply_text("📊 Charts are busy right now, please try /summary again in a moment.")
+            return
+        await chart_cache.put(chart_key, chart_buffer.getvalue(), user_id)
     
+    # Send chart as photo and remember its file_id for next time
+    chart_buffer.seek(0)
+    with metrics.time('bot_chart_stage_seconds', stage='upload'):
+        message = await update.message.reply_photo(photo=chart_buffer, caption=caption)
     chart_buffer.close()
+    
+    if message and message.photo:
+        await db_ops.save_chart_file_id(chart_key, message.photo[-1].file_id)
@@ -1,11 +1,38 @@
+import time
+_STARTED_AT = time.perf_counter()
+
+import sys
+import asyncio
 import logging
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
-from config import TELEGRAM_TOKEN, BOT_NAME, BOT_VERSION
+from telegram import Update
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, TypeHandler, filters
+from typing import Optional
+from config import (
+    TELEGRAM_TOKEN, BOT_NAME, BOT_VERSION, METRICS_ENABLED, METRICS_PORT, METRICS_HOST, PROFILE_SAMPLE_RATE,
+    WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN, CONCURRENT_UPDATES,
+    DROP_PENDING_UPDATES, WORKER_PROCESSES, RATE_LIMIT_ENABLED, ANALYTICS_CACHE_ENABLED, EXCHANGE_RATES_CSV
+)
 from database.db_setup import create_tables
-from handlers.onboarding import start_command, help_command, setcurrency_command
-from handlers.expenses import log_expense_command, delete_transaction_command, list_history_command
+from database.db_operations import db_ops
+from database.exchange_rates import read_rates_csv
+from utils.chart_service import chart_service
+from utils.chart_cache import chart_cache
+from utils.analytics_cache import analytics_cache
+from utils.update_processor import PerUserUpdateProcessor
+from utils.metrics import (
+    metrics, instrument_application, instrument_database, chart_collector, user_cache_collector,
+    admission_collector, analytics_collector, worker_collector, start_metrics_server
+)
+from utils.admission import admission, admit_application
+from handlers.onboarding import start_command, help_command, setcurrency_command, settimezone_command
+from handlers.expenses import (
+    log_expense_command, delete_transaction_command, list_history_command, history_page_callback
+)
 from handlers.budgets import budget_command, view_budgets_command
 from handlers.reports import summary_command
+from handlers.imports import import_command
+from handlers.exports import export_command
+from handlers.admin import stats_command
 
 # Enable logging
 logging.basicConfig(
@@ -37,28 +64,80 @@ def print_startup_banner():
     """
     print(banner)
 
-def main():
-    """Start the Personal Finance Co-Pilot bot."""
-    # Print startup banner
-    print_startup_banner()
-    
-    # Initialize database
-    create_tables()
-    logger.info("✅ Database initialized successfully")
+async def startup(application: Application):
+    """Load exchange rates, then start converting old transaction dates to epoch timestamps in the background."""
+    await load_exchange_rates()
+    application.bot_data['backfill'] = asyncio.create_task(backfill_timestamps())
+
+async def load_exchange_rates():
+    if not EXCHANGE_RATES_CSV:
+        return
+    try:
+        loaded = await db_ops.set_exchange_rates(read_rates_csv(EXCHANGE_RATES_CSV))
+    except (OSError, ValueError) as e:
+        # Keep the rates already in the database rather than refusing to start
+        logger.error(f"❌ Could not load exchange rates from {EXCHANGE_RATES_CSV}: {e}")
+        return
+    logger.info(f"💱 Loaded {loaded} exchange rates from {EXCHANGE_RATES_CSV}")
+
+async def backfill_timestamps():
+    try:
+        updated = await db_ops.backfill_timestamps()
+    except Exception as e:
+        logger.error(f"❌ Timestamp backfill stopped: {e}")
+        return
+    if updated:
+        logger.info(f"🕒 Backfilled timestamps for {updated} transactions")
+
+async def shutdown(application: Application):
+    """Release pooled database connections and chart workers when the bot stops."""
+    backfill = application.bot_data.pop('backfill', None)
+    if backfill is not None and not backfill.done():
+        # Chunks already handed to the writer thread finish before the flush below returns
+        backfill.cancel()
+        await asyncio.gather(backfill, return_exceptions=True)
+    await db_ops.flush()
+    db_ops.close()
+    chart_service.close()
+    logger.info("🗄️ Database connections and chart workers closed")
+
+def build_application(token: str, concurrent_updates: int = 1, base_url: Optional[str] = None,
+                      rate_limit: bool = RATE_LIMIT_ENABLED) -> Application:
+    """
+    Create the Application with every handler registered.
     
-    # Create the Application
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    With concurrent_updates > 1, different users' updates are processed in
+    parallel while each user's own updates keep their order. base_url points
+    the bot at another Bot API server, such as a local fake for benchmarks.
+    rate_limit puts per-user token buckets and the expensive-command cap in
+    front of every handler.
+    """
+    builder = Application.builder().token(token).post_init(startup).post_shutdown(shutdown)
+    if concurrent_updates > 1:
+        builder = builder.concurrent_updates(PerUserUpdateProcessor(concurrent_updates))
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
     
     # Add command handlers
     application.add_handler(CommandHandler('start', start_command))
     application.add_handler(CommandHandler('help', help_command))
     application.add_handler(CommandHandler('setcurrency', setcurrency_command))
+    application.add_handler(CommandHandler('settimezone', settimezone_command))
     
     # Expense tracking handlers
     application.add_handler(CommandHandler('log', log_expense_command))
     application.add_handler(CommandHandler('spent', log_expense_command))  # Alias for log
     application.add_handler(CommandHandler('delete', delete_transaction_command))
     application.add_handler(CommandHandler('listhistory', list_history_command))
+    application.add_handler(CallbackQueryHandler(history_page_callback, pattern=r'^hist:'))
+    
+    # Statement import: /import replying to a CSV, or a CSV sent with /import as its caption
+    application.add_handler(CommandHandler('import', import_command))
+    application.add_handler(MessageHandler(
+        filters.Document.FileExtension('csv') & filters.CaptionRegex(r'^/import'), import_command
+    ))
+    application.add_handler(CommandHandler('export', export_command))
     
     # Budget management handlers
     application.add_handler(CommandHandler('budget', budget_command))
@@ -67,17 +146,148 @@ def main():
     # Reports handler
     application.add_handler(CommandHandler('summary', summary_command))
     
+    # Admin handlers
+    application.add_handler(CommandHandler('stats', stats_command))
+    
+    # Profile a sample of handler calls when PROFILE_SAMPLE_RATE is set
+    if PROFILE_SAMPLE_RATE > 0:
+        from utils.profiling import profile_application
+        profile_application(application)
+    
+    # Time every handler registered above
+    if METRICS_ENABLED:
+        instrument_application(application)
+    
+    # Admission control runs first, so rejected updates never reach the wrappers above
+    if rate_limit:
+        admit_application(application)
+    
     # Error handler
     async def error_handler(update, context):
         """Handle errors."""
         logger.error(f"❌ Update {update} caused error {context.error}")
     
     application.add_error_handler(error_handler)
+    return application
+
+def build_front_application(token: str, workers: int, base_url: Optional[str] = None) -> Application:
+    """
+    Create the dispatcher Application for --workers mode.
+    
+    It only receives updates and forwards each one to the worker process
+    that owns its user; the workers run the handlers against their own
+    database shard and reply to users themselves.
+    """
+    from utils.dispatcher import ShardedDispatcher
+    
+    dispatcher = ShardedDispatcher(workers, token, base_url=base_url)
+    
+    async def start_workers(application: Application):
+        dispatcher.start()
+    
+    async def stop_workers(application: Application):
+        dispatcher.stop()
+        logger.info("👷 Worker processes stopped")
+    
+    builder = Application.builder().token(token).post_init(start_workers).post_shutdown(stop_workers)
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
+    application.add_handler(TypeHandler(Update, dispatcher.forward))
+    application.bot_data['dispatcher'] = dispatcher
+    return application
+
+def parse_workers(argv) -> int:
+    """Worker process count from --workers N, falling back to WORKER_PROCESSES."""
+    if '--workers' in argv:
+        position = argv.index('--workers') + 1
+        if position >= len(argv) or not argv[position].isdigit() or int(argv[position]) < 1:
+            logger.error("❌ --workers needs a positive number of worker processes")
+            sys.exit(1)
+        return int(argv[position])
+    return max(WORKER_PROCESSES, 1)
+
+def main():
+    """Start the Personal Finance Co-Pilot bot."""
+    if '--profile-startup' in sys.argv:
+        from utils.startup_profiler import profile_startup
+        sys.exit(profile_startup(__file__))
+    probe = '--startup-probe' in sys.argv
+    webhook = '--webhook' in sys.argv
+    workers = parse_workers(sys.argv)
+    
+    # Print startup banner
+    if not probe:
+        print_startup_banner()
+    
+    if workers > 1 and not probe:
+        # Each worker opens its own shard; this process only routes updates
+        application = build_front_application(TELEGRAM_TOKEN, workers)
+        if METRICS_ENABLED:
+            instrument_application(application)
+            metrics.add_collector(worker_collector(application.bot_data['dispatcher'].restarts))
+            if METRICS_PORT:
+                start_metrics_server(METRICS_PORT, METRICS_HOST)
+        logger.info(f"🧩 Dispatching updates to {workers} worker processes")
+        run(application, webhook)
+        return
+    
+    # Initialize database
+    create_tables()
+    logger.info("✅ Database initialized successfully")
     
-    # Start the bot
+    # Drop cached charts when a user's spending changes
+    chart_cache.attach(db_ops)
+    if ANALYTICS_CACHE_ENABLED:
+        analytics_cache.attach(db_ops)
+    
+    # Per-query latency and pool wait, plus the optional Prometheus endpoint
+    if METRICS_ENABLED:
+        instrument_database(db_ops)
+        metrics.add_collector(chart_collector(chart_service, chart_cache))
+        metrics.add_collector(user_cache_collector(db_ops.user_cache))
+        metrics.add_collector(admission_collector(admission))
+        if ANALYTICS_CACHE_ENABLED:
+            metrics.add_collector(analytics_collector(analytics_cache))
+        if METRICS_PORT and not probe:
+            start_metrics_server(METRICS_PORT, METRICS_HOST)
+    
+    # Create the Application
+    application = build_application(
+        (TELEGRAM_TOKEN or '0:startup-probe') if probe else TELEGRAM_TOKEN,
+        concurrent_updates=CONCURRENT_UPDATES if webhook else 1
+    )
+    
+    if probe:
+        # Everything up to polling is done; report for --profile-startup and stop
+        from utils.startup_profiler import READY_MARKER
+        elapsed_ms = (time.perf_counter() - _STARTED_AT) * 1000
+        heavy = [name for name in ('matplotlib', 'numpy', 'PIL') if name in sys.modules]
+        print(f"{READY_MARKER} {elapsed_ms:.1f} {' '.join(heavy)}")
+        return
+    
+    run(application, webhook)
+
+def run(application: Application, webhook: bool):
+    """Start receiving updates by webhook or long polling until stopped."""
     logger.info(f"🚀 {BOT_NAME} is starting...")
     logger.info("📱 Ready to help users track their expenses!")
-    application.run_polling(drop_pending_updates=True)
+    if webhook:
+        if not WEBHOOK_URL:
+            logger.error("❌ --webhook needs WEBHOOK_URL, the public HTTPS address Telegram should post to")
+            sys.exit(1)
+        logger.info(f"🌐 Serving webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}, "
+                    f"up to {CONCURRENT_UPDATES} updates at once")
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET_TOKEN,
+            drop_pending_updates=DROP_PENDING_UPDATES
+        )
+    else:
+        application.run_polling(drop_pending_updates=DROP_PENDING_UPDATES)
 
 if __name__ == '__main__':
     main()
@@ -6,12 +6,16 @@ Validates all core components without requiring a Telegram token
 
 import asyncio
 import sys
+import logging
 import os
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 # Add project root to path
 sys.path.append(os.path.dirname(__file__))
 
+from benchmarks import stubs
+from benchmarks.stubs import StubMessage
+
 async def test_database_operations():
     """Test database operations"""
     print("🗄️ Testing Database Operations...")
@@ -31,11 +35,11 @@ async def test_database_operations():
         print(f"✅ User operations: {user['currency']}")
         
         # Test expense logging
-        await db_ops.log_expense(test_user_id, 50.0, '#food', 'test meal')
+        await db_ops.log_expense(test_user_id, 5000, '#food', 'test meal')
         print("✅ Expense logging")
         
         # Test budget setting
-        await db_ops.set_budget(test_user_id, '#food', 500.0)
+        await db_ops.set_budget(test_user_id, '#food', 50000)
         print("✅ Budget setting")
         
         # Test transaction history
@@ -49,6 +53,307 @@ async def test_database_operations():
         print(f"❌ Database test failed: {e}")
         return False
 
+async def test_connection_pool():
+    """Test pooled database connections"""
+    print("🔌 Testing Connection Pool...")
+    
+    try:
+        import tempfile
+        from database.db_setup import create_tables
+        from database.db_operations import DatabaseOperations
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'pool.db')
+            create_tables(db_path)
+            ops = DatabaseOperations(db_path, pool_size=2)
+            
+            for i in range(20):
+                await ops.add_user(i, 'USD')
+                await ops.get_user(i)
+            # Two reader connections plus the writer's
+            assert len(ops._connections) <= 3, "connections should be reused per thread"
+            print(f"✅ Connections reused: {len(ops._connections)} for 40 queries")
+            
+            mode = await ops.execute_query("PRAGMA journal_mode", fetch_one=True)
+            assert mode[0] == 'wal', f"expected WAL journal mode, got {mode[0]}"
+            print("✅ WAL journal mode")
+            
+            ops.close()
+            assert not ops._connections
+            user = await ops.get_user(3)
+            assert user['currency'] == 'USD', "pool should reopen after close"
+            ops.close()
+            print("✅ Clean shutdown and reopen")
+        
+        print("🔌 Connection pool: ALL TESTS PASSED\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Connection pool test failed: {e}")
+        return False
+
+async def test_query_plans():
+    """Test that hot queries are served by index seeks, never table scans"""
+    print("🔎 Testing Query Plans...")
+    
+    try:
+        import sqlite3
+        import tempfile
+        from datetime import timedelta
+        from database.db_setup import create_tables
+        from database.db_operations import DatabaseOperations
+        from database.migrations import MIGRATIONS, get_schema_version
+        
+        class PlanRecordingOperations(DatabaseOperations):
+            """Runs EXPLAIN QUERY PLAN alongside every query issued."""
+            def __init__(self, db_path):
+                super().__init__(db_path)
+                self.plans = []
+            
+            async def execute_query(self, query, params=(), fetch_one=False, fetch_all=False):
+                if query.lstrip().upper().startswith(('SELECT', 'WITH')):
+                    plan = await super().execute_query(f"EXPLAIN QUERY PLAN {query}", params, fetch_all=True)
+                    self.plans.append((' '.join(query.split()), [row[3] for row in plan]))
+                return await super().execute_query(query, params, fetch_one, fetch_all)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'plans.db')
+            create_tables(db_path)
+            create_tables(db_path)  # Re-running must be a no-op
+            
+            conn = sqlite3.connect(db_path)
+            assert get_schema_version(conn) == MIGRATIONS[-1][0]
+            conn.close()
+            print(f"✅ Schema version: {MIGRATIONS[-1][0]}")
+            
+            ops = PlanRecordingOperations(db_path)
+            now = datetime.now()
+            await ops.add_user(1, 'USD')
+            await ops.log_expense(1, 1000, '#food', 'plan')
+            await ops.set_budget(1, '#food', 10000)
+            await ops.get_user(1)
+            await ops.get_transaction_history(1, 10)
+            await ops.get_transaction_page(1, page_size=10)
+            await ops.get_transaction_page(1, before_cursor=('2024-01-01 00:00:00', 5), page_size=10)
+            await ops.get_transaction_page(1, after_cursor=('2024-01-01 00:00:00', 5), page_size=10)
+            await ops.get_transaction_page(1, before_cursor=(1704067200, 5), page_size=10)
+            await ops.get_transaction_page(1, after_cursor=('1704067200', 5), page_size=10)
+            await ops.get_budgets(1)
+            await ops.get_budget_status(1, now.strftime('%Y-%m'))
+            await ops.get_spending_by_category(1, now - timedelta(days=30), now)
+            await ops.get_total_spending(1, now - timedelta(days=30), now)
+            await ops.get_current_month_spending_by_category(1, '#food')
+            await ops.get_month_spending_by_category(1, now.strftime('%Y-%m'))
+            await ops.get_budget_for_category(1, '#food')
+            await ops.get_category_budget_status(1, '#food', now.strftime('%Y-%m'))
+            await ops.save_chart_file_id('chart', 'file')
+            ops.close()
+            
+            for query, details in ops.plans:
+                scans = [d for d in details if d.startswith('SCAN') or 'TEMP B-TREE' in d]
+                assert not scans, f"table scan in: {query} -> {scans}"
+            print(f"✅ {len(ops.plans)} hot queries use index seeks")
+        
+        print("🔎 Query plans: ALL TESTS PASSED\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Query plan test failed: {e}")
+        return False
+
+async def test_mixed_workload():
+    """Test that long report reads on the reader pool never stall writes on the writer thread"""
+    print("🏋️ Testing Mixed Read/Write Workload...")
+    
+    try:
+        import tempfile
+        import time
+        from database.db_setup import create_tables
+        from database.db_operations import DatabaseOperations
+        
+        # Stands in for a /summary year over a long history: ~100ms of pure SQLite work
+        long_report = '''
+            SELECT SUM(x) FROM (
+                WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 300000)
+                SELECT x FROM c
+            )
+        '''
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'mixed.db')
+            create_tables(db_path)
+            ops = DatabaseOperations(db_path, pool_size=2)
+            for user_id in range(1, 4):
+                await ops.add_user(user_id, 'USD')
+            
+            start = time.perf_counter()
+            await ops.execute_query(long_report, fetch_one=True)
+            report_seconds = time.perf_counter() - start
+            
+            write_latencies = []
+            async def writer(user_id):
+                for i in range(15):
+                    start = time.perf_counter()
+                    assert await ops.log_expense(user_id, i * 100, '#food', 'stress')
+                    write_latencies.append(time.perf_counter() - start)
+                    await ops.get_user(user_id)
+            
+            # Three times as many long reads as readers keeps the reader pool saturated
+            start = time.perf_counter()
+            reads = [ops.execute_query(long_report, fetch_one=True) for _ in range(6)]
+            writes = [writer(user_id) for user_id in range(1, 4)]
+            results = await asyncio.gather(*reads, *writes)
+            elapsed = time.perf_counter() - start
+            
+            count = await ops.execute_query("SELECT COUNT(*) FROM transactions", fetch_one=True)
+            ops.close()
+            
+            assert all(r[0] == 300000 * 300001 // 2 for r in results[:6]), "every report completed"
+            assert count[0] == 45, f"expected 45 inserts, found {count[0]}"
+            worst = max(write_latencies)
+            assert worst < report_seconds, f"a write waited {worst * 1000:.0f}ms behind {report_seconds * 1000:.0f}ms reports"
+            print(f"✅ 6 long reports ({elapsed * 1000:.0f}ms total) alongside 45 writes, "
+                  f"worst write {worst * 1000:.1f}ms vs {report_seconds * 1000:.0f}ms per report")
+        
+        print("🏋️ Mixed workload: ALL TESTS PASSED\n")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Mixed workload test failed: {e}")
+        return False
+
+async def test_monthly_rollup():
+    """Test that the monthly category rollup tracks inserts and deletes"""
+    print("🧮 Testing Monthly Rollup...")
+    
+    try:
+        import sqlite3
+        import tempfile
+        from database.db_setup import create_tables
+        from database.db_operations import DatabaseOperations, current_year_month
+        from database.rollup import check_rollup, repair_rollup
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'rollup.db')
+            create_tables(db_path)
+            ops = DatabaseOperations(db_path)
+            await ops.add_user(1, 'USD')
+            for amount in (1000, 2050, 3025):
+                await ops.log_expense(1, amount, '#food')
+            await ops.log_expense(1, 500, '#coffee')
+            
+            history = await ops.get_transaction_history(1, 10)
+            await ops.delete_transaction(1, history[0]['id'])
+            
+            remaining = await ops.get_transaction_history(1, 10)
+            expected_food = sum(t['amount'] for t in remaining if t['category'] == '#food')
+            spent = await ops.get_current_month_spending_by_category(1, '#food')
+            assert spent == expected_food, f"expected {expected_food}, got {spent}"
+            month = await ops.get_month_spending_by_category(1, current_year_month())
+            assert set(month) == {t['category'] for t in remaining}
+            await ops.set_budget(1, '#food', 10000)
+            await ops.set_budget(1, '#travel', 5000)
+            status = {b['category']: b for b in await ops.get_budget_status(1, current_year_month())}
+            assert status['#food']['spent'] == expected_food
+            assert status['#travel']['spent'] == 0, "budgets without spending report zero"
+            ops.close()
+            print(f"✅ Rollup follows inserts and deletes: {month}")
+            
+            # A server at UTC+14 is already in February while the rollup's UTC month is still January
+            import database.db_operations as db_module
+            utc_now = datetime(2024, 1, 31, 23, 30, tzinfo=timezone.utc)
+            
+            class FakeDatetime(datetime):
+                @classmethod
+                def now(cls, tz=None):
+                    return utc_now.astimezone(tz) if tz else (utc_now + timedelta(hours=14)).replace(tzinfo=None)
+            
+            db_module.datetime = FakeDatetime
+            try:
+                assert current_year_month() == '2024-01', current_year_month()
+            finally:
+                db_module.datetime = datetime
+            print("✅ The current month follows UTC like the rollup, whatever the server's zone")
+            
+            conn = sqlite3.connect(db_path)
+            assert check_rollup(conn) == [], "rollup should match raw transactions"
+            conn.execute("UPDATE monthly_category_totals SET total = total + 1")
+            conn.commit()
+            assert check_rollup(conn), "checker should detect drift"
+            repair_rollup(conn)
+            assert check_rollup(conn) == []
+            conn.close()
+            print("✅ Consistency checker detects and repairs drift")
+        
+        print("🧮 Monthly rollup: ALL TESTS PASSED\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Monthly rollup test failed: {e}")
+        return False
+
+async def test_write_behind():
+    """Test group-committed expense inserts"""
+    print("📦 Testing Write-Behind Inserts...")
+    
+    try:
+        import sqlite3
+        import tempfile
+        from database.db_setup import create_tables
+        from database.db_operations import DatabaseOperations
+        from database.rollup import check_rollup
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'write_behind.db')
+            create_tables(db_path)
+            ops = DatabaseOperations(db_path, write_behind=True, write_batch_size=4, write_linger_ms=1)
+            notified = []
+            ops.add_listener('expense_logged', lambda user_id, **_: notified.append(user_id))
+            await ops.add_user(1, 'USD')
+            
+            results = await asyncio.gather(*(ops.log_expense(1, 1000 + 100 * i, '#food') for i in range(10)))
+            assert all(results), "every caller should see its insert committed"
+            history = await ops.get_transaction_history(1, 50)
+            assert len(history) == 10 and len(notified) == 10
+            print(f"✅ {len(history)} queued inserts committed in batches of 4")
+            
+            await ops.log_expense(1, 100, '#coffee')
+            await ops.flush()
+            assert ops._writer_task is None, "flush stops the drain task so none is left pending at shutdown"
+            
+            # A broken listener must neither hang queued /log callers nor fail a committed insert
+            def broken_listener(**_):
+                raise RuntimeError("listener bug")
+            ops.add_listener('expense_logged', broken_listener)
+            logging.disable(logging.CRITICAL)
+            try:
+                results = await asyncio.wait_for(
+                    asyncio.gather(*(ops.log_expense(1, 10, '#tea') for _ in range(6))), timeout=5
+                )
+                assert all(results) and len(notified) == 17, "later listeners still run"
+                assert await ops.log_expense(1, 10, '#tea'), "the writer keeps draining after a listener error"
+                sync_ops = DatabaseOperations(db_path)
+                sync_ops.add_listener('expense_logged', broken_listener)
+                assert await sync_ops.log_expense(1, 10, '#tea')
+                assert await sync_ops.log_expenses(1, [(10, '#tea', None)]) == 1
+                sync_ops.close()
+            finally:
+                logging.disable(logging.NOTSET)
+            ops.close()
+            print("✅ A failing listener is logged without failing or hanging inserts")
+            
+            conn = sqlite3.connect(db_path)
+            assert check_rollup(conn) == [], "rollup must stay consistent with batched inserts"
+            conn.close()
+            print("✅ Rollup consistent after batch commits")
+        
+        print("📦 Write-behind inserts: ALL TESTS PASSED\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Write-behind test failed: {e}")
+        return False
+
 def test_chart_generation():
     """Test chart generation"""
     print("📊 Testing Chart Generation...")
@@ -56,15 +361,16 @@ def test_chart_generation():
     try:
         from utils.chart_generator import generate_pie_chart, format_currency
         
-        # Test currency formatting
-        formatted = format_currency(150.50, 'USD')
+        # Test currency formatting (amounts are minor units)
+        formatted = format_currency(15050, 'USD')
+        assert formatted == '$150.50' and format_currency(150, 'JPY') == '¥150'
         print(f"✅ Currency formatting: {formatted}")
         
         # Test chart generation
         test_data = {
-            '#food': 150.0,
-            '#transport': 80.0,
-            '#entertainment': 200.0
+            '#food': 15000,
+            '#transport': 8000,
+            '#entertainment': 20000
         }
         
         chart_buffer = generate_pie_chart(test_data, 'USD')
@@ -78,6 +384,1431 @@ def test_chart_generation():
         print(f"❌ Chart generation test failed: {e}")
         return False
 
+async def test_chart_service():
+    """Test chart rendering in worker processes"""
+    print("🖼️ Testing Chart Render Service...")
+    
+    try:
+        from utils.chart_service import ChartRenderService, ChartQueueFullError, ChartRenderError, ChartTimeoutError
+        
+        service = ChartRenderService(workers=1, queue_depth=0, timeout=60)
+        chart = await service.render_pie_chart({'#food': 15000, '#transport': 8000}, 'USD')
+        assert chart.getvalue().startswith(b'\x89PNG'), "worker should return PNG bytes"
+        print(f"✅ Rendered in worker: {len(chart.getvalue())} bytes")
+        
+        results = await asyncio.gather(
+            *(service.render_pie_chart({'#food': 100}, 'USD') for _ in range(3)),
+            return_exceptions=True
+        )
+        rejected = [r for r in results if isinstance(r, ChartQueueFullError)]
+        assert len(rejected) == 2, f"expected 2 rejected renders, got {len(rejected)}"
+        print("✅ Queue depth limit enforced")
+        
+        metrics = service.metrics
+        assert metrics['renders'] == 2 and metrics['rejected'] == 2
+        print(f"✅ Metrics: {metrics['renders']} renders, max render {metrics['render_seconds_max'] * 1000:.0f}ms")
+        
+        # A crashed worker breaks the pool; the service replaces it instead of failing every later chart
+        for process in list(service._executor._processes.values()):
+            process.kill()
+        await asyncio.sleep(0.5)
+        for attempt in range(2):
+            try:
+                chart = await service.render_pie_chart({'#food': 100}, 'USD')
+                break
+            except ChartRenderError:
+                assert attempt == 0, "the pool should have been restarted"
+        assert chart.getvalue().startswith(b'\x89PNG') and service.metrics['pool_restarts'] == 1
+        print("✅ Pool restarted after a worker died")
+        
+        # A timed-out render that is still running keeps its slot until the worker finishes it
+        service.timeout = 0.001
+        try:
+            await service.render_pie_chart({'#food': 100}, 'USD')
+            raise AssertionError("render should have timed out")
+        except ChartTimeoutError:
+            pass
+        if service.in_flight:
+            try:
+                await service.render_pie_chart({'#food': 100}, 'USD')
+                raise AssertionError("the busy worker's slot should still be taken")
+            except ChartQueueFullError:
+                pass
+        for _ in range(100):
+            if not service.in_flight:
+                break
+            await asyncio.sleep(0.05)
+        assert service.in_flight == 0, "slot should be released when the render finishes"
+        print("✅ Timed-out renders hold their slot until the worker is free")
+        service.close()
+        
+        print("🖼️ Chart render service: ALL TESTS PASSED\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Chart render service test failed: {e}")
+        return False
+
+async def test_chart_cache():
+    """Test the content-addressed chart cache"""
+    print("🗃️ Testing Chart Cache...")
+    
+    try:
+        import tempfile
+        from database.db_setup import create_tables
+        from database.db_operations import DatabaseOperations
+        from utils.chart_cache import ChartCache, make_chart_key
+        
+        key = make_chart_key({'#food': 1000, '#bills': 500}, 'usd')
+        assert key == make_chart_key({'#bills': 500, '#food': 1000}, 'USD'), "keys should ignore order and currency case"
+        assert key != make_chart_key({'#food': 1000, '#bills': 500}, 'EUR')
+        print("✅ Keys are content-addressed")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ChartCache(max_bytes=250, disk_dir=os.path.join(tmp, 'charts'))
+            await cache.put('a', b'x' * 100, user_id=1)
+            await cache.put('b', b'y' * 100, user_id=2)
+            assert await cache.get('a') == b'x' * 100
+            await cache.put('c', b'z' * 100, user_id=2)  # evicts 'b', the least recently used
+            assert cache.stats()['evictions'] == 1 and cache.size_bytes == 200
+            assert await cache.get('b') == b'y' * 100, "evicted chart should come back from disk"
+            print(f"✅ LRU eviction with disk tier: {cache.stats()}")
+            
+            db_path = os.path.join(tmp, 'cache.db')
+            create_tables(db_path)
+            ops = DatabaseOperations(db_path)
+            cache.attach(ops)
+            await ops.add_user(2, 'USD')
+            await ops.log_expense(2, 1200, '#food')
+            ops.close()
+            assert await cache.get('c') is None and await cache.get('a') is not None
+            assert not os.path.exists(cache._disk_path('b')), "charts only left on disk are invalidated too"
+            print("✅ log_expense invalidates the user's charts")
+            
+            disk = ChartCache(max_bytes=100, disk_dir=os.path.join(tmp, 'bounded'), disk_max_bytes=250)
+            for key in ('d', 'e', 'f'):
+                await disk.put(key, key.encode() * 100, user_id=3)
+            assert disk.stats()['disk_evictions'] == 1 and disk.disk_size_bytes == 200
+            assert not os.path.exists(disk._disk_path('d')) and await disk.get('d') is None
+            reopened = ChartCache(max_bytes=100, disk_dir=os.path.join(tmp, 'bounded'), disk_max_bytes=100)
+            assert reopened.disk_size_bytes == 100, "a smaller budget trims files left by the last run"
+            print(f"✅ Disk tier bounded: {disk.stats()['disk_size_bytes']} bytes on disk")
+        
+        print("🗃️ Chart cache: ALL TESTS PASSED\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Chart cache test failed: {e}")
+        return False
+
+class FakeBotAPI:
+    """Local stand-in for the Telegram Bot API's photo uploads."""
+    def __init__(self):
+        self.file_ids = {}
+        self.uploads = 0
+        self.by_reference = 0
+    
+    def reject_all_file_ids(self):
+        self.file_ids.clear()
+
+class FakeMessage(StubMessage):
+    """A StubMessage whose photos go through FakeBotAPI's file_id store, rejecting unknown IDs like Telegram."""
+    def __init__(self, api, text=''):
+        super().__init__(text)
+        self.api = api
+        self.markups = []
+    
+    async def reply_text(self, text, reply_markup=None, **kwargs):
+        self.markups.append(reply_markup)
+        return await super().reply_text(text, **kwargs)
+    
+    async def reply_photo(self, photo, caption=None, **kwargs):
+        from types import SimpleNamespace
+        from telegram.error import BadRequest
+        if isinstance(photo, str):
+            if photo not in self.api.file_ids:
+                raise BadRequest("Wrong file identifier/http url specified")
+            self.api.by_reference += 1
+            file_id = photo
+        else:
+            self.api.uploads += 1
+            file_id = f'file-{len(self.api.file_ids) + 1}'
+            self.api.file_ids[file_id] = photo.read()
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=file_id)])
+
+def make_update(api, user_id, text=''):
+    """benchmarks.stubs.make_update, with a message that uploads photos to the given FakeBotAPI."""
+    update, context = stubs.make_update(user_id, text, first_name='Tester')
+    update.message = FakeMessage(api, text)
+    return update, context
+
+async def test_chart_file_id_reuse():
+    """Test that repeat charts are sent by Telegram file_id"""
+    print("📎 Testing Chart file_id Reuse...")
+    
+    from database.db_operations import db_ops
+    original_path = db_ops.db_path
+    try:
+        import tempfile
+        from database.db_setup import create_tables
+        from handlers.reports import summary_command
+        from utils.chart_service import chart_service
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_ops.close()
+            db_ops.db_path = os.path.join(tmp, 'file_ids.db')
+            create_tables(db_ops.db_path)
+            await db_ops.add_user(7, 'USD')
+            await db_ops.log_expense(7, 4000, '#food')
+            await db_ops.log_expense(7, 1500, '#coffee')
+            
+            api = FakeBotAPI()
+            for _ in range(2):
+                await summary_command(*make_update(api, 7, '/summary'))
+            assert api.uploads == 1 and api.by_reference == 1, f"{api.uploads} uploads, {api.by_reference} by reference"
+            print("✅ Second /summary sent by file_id")
+            
+            api.reject_all_file_ids()
+            await summary_command(*make_update(api, 7, '/summary'))
+            await summary_command(*make_update(api, 7, '/summary'))
+            assert api.uploads == 2 and api.by_reference == 2
+            print("✅ Rejected file_id falls back to upload")
+            
+            for i in range(5):
+                await db_ops.save_chart_file_id(f'key-{i}', f'file-{i}', max_entries=3)
+            count = await db_ops.execute_query("SELECT COUNT(*) FROM chart_file_ids", fetch_one=True)
+            assert count[0] <= 3, f"expected at most 3 stored file_ids, found {count[0]}"
+            print("✅ Stored file_ids bounded by max_entries")
+        
+        print("📎 Chart file_id reuse: ALL TESTS PASSED\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Chart file_id reuse test failed: {e}")
+        return False
+    finally:
+        db_ops.close()
+        db_ops.db_path = original_path
+        chart_service.close()
+
+# Import budget for main.py and every handler, in seconds. Generous for slow CI
+# runners; matplotlib alone used to add more than this.
+IMPORT_TIME_BUDGET = 1.5
+
+def test_startup_imports():
+    """Test that bot startup stays within its import-time budget"""
+    print("⏱️ Testing Startup Imports...")
+    
+    try:
+        import subprocess
+        
+        probe = (
+            "import sys, time\n"
+            "start = time.perf_counter()\n"
+            "import main\n"
+            "print(time.perf_counter() - start)\n"
+            "print('matplotlib' in sys.modules)\n"
+        )
+        proc = subprocess.run(
+            [sys.executable, '-c', probe], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        )
+        elapsed, matplotlib_loaded = proc.stdout.split()
+        elapsed = float(elapsed)
+        
+        assert matplotlib_loaded == 'False', "matplotlib must load lazily, not at startup"
+        print("✅ matplotlib is not imported at startup")
+        assert elapsed < IMPORT_TIME_BUDGET, f"startup imports took {elapsed:.2f}s (budget {IMPORT_TIME_BUDGET}s)"
+        print(f"✅ Startup imports: {elapsed * 1000:.0f}ms (budget {IMPORT_TIME_BUDGET * 1000:.0f}ms)")
+        
+        print("⏱️ Startup imports: ALL TESTS PASSED\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Startup import test failed: {e}")
+        return False
+
+async def test_statement_import():
+    """Test streaming CSV statement import"""
+    print("📥 Testing Statement Import...")
+    
+    from database.db_operations import db_ops
+    original_path = db_ops.db_path
+    try:
+        import sqlite3
+        import tempfile
+        import handlers.imports
+        from database.db_setup import create_tables
+        from database.rollup import check_rollup
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_ops.close()
+            db_ops.db_path = os.path.join(tmp, 'import.db')
+            create_tables(db_ops.db_path)
+            await db_ops.add_user(9, 'USD')
+            
+            csv_path = os.path.join(tmp, 'statement.csv')
+            with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+                f.write("Date,Narration,Debit,Category\n")
+                f.write("2024-03-15,Lunch,150,food\n")
+                f.write("16/03/2024,Bus,\"1,200.50\",#transport\n")
+                f.write("2024-03-17,Refund,-20,food\n")
+                f.write("2024-03-18,Gift,abc,fun\n")
+                f.write("not a date,Snacks,10,food\n")
+                f.write("2024-04-01,Coffee,5,\n")
+                f.write(",,,\n")
+            
+            handlers.imports.IMPORT_CHUNK_SIZE = 2
+            imported, skipped, errors = await handlers.imports.import_statement(9, csv_path, currency='USD')
+            assert imported == 3 and skipped == 3, f"imported {imported}, skipped {skipped}: {errors}"
+            print(f"✅ Imported {imported}, skipped {skipped}: {errors[0]}")
+            
+            history = {t['description']: t for t in await db_ops.get_transaction_history(9, 10)}
+            assert history['Lunch']['date'] == '2024-03-15 00:00:00'
+            assert history['Bus']['amount'] == 120050 and history['Bus']['category'] == '#transport'
+            assert history['Coffee']['category'] == '#imported'
+            print("✅ Explicit dates, amounts and categories stored")
+            
+            march = await db_ops.get_month_spending_by_category(9, '2024-03')
+            assert march == {'#food': 15000, '#transport': 120050}, march
+            conn = sqlite3.connect(db_ops.db_path)
+            assert check_rollup(conn) == []
+            conn.close()
+            print("✅ Backfilled months land in the rollup")
+            
+            import csv
+            import gzip
+            import io
+            from database.db_operations import user_timezone
+            from utils.exporter import TransactionExportWriter
+            for user_id in (10, 11):
+                await db_ops.add_user(user_id, 'USD')
+                await db_ops.update_user_timezone(user_id, 'America/New_York')
+            tz = user_timezone(await db_ops.get_user(10))
+            await db_ops.log_expense(10, 700, '#food', 'Late dinner', datetime(2024, 3, 15, 23, 30, tzinfo=tz))
+            imported, _, errors = await handlers.imports.import_statement(10, csv_path, currency='USD', tz=tz)
+            assert imported == 3, errors
+            history = {t['description']: t for t in await db_ops.get_transaction_history(10, 10)}
+            assert history['Lunch']['date'] == '2024-03-15 04:00:00', "CSV dates are local midnight"
+            day = await db_ops.get_spending_by_category(10, datetime(2024, 3, 15, tzinfo=tz),
+                                                      datetime(2024, 3, 15, 23, 59, 59, tzinfo=tz))
+            assert day == {'#food': 15700}, day
+            print("✅ CSV dates read in the user's timezone")
+            
+            writer = TransactionExportWriter('csv')
+            await db_ops.export_transactions(10, writer.write_rows, tz=tz)
+            exported = writer.finish().read()
+            writer.file.close()
+            rows = list(csv.reader(io.TextIOWrapper(gzip.GzipFile(fileobj=io.BytesIO(exported)), encoding='utf-8')))
+            assert ['2024-03-15 00:00:00', '2024-03-15 23:30:00'] == [r[1] for r in rows[1:3]], rows[:3]
+            export_path = os.path.join(tmp, 'export.csv')
+            with open(export_path, 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerows([r[1:5] for r in rows])
+            imported, skipped, errors = await handlers.imports.import_statement(11, export_path, currency='USD', tz=tz)
+            assert imported == 4 and skipped == 0, errors
+            def stored(user_id):
+                conn = sqlite3.connect(db_ops.db_path)
+                rows = conn.execute("SELECT transaction_date, ts, amount FROM transactions WHERE user_id = ? ORDER BY ts",
+                                    (user_id,)).fetchall()
+                conn.close()
+                return rows
+            assert stored(10) == stored(11), (stored(10), stored(11))
+            print("✅ Export then import keeps every moment")
+        
+        print("📥 Statement import: ALL TESTS PASSED\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Statement import test failed: {e}")
+        return False
+    finally:
+        db_ops.close()
+        db_ops.db_path = original_path
+
+async def test_export():
+    """Test streaming gzip export of transaction history"""
+    print("📤 Testing Export...")
+    
+    try:
+        import csv
+        import gzip
+        import io
+        import json
+        import tempfile
+        from database.db_setup import create_tables
+        from database.db_operations import DatabaseOperations
+        from utils.exporter import TransactionExportWriter
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'export.db')
+            create_tables(db_path)
+            ops = DatabaseOperations(db_path)
+            await ops.add_user(3, 'USD')
+            for day in range(1, 26):
+                await ops.log_expense(3, day * 105, '#food', f'meal {day}', datetime(2024, 1, day, 12))
+            
+            writer = TransactionExportWriter('csv')
+            exported = await ops.export_transactions(3, writer.write_rows, batch_size=7)
+            rows = list(csv.reader(io.TextIOWrapper(gzip.GzipFile(fileobj=writer.finish(), mode='rb'), encoding='utf-8')))
+            writer.file.close()
+            assert exported == 25 and len(rows) == 26 and rows[0][0] == 'id' and rows[0][-1] == 'currency'
+            assert rows[1][1] == '2024-01-01 12:00:00', "rows should be oldest first"
+            assert rows[1][2] == '1.05', "amounts are written as decimals, not minor units"
+            assert rows[1][5] == 'USD', "each row carries the currency it was logged in"
+            print(f"✅ CSV export: {exported} rows in batches of 7")
+            
+            writer = TransactionExportWriter('jsonl')
+            exported = await ops.export_transactions(3, writer.write_rows, datetime(2024, 1, 10), datetime(2024, 1, 20))
+            lines = gzip.decompress(writer.finish().read()).decode('utf-8').splitlines()
+            writer.file.close()
+            assert exported == 10 and json.loads(lines[0])['description'] == 'meal 10'
+            assert json.loads(lines[0])['amount'] == 10.5
+            print(f"✅ JSONL export with date range: {exported} rows")
+            ops.close()
+        
+        print("📤 Export: ALL TESTS PASSED\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Export test failed: {e}")
+        return False
+
+async def test_history_pagination():
+    """Test keyset-paginated history with inline paging buttons"""
+    print("📜 Testing History Pagination...")
+    
+    from database.db_operations import db_ops
+    original_path = db_ops.db_path
+    try:
+        import tempfile
+        from types import SimpleNamespace
+        from database.db_setup import create_tables
+        from handlers.expenses import list_history_command, history_page_callback
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_ops.close()
+            db_ops.db_path = os.path.join(tmp, 'history.db')
+            create_tables(db_ops.db_path)
+            await db_ops.add_user(5, 'USD')
+            # Pairs of identical timestamps make the id tie-breaker matter
+            for i in range(25):
+                await db_ops.log_expense(5, i * 100, '#food', f'item {i}', datetime(2024, 1, 1 + i // 2, 9))
+            
+            seen = []
+            page = await db_ops.get_transaction_page(5, page_size=10)
+            while True:
+                seen.extend(t['id'] for t in page['transactions'])
+                if not page['has_older']:
+                    break
+                last = page['transactions'][-1]
+                page = await db_ops.get_transaction_page(5, before_cursor=(last['cursor'], last['id']), page_size=10)
+            assert len(seen) == 25 and len(set(seen)) == 25, "every transaction appears exactly once"
+            assert seen == sorted(seen, reverse=True), "pages are newest first"
+            first = page['transactions'][0]
+            back = await db_ops.get_transaction_page(5, after_cursor=(first['cursor'], first['id']), page_size=10)
+            assert [t['id'] for t in back['transactions']] == seen[10:20] and back['has_newer']
+            print("✅ Keyset pages cover history once, in both directions")
+            
+            api = FakeBotAPI()
+            update, context = make_update(api, 5, '/listhistory 10')
+            await list_history_command(update, context)
+            
+            edits = []
+            async def answer(*args, **kwargs):
+                pass
+            async def edit_message_text(text, reply_markup=None):
+                edits.append((text, reply_markup))
+            
+            markup = update.message.markups[-1]
+            older = markup.inline_keyboard[0][-1].callback_data
+            query = SimpleNamespace(data=older, from_user=SimpleNamespace(id=5), answer=answer, edit_message_text=edit_message_text)
+            await history_page_callback(SimpleNamespace(callback_query=query), None)
+            text, markup = edits[-1]
+            assert 'ID: 15 |' in text and len(markup.inline_keyboard[0]) == 2
+            print("✅ Older button edits the message to the next page")
+        
+        print("📜 History pagination: ALL TESTS PASSED\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ History pagination test failed: {e}")
+        return False
+    finally:
+        db_ops.close()
+        db_ops.db_path = original_path
+
+async def test_metrics():
+    """Test handler/query instrumentation, the Prometheus endpoint and /stats"""
+    print("📈 Testing Metrics...")
+    
+    ops = None
+    try:
+        import tempfile
+        import time
+        import urllib.request
+        import handlers.admin
+        from database.db_setup import create_tables
+        from database.db_operations import DatabaseOperations
+        from utils.metrics import metrics, instrument_handler, instrument_database, start_metrics_server
+        
+        metrics.reset()
+        
+        async def ok_command(update, context):
+            await update.message.reply_text('ok')
+        
+        async def broken_command(update, context):
+            raise ValueError('boom')
+        
+        api = FakeBotAPI()
+        wrapped_ok = instrument_handler(ok_command)
+        wrapped_broken = instrument_handler(broken_command)
+        for _ in range(3):
+            await wrapped_ok(*make_update(api, 1, '/ok'))
+        try:
+            await wrapped_broken(*make_update(api, 1, '/broken'))
+        except ValueError:
+            pass
+        handler_times = metrics.histograms('bot_handler_seconds')
+        assert handler_times[(('handler', 'ok_command'),)].count == 3
+        assert metrics.counters('bot_handler_errors_total')[(('handler', 'broken_command'),)] == 1
+        print("✅ Handler latency and errors recorded")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'metrics.db')
+            create_tables(db_path)
+            ops = DatabaseOperations(db_path)
+            instrument_database(ops)
+            await ops.add_user(1, 'USD')
+            await ops.log_expense(1, 1000, '#food')
+            await ops.get_user(1)
+            db_times = metrics.histograms('bot_db_call_seconds')
+            for method in ('add_user', 'log_expense', 'get_user', 'execute_query'):
+                assert (('method', method),) in db_times, f"{method} not timed"
+            pool_waits = metrics.histograms('bot_db_pool_wait_seconds')
+            assert pool_waits[(('pool', 'write'),)].count >= 2 and pool_waits[(('pool', 'read'),)].count >= 1
+            print("✅ Database methods and pool wait recorded")
+        
+        # Instrumentation must stay cheap enough to leave on all the time
+        async def noop(update, context):
+            return None
+        wrapped_noop = instrument_handler(noop, name='noop')
+        calls = 20000
+        start = time.perf_counter()
+        for _ in range(calls):
+            await noop(None, None)
+        bare = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(calls):
+            await wrapped_noop(None, None)
+        overhead_us = (time.perf_counter() - start - bare) / calls * 1e6
+        assert overhead_us < 20, f"{overhead_us:.1f}µs overhead per call"
+        print(f"✅ Instrumentation overhead {overhead_us:.2f}µs per call")
+        
+        server = start_metrics_server(0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            body = urllib.request.urlopen(url, timeout=5).read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert '# TYPE bot_handler_seconds histogram' in body
+        assert 'bot_handler_seconds_count{handler="ok_command"} 3' in body
+        assert 'bot_db_call_seconds_bucket{method="get_user",le="+Inf"} 1' in body
+        print("✅ Prometheus endpoint serves histograms")
+        
+        original_admins = handlers.admin.ADMIN_USER_IDS
+        try:
+            handlers.admin.ADMIN_USER_IDS = {42}
+            update, context = make_update(api, 7, '/stats')
+            await handlers.admin.stats_command(update, context)
+            assert '🔒' in update.message.replies[-1]
+            update, context = make_update(api, 42, '/stats')
+            context.bot_data['worker_restarts'] = [0, 2]
+            await handlers.admin.stats_command(update, context)
+            assert 'ok_command: 3 calls' in update.message.replies[-1]
+            assert 'restarted after dying: #2 × 2' in update.message.replies[-1], update.message.replies[-1]
+            assert 'broken_command' in update.message.replies[-1] and 'errors' in update.message.replies[-1]
+        finally:
+            handlers.admin.ADMIN_USER_IDS = original_admins
+        print("✅ /stats is admin-only and lists handlers")
+        
+        print("📈 Metrics: ALL TESTS PASSED\n")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Metrics test failed: {e}")
+        return False
+    finally:
+        if ops is not None:
+            ops.close()
+
+async def test_sampling_profiler():
+    """Test that sampled handler calls leave rotated pstats and allocation reports"""
+    print("🔬 Testing Sampling Profiler...")
+    
+    try:
+        import pstats
+        import tempfile
+        from utils.profiling import SamplingProfiler
+        
+        async def report_command(update, context):
+            lines = [f"• #category{i}: {i * 1.5:.2f}" for i in range(2000)]
+            await update.message.reply_text('\n'.join(lines))
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            off = SamplingProfiler(sample_rate=0, directory=os.path.join(tmp, 'off'))
+            wrapped = off.wrap(report_command)
+            await wrapped(*make_update(FakeBotAPI(), 1, '/report'))
+            assert not os.path.exists(off.directory), "disabled profiler should not write anything"
+            print("✅ Sample rate 0 profiles nothing")
+            
+            profiler = SamplingProfiler(sample_rate=1.0, directory=tmp, max_files=3)
+            wrapped = profiler.wrap(report_command)
+            for _ in range(5):
+                await wrapped(*make_update(FakeBotAPI(), 1, '/report'))
+            reports = sorted(name for name in os.listdir(tmp) if name.endswith('.prof'))
+            assert profiler.dumps == 5 and len(reports) == 3, f"{profiler.dumps} dumps, {len(reports)} kept"
+            assert all('-report_command-' in name and name.endswith('ms-%d.prof' % os.getpid()) for name in reports)
+            print("✅ Reports tagged with command and timing, rotated to max_files")
+            
+            base = os.path.join(tmp, reports[-1][:-len('.prof')])
+            stats = pstats.Stats(base + '.prof')
+            assert any(func[2] == 'report_command' for func in stats.stats)
+            with open(base + '.txt', encoding='utf-8') as f:
+                report = f.read()
+            assert 'tag: report_command' in report and 'allocation sites' in report
+            print("✅ pstats and top allocation sites written")
+        
+        print("🔬 Sampling profiler: ALL TESTS PASSED\n")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Sampling profiler test failed: {e}")
+        return False
+
+async def test_user_cache():
+    """Test that user lookups are cached and a /log only queries for its write and budget check"""
+    print("👤 Testing User Cache...")
+    
+    from database.db_operations import db_ops
+    original_path = db_ops.db_path
+    try:
+        import tempfile
+        import time
+        from database.db_setup import create_tables
+        from database.user_cache import UserCache
+        from handlers.expenses import log_expense_command
+        
+        cache = UserCache(max_entries=2, ttl=0.05)
+        for user_id in (1, 2, 3):
+            cache.put(user_id, {'user_id': user_id, 'currency': 'USD'})
+        assert cache.get(1) is None and cache.get(3)['currency'] == 'USD', "least recently used is evicted"
+        time.sleep(0.06)
+        assert cache.get(3) is None, "entries expire after the TTL"
+        generation = cache.generation
+        cache.invalidate(2)
+        cache.put(2, {'user_id': 2, 'currency': 'EUR'}, generation)
+        assert cache.get(2) is None, "a read that raced an invalidation is not cached"
+        stats = cache.stats()
+        assert stats['hits'] == 1 and stats['evictions'] == 1 and 0 < stats['hit_ratio'] < 1
+        print("✅ LRU eviction, TTL expiry and stale-read protection")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_ops.close()
+            db_ops.db_path = os.path.join(tmp, 'user_cache.db')
+            create_tables(db_ops.db_path)
+            await db_ops.add_user(9, 'USD')
+            await db_ops.set_budget(9, '#food', 10000)
+            await db_ops.get_user(9)
+            
+            queries = []
+            execute_query = db_ops.execute_query
+            async def recording_execute_query(query, *args, **kwargs):
+                queries.append(' '.join(query.split()))
+                return await execute_query(query, *args, **kwargs)
+            db_ops.execute_query = recording_execute_query
+            try:
+                api = FakeBotAPI()
+                update, context = make_update(api, 9, '/log 85 on #food for lunch')
+                await log_expense_command(update, context)
+            finally:
+                del db_ops.execute_query
+            assert 'Heads up' in update.message.replies[-1], update.message.replies[-1]
+            assert len(queries) == 2, f"expected insert + budget check, got {queries}"
+            assert queries[0].startswith('INSERT INTO transactions') and 'FROM budgets' in queries[1]
+            print("✅ /log with a warm cache: 2 queries (insert + budget check)")
+            
+            await db_ops.update_user_currency(9, 'EUR')
+            assert (await db_ops.get_user(9))['currency'] == 'EUR', "currency change is visible immediately"
+            print("✅ /setcurrency invalidates the cached user")
+        
+        print("👤 User cache: ALL TESTS PASSED\n")
+        return True
+    
+    except Exception as e:
+        print(f"❌ User cache test failed: {e}")
+        return False
+    finally:
+        db_ops.close()
+        db_ops.db_path = original_path
+
+async def test_concurrent_updates():
+    """Test concurrent update processing keeps each user's updates in order"""
+    print("🌐 Testing Concurrent Updates...")
+    
+    from database.db_operations import db_ops
+    original_path = db_ops.db_path
+    api = None
+    try:
+        import logging
+        import random
+        import tempfile
+        from telegram import Update
+        from database.db_setup import create_tables
+        from utils.update_processor import PerUserUpdateProcessor
+        from benchmarks.fake_bot_api import FakeBotAPI as FakeBotServer, command_update
+        from benchmarks.bench_webhook import run_updates
+        
+        processor = PerUserUpdateProcessor(16)
+        finished = []
+        running = 0
+        peak = 0
+        async def handle(user_id, seq):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(random.uniform(0, 0.01))
+            finished.append((user_id, seq))
+            running -= 1
+        
+        tasks = []
+        for seq in range(5):
+            for user_id in range(1, 5):
+                update = Update.de_json(command_update(len(tasks) + 1, user_id, f'/log {seq}'), None)
+                tasks.append(asyncio.create_task(processor.process_update(update, handle(user_id, seq))))
+        await asyncio.gather(*tasks)
+        for user_id in range(1, 5):
+            assert [seq for uid, seq in finished if uid == user_id] == list(range(5)), f"user {user_id} out of order"
+        assert peak > 1, "different users should be processed concurrently"
+        assert processor.active_users == 0, "per-user locks are dropped once idle"
+        print(f"✅ Per-user order kept with {peak} updates in flight")
+        
+        # One user's burst must not take every slot: user 2 runs while user 1's backlog waits its turn
+        processor = PerUserUpdateProcessor(2)
+        finished.clear()
+        async def slow(user_id, seq):
+            await asyncio.sleep(0.05)
+            finished.append((user_id, seq))
+        tasks = [
+            asyncio.create_task(processor.process_update(
+                Update.de_json(command_update(100 + seq, 1, f'/summary {seq}'), None), slow(1, seq)
+            ))
+            for seq in range(6)
+        ]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(processor.process_update(
+            Update.de_json(command_update(200, 2, '/log 5 on #tea'), None), slow(2, 0)
+        )))
+        await asyncio.gather(*tasks)
+        assert finished.index((2, 0)) <= 1, f"user 2 waited behind user 1's burst: {finished}"
+        print("✅ A burst from one user does not block other users")
+        
+        logging.getLogger('httpx').setLevel(logging.WARNING)
+        with tempfile.TemporaryDirectory() as tmp:
+            db_ops.close()
+            db_ops.db_path = os.path.join(tmp, 'updates.db')
+            create_tables(db_ops.db_path)
+            api = FakeBotServer(latency_ms=10).start()
+            sequential = await run_updates(api, 1, users=10, per_user=3, timeout=30)
+            concurrent = await run_updates(api, 16, users=10, per_user=3, timeout=30)
+        assert sequential['in_order'] and concurrent['in_order'], "every user's /log stored in order"
+        assert concurrent['replied'] == 30, f"{concurrent['replied']} of 30 replies sent"
+        speedup = concurrent['updates_per_sec'] / sequential['updates_per_sec']
+        assert speedup > 2, f"concurrent updates only {speedup:.1f}x faster"
+        print(f"✅ Fake Bot API: {speedup:.1f}x throughput with concurrent_updates=16")
+        
+        print("🌐 Concurrent updates: ALL TESTS PASSED\n")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Concurrent updates test failed: {e}")
+        return False
+    finally:
+        if api is not None:
+            api.stop()
+        db_ops.close()
+        db_ops.db_path = original_path
+
+async def test_sharding():
+    """Test user-to-shard routing, resharding and the multi-process worker mode"""
+    print("🧩 Testing Sharded Workers...")
+    
+    api = None
+    try:
+        import logging
+        import sqlite3
+        import tempfile
+        import time
+        from benchmarks.seed import seed_database
+        from benchmarks.fake_bot_api import FakeBotAPI as FakeBotServer, command_update
+        from benchmarks.bench_sharding import run_workers
+        from database.db_setup import create_tables
+        from utils.dispatcher import ShardedDispatcher
+        from database.sharding import shard_for_user, shard_path, shard_paths
+        from database.reshard import reshard
+        
+        assert shard_path('bot.db', 0, 1) == 'bot.db', "one shard is the plain database file"
+        assert shard_paths('bot.db', 2) == ['bot.shard-1-of-2.db', 'bot.shard-2-of-2.db']
+        spread = [0] * 4
+        for user_id in range(1, 4001):
+            index = shard_for_user(user_id, 4)
+            assert index == shard_for_user(user_id, 4), "routing must be stable"
+            spread[index] += 1
+        assert min(spread) > 800, f"users unevenly spread over shards: {spread}"
+        print(f"✅ 4000 users over 4 shards: {spread}")
+        
+        def per_user(paths):
+            totals, rollup = {}, {}
+            for path in paths:
+                conn = sqlite3.connect(path)
+                for user_id, count, amount in conn.execute(
+                    "SELECT user_id, COUNT(*), ROUND(SUM(amount), 2) FROM transactions GROUP BY user_id"
+                ):
+                    assert user_id not in totals, f"user {user_id} found in two shards"
+                    totals[user_id] = (count, amount)
+                for user_id, amount in conn.execute(
+                    "SELECT user_id, ROUND(SUM(total), 2) FROM monthly_category_totals GROUP BY user_id"
+                ):
+                    rollup[user_id] = amount
+                conn.close()
+            return totals, rollup
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            base = os.path.join(tmp, 'shards.db')
+            seed_database(base, users=30, txns_per_user=40, budgets_per_user=3)
+            before, _ = per_user([base])
+            
+            moved = reshard(base, 1, 3)
+            assert sum(moved.values()) == 30, f"{sum(moved.values())} of 30 users moved"
+            after, rollup = per_user(shard_paths(base, 3))
+            assert after == before, "every user's transactions survive resharding"
+            assert rollup == {user_id: amount for user_id, (_, amount) in after.items()}, "rollup rebuilt"
+            for index, path in enumerate(shard_paths(base, 3)):
+                conn = sqlite3.connect(path)
+                owners = {row[0] for row in conn.execute("SELECT user_id FROM users")}
+                conn.close()
+                assert all(shard_for_user(user_id, 3) == index for user_id in owners), "user in the wrong shard"
+            
+            reshard(base, 3, 2, delete_old=True)
+            assert not any(os.path.exists(path) for path in shard_paths(base, 3)), "old shards deleted"
+            assert per_user(shard_paths(base, 2))[0] == before, "resharding down keeps the data too"
+            try:
+                reshard(base, 1, 2)
+                assert False, "existing target shards must not be overwritten"
+            except FileExistsError:
+                pass
+            print("✅ Resharded 1 → 3 → 2 shards with per-user totals and rollup intact")
+            
+            logging.getLogger('httpx').setLevel(logging.WARNING)
+            api = FakeBotServer().start()
+            result = run_workers(api, 2, users=8, per_user=3, tmp=tmp, timeout=60)
+            assert result['replied'] == 24, f"{result['replied']} of 24 replies sent"
+            assert result['consistent'], "each user's expenses stored once, in order, in their own shard"
+            assert all(result['per_worker']), f"both workers should get users: {result['per_worker']}"
+            print(f"✅ 2 worker processes handled 24 /log updates, split {result['per_worker']}")
+            
+            # A worker that dies is restarted when its next update arrives, not silently fed
+            db_path = os.path.join(tmp, 'restart.db')
+            create_tables(db_path)
+            dispatcher = ShardedDispatcher(1, '123:fake', base_url=api.base_url, db_path=db_path).start()
+            try:
+                api.sent.clear()
+                dispatcher._processes[0].kill()
+                dispatcher._processes[0].join()
+                assert dispatcher.dead_workers == [0]
+                logging.disable(logging.CRITICAL)
+                try:
+                    dispatcher.submit(0, command_update(1, 5, '/start'))
+                finally:
+                    logging.disable(logging.NOTSET)
+                deadline = time.perf_counter() + 60
+                while not api.sent and time.perf_counter() < deadline:
+                    await asyncio.sleep(0.05)
+                assert api.sent, "the restarted worker should answer"
+                assert list(dispatcher.restarts) == [1] and dispatcher.dead_workers == []
+            finally:
+                dispatcher.stop()
+            print("✅ A dead worker is restarted and counted")
+        
+        print("🧩 Sharded workers: ALL TESTS PASSED\n")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Sharding test failed: {e}")
+        return False
+    finally:
+        if api is not None:
+            api.stop()
+
+async def test_admission_control():
+    """Test per-user token buckets, idle eviction and the expensive-command cap"""
+    print("🚦 Testing Admission Control...")
+    
+    try:
+        import time
+        from types import SimpleNamespace
+        from telegram.ext import CommandHandler
+        from utils.admission import AdmissionController, handler_command
+        
+        now = [0.0]
+        controller = AdmissionController(
+            rate_per_minute=60, burst=10, costs={'summary': 5}, expensive={'summary'},
+            max_expensive=1, queue_timeout=0.05, clock=lambda: now[0]
+        )
+        assert [controller.try_acquire(1, 'log')[0] for _ in range(10)] == [True] * 10, "a full burst is allowed"
+        admitted, retry_after = controller.try_acquire(1, 'log')
+        assert not admitted and abs(retry_after - 1.0) < 1e-6, f"11th /log should wait 1s, got {retry_after}"
+        assert controller.try_acquire(2, 'summary')[0], "other users have their own bucket"
+        now[0] = 3.0
+        assert not controller.try_acquire(1, 'summary')[0], "3 units regained, /summary costs 5"
+        assert controller.try_acquire(1, 'log')[0], "a cheaper command still fits"
+        assert controller.tracked_users == 2
+        now[0] = 60.0
+        assert controller.sweep() == 2 and controller.tracked_users == 0, "refilled buckets are dropped"
+        assert controller.try_acquire(1, 'summary')[0], "an evicted user starts with a full bucket"
+        print("✅ Burst, refill, per-command cost and idle eviction")
+        
+        calls = []
+        async def summary_command(update, context):
+            calls.append(update.effective_user.id)
+            await asyncio.sleep(0.2)
+        
+        guarded = controller.wrap(summary_command, 'summary')
+        first, second = stubs.make_update(10, '/summary'), stubs.make_update(11, '/summary')
+        await asyncio.gather(guarded(*first), guarded(*second))
+        assert calls == [10], "only one expensive command may run at once"
+        assert 'try again in a minute' in second[0].message.replies[0], "the second user is told to come back"
+        
+        flood = stubs.make_update(10, '/summary')
+        for _ in range(5):
+            await guarded(*flood)
+        assert calls == [10, 10], f"a flooding user is throttled, ran {len(calls)} times"
+        assert len(flood[0].message.replies) == 1 and 'wait' in flood[0].message.replies[0], \
+            "a throttled user gets one backoff reply, not one per message"
+        assert controller.stats()['busy'] == 1 and controller.stats()['expensive_running'] == 0
+        print("✅ Concurrency cap and one friendly backoff reply per window")
+        
+        # By default a busy cap answers at once rather than holding an update slot while it waits
+        immediate = AdmissionController(rate_per_minute=60, burst=10, costs={}, expensive={'summary'},
+                                        max_expensive=1, queue_timeout=0)
+        guarded = immediate.wrap(summary_command, 'summary')
+        running = asyncio.create_task(guarded(*stubs.make_update(12, '/summary')))
+        await asyncio.sleep(0)
+        waiting = stubs.make_update(13, '/summary')
+        started = time.perf_counter()
+        await guarded(*waiting)
+        assert time.perf_counter() - started < 0.05 and 'try again' in waiting[0].message.replies[0]
+        await running
+        assert calls[-1] == 12 and immediate.stats()['busy'] == 1
+        print("✅ A busy expensive-command cap rejects without waiting")
+        
+        assert handler_command(CommandHandler('spent', summary_command)) == 'spent'
+        assert handler_command(SimpleNamespace(callback=summary_command)) == 'summary'
+        from handlers.expenses import history_page_callback
+        assert handler_command(SimpleNamespace(callback=history_page_callback)) == 'listhistory', \
+            "paging is charged like /listhistory"
+        
+        # Every rejected button press is answered, with text only once per backoff window
+        answers = []
+        async def answer(text=None, **kwargs):
+            answers.append(text)
+        async def page_callback(update, context):
+            await update.callback_query.answer()
+        paging = AdmissionController(rate_per_minute=60, burst=2, costs={'listhistory': 2}, expensive=(),
+                                     clock=lambda: now[0]).wrap(page_callback, 'listhistory')
+        press = stubs.make_update(20, '')
+        press[0].callback_query = SimpleNamespace(answer=answer)
+        for _ in range(3):
+            await paging(*press)
+        assert answers[0] is None and 'wait' in answers[1] and answers[2] is None, answers
+        print("✅ Rejected button presses are always answered; paging costs like /listhistory")
+        
+        print("🚦 Admission control: ALL TESTS PASSED\n")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Admission control test failed: {e}")
+        return False
+
+async def test_analytics_cache():
+    """Test the NumPy analytics cache answers /summary ranges exactly like SQL and follows writes"""
+    print("🧮 Testing Analytics Cache...")
+    
+    ops = None
+    try:
+        import tempfile
+        from datetime import timedelta
+        from benchmarks.seed import seed_database
+        from database.db_operations import DatabaseOperations
+        from utils.analytics_cache import AnalyticsCache
+        
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        ranges = [
+            (today, today + timedelta(days=1, seconds=-1)),
+            (today - timedelta(days=6), today + timedelta(days=1, seconds=-1)),
+            (today.replace(day=1), today + timedelta(days=1, seconds=-1)),
+            (today - timedelta(days=400), today + timedelta(days=30, seconds=-1))
+        ]
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'analytics.db')
+            seed_database(db_path, users=3, txns_per_user=2000, budgets_per_user=0, currencies=('USD', 'EUR', 'JPY'))
+            ops = DatabaseOperations(db_path)
+            await ops.set_exchange_rates({'USD': 1.0, 'EUR': 0.92, 'JPY': 151.3})
+            cache = AnalyticsCache()
+            cache.attach(ops)
+            
+            async def check(user_id):
+                for start, end in ranges:
+                    expected = await ops.get_spending_by_category(user_id, start, end)
+                    actual = await cache.spending_by_category(user_id, start, end, 'USD')
+                    assert expected == actual, f"{start:%Y-%m-%d}..{end:%Y-%m-%d}: {expected} != {actual}"
+                    total = await ops.get_total_spending(user_id, start, end)
+                    assert total == await cache.total_spending(user_id, start, end, 'USD')
+            
+            for user_id in (1, 2, 3):
+                await check(user_id)
+            assert cache.stats()['misses'] == 3, "each user is loaded once"
+            print(f"✅ {len(ranges)} ranges match SQL for 3 users with 2000 transactions in 3 currencies each")
+            
+            await ops.log_expense(1, 1250, 'Coffee', 'new category', currency='USD')
+            await ops.log_expense(1, 4000, 'Food', 'backdated', today - timedelta(days=500), 'EUR')
+            history = await ops.get_transaction_history(1, limit=3)
+            for transaction in history[:2]:
+                await ops.delete_transaction(1, transaction['id'])
+            await ops.log_expense(1, 725, 'Food', 'today', currency='JPY')
+            # Today's row was stored as UTC CURRENT_TIMESTAMP, so also check the whole history
+            ranges.append((today - timedelta(days=800), today + timedelta(days=2, seconds=-1)))
+            await check(1)
+            assert cache.stats()['misses'] == 3, "writes update the cached arrays instead of reloading"
+            print("✅ Logged and deleted expenses are applied incrementally")
+            
+            await ops.log_expenses_bulk(2, [(500, 'Food', 'import', today)])
+            await check(2)
+            assert cache.stats()['misses'] == 4, "a bulk import reloads the user"
+            assert await cache.spending_by_category(1, today.replace(hour=9), today, 'USD') is None, \
+                "ranges that are not whole days fall back to SQL"
+            
+            small = AnalyticsCache(max_bytes=cache._series[1].nbytes + 1024)
+            small.attach(ops)
+            for user_id in (1, 2, 3):
+                await small.spending_by_category(user_id, *ranges[0], 'USD')
+            stats = small.stats()
+            assert stats['users'] == 1 and stats['evictions'] == 2 and stats['size_bytes'] <= small.max_bytes, stats
+            print(f"✅ LRU eviction keeps the cache under {small.max_bytes:,} bytes")
+        
+        # On a server at UTC+14 the local date is already tomorrow; the cache must count UTC days
+        import utils.analytics_cache as cache_module
+        from datetime import date
+        utc_now = datetime(2024, 1, 31, 23, 30, tzinfo=timezone.utc)
+        
+        class FakeDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return utc_now.astimezone(tz) if tz else (utc_now + timedelta(hours=14)).replace(tzinfo=None)
+        
+        class FakeDate(date):
+            @classmethod
+            def today(cls):
+                return date(2024, 2, 1)
+        
+        cache_module.datetime, cache_module.date = FakeDatetime, FakeDate
+        try:
+            series = cache_module.UserSeries.from_rows([], cache_module.utc_today())
+            assert cache_module.utc_today() == cache_module.day_ordinal(None) == date(2024, 1, 31).toordinal()
+            series.add(100, 'Food', 'USD', cache_module.day_ordinal(None))
+            assert series.spending_by_category(*[date(2024, 1, 31).toordinal()] * 2) == [('Food', 'USD', 100)]
+        finally:
+            cache_module.datetime, cache_module.date = datetime, date
+        print("✅ Cached days and headroom follow UTC, not the server's zone")
+        
+        print("🧮 Analytics cache: ALL TESTS PASSED\n")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Analytics cache test failed: {e}")
+        return False
+    finally:
+        if ops is not None:
+            ops.close()
+
+async def test_timestamps():
+    """Test the integer ts column: online backfill of old rows, index switch-over and per-user time zones"""
+    print("🕒 Testing Epoch Timestamps...")
+    
+    from database.db_operations import db_ops
+    original_path = db_ops.db_path
+    try:
+        import sqlite3
+        import tempfile
+        from datetime import timedelta
+        from zoneinfo import ZoneInfo
+        from database import migrations
+        from database.db_setup import create_tables
+        from handlers.onboarding import settimezone_command
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_ops.close()
+            db_ops.db_path = os.path.join(tmp, 'timestamps.db')
+            
+            # A database from before migration 5, with history stored as text dates only
+            all_migrations = list(migrations.MIGRATIONS)
+            migrations.MIGRATIONS[:] = [entry for entry in all_migrations if entry[0] < 5]
+            try:
+                create_tables(db_ops.db_path)
+            finally:
+                migrations.MIGRATIONS[:] = all_migrations
+            conn = sqlite3.connect(db_ops.db_path)
+            with conn:
+                conn.execute("INSERT INTO users (user_id, currency) VALUES (7, 'USD')")
+                conn.executemany(
+                    "INSERT INTO transactions (user_id, amount, category, description, transaction_date) "
+                    "VALUES (7, ?, ?, 'old', ?)",
+                    [(float(i % 50), f'#c{i % 4}', f'2024-03-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00')
+                     for i in range(300)]
+                )
+            conn.close()
+            create_tables(db_ops.db_path)
+            
+            assert not await db_ops.timestamps_ready(), "old rows keep the text indexes until backfilled"
+            await db_ops.log_expense(7, 9900, '#c0', 'during upgrade', datetime(2024, 3, 15, 12))
+            ranges = [(datetime(2024, 3, 1), datetime(2024, 3, 31, 23, 59, 59)),
+                      (datetime(2024, 3, 10, 6), datetime(2024, 3, 12, 18, 30))]
+            before = [await db_ops.get_spending_by_category(7, *r) for r in ranges]
+            history_before = [t['id'] for t in await db_ops.get_transaction_history(7, 50)]
+            # The old REAL dollar amounts were converted to cents on upgrade
+            assert sum(before[0].values()) == sum(i % 50 for i in range(300)) * 100 + 9900, before
+            
+            updated = await db_ops.backfill_timestamps(chunk_size=64, pause_ms=0)
+            assert updated == 300, updated
+            assert await db_ops.timestamps_ready()
+            conn = sqlite3.connect(db_ops.db_path)
+            assert conn.execute("SELECT COUNT(*) FROM transactions WHERE ts IS NULL").fetchone()[0] == 0
+            names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            conn.close()
+            assert not names & set(migrations.TEXT_DATE_INDEXES), names
+            assert [await db_ops.get_spending_by_category(7, *r) for r in ranges] == before
+            assert [t['id'] for t in await db_ops.get_transaction_history(7, 50)] == history_before
+            assert await db_ops.backfill_timestamps() == 0, "a second run has nothing to do"
+            print(f"✅ {updated} old rows backfilled in chunks; results unchanged, text indexes dropped")
+            
+            page = await db_ops.get_transaction_page(7, page_size=5)
+            last = page['transactions'][-1]
+            by_int = await db_ops.get_transaction_page(7, before_cursor=(last['cursor'], last['id']), page_size=5)
+            by_text = await db_ops.get_transaction_page(7, before_cursor=(last['date'], last['id']), page_size=5)
+            assert isinstance(last['cursor'], int) and by_int == by_text
+            print("✅ Pages continue from integer cursors and from old text cursors alike")
+            
+            api = FakeBotAPI()
+            update, context = make_update(api, 7, '/settimezone asia/kolkata')
+            await settimezone_command(update, context)
+            user = await db_ops.get_user(7)
+            assert user['timezone'] == 'Asia/Kolkata', update.message.replies
+            # 20:00 UTC on the 10th is already the 11th in India (UTC+5:30)
+            await db_ops.log_expense(7, 100000, '#late', 'night', datetime(2024, 3, 10, 20))
+            tz = ZoneInfo(user['timezone'])
+            day = datetime(2024, 3, 11, tzinfo=tz)
+            local = await db_ops.get_spending_by_category(7, day, day + timedelta(days=1, seconds=-1))
+            utc = await db_ops.get_spending_by_category(7, datetime(2024, 3, 11), datetime(2024, 3, 11, 23, 59, 59))
+            assert local.get('#late') == 100000 and '#late' not in utc
+            update, context = make_update(api, 7, '/settimezone Mars/Olympus')
+            await settimezone_command(update, context)
+            assert (await db_ops.get_user(7))['timezone'] == 'Asia/Kolkata'
+            print("✅ Day boundaries follow the user's time zone")
+        
+        print("🕒 Epoch timestamps: ALL TESTS PASSED\n")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Epoch timestamp test failed: {e}")
+        return False
+    finally:
+        db_ops.close()
+        db_ops.db_path = original_path
+
+async def test_minor_units():
+    """Test amounts stored as integer minor units: parsing, upgrade from REAL and reports"""
+    print("🪙 Testing Integer Minor Units...")
+    
+    from database.db_operations import db_ops, current_year_month
+    original_path = db_ops.db_path
+    try:
+        import sqlite3
+        import tempfile
+        from database import migrations
+        from database.db_setup import create_tables
+        from database.rollup import check_rollup
+        from handlers.expenses import log_expense_command
+        from handlers.budgets import budget_command
+        from utils.money import parse_amount, format_amount
+        
+        assert [parse_amount(text, 'USD') for text in ('12', '12.5', '0.1', '12.345', '12.344')] == [1200, 1250, 10, 1235, 1234]
+        assert parse_amount('150.5', 'JPY') == 151 and format_amount(151, 'JPY') == '151'
+        assert format_amount(5, 'USD') == '0.05' and format_amount(123456, 'INR') == '1234.56'
+        for bad in ('1e3', '-5', '1.2.3', 'nan', ''):
+            try:
+                parse_amount(bad, 'USD')
+                raise AssertionError(f"'{bad}' should be rejected")
+            except ValueError:
+                pass
+        print("✅ Typed amounts become minor units without floats, rounding half up")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_ops.close()
+            db_ops.db_path = os.path.join(tmp, 'minor.db')
+            
+            # A database from before migration 6 with REAL amounts in two currencies
+            all_migrations = list(migrations.MIGRATIONS)
+            migrations.MIGRATIONS[:] = [entry for entry in all_migrations if entry[0] < 6]
+            try:
+                create_tables(db_ops.db_path)
+            finally:
+                migrations.MIGRATIONS[:] = all_migrations
+            conn = sqlite3.connect(db_ops.db_path)
+            with conn:
+                conn.execute("INSERT INTO users (user_id, currency) VALUES (1, 'USD'), (2, 'JPY')")
+                conn.executemany(
+                    "INSERT INTO transactions (user_id, amount, category, transaction_date) VALUES (?, ?, ?, ?)",
+                    [(1, 0.1, '#food', '2024-05-01 10:00:00'), (1, 0.2, '#food', '2024-05-02 10:00:00'),
+                     (1, 19.99, '#fun', '2024-05-03 10:00:00'), (2, 1500.0, '#food', '2024-05-01 10:00:00')]
+                )
+                conn.execute("INSERT INTO budgets (user_id, category, amount) VALUES (1, '#food', 50.5), (2, '#food', 3000)")
+            conn.close()
+            # Migration 6 keeps its own exponent table, so a later config change can't alter what it does
+            import config
+            saved_exponents = dict(config.CURRENCY_EXPONENTS)
+            config.CURRENCY_EXPONENTS.update({'USD': 3, 'JPY': 2})
+            try:
+                create_tables(db_ops.db_path)
+            finally:
+                config.CURRENCY_EXPONENTS.clear()
+                config.CURRENCY_EXPONENTS.update(saved_exponents)
+            
+            conn = sqlite3.connect(db_ops.db_path)
+            assert conn.execute("SELECT DISTINCT typeof(amount) FROM transactions").fetchall() == [('integer',)]
+            assert check_rollup(conn) == []
+            conn.close()
+            may = (datetime(2024, 5, 1), datetime(2024, 5, 31, 23, 59, 59))
+            assert await db_ops.get_spending_by_category(1, *may) == {'#food': 30, '#fun': 1999}
+            assert await db_ops.get_total_spending(2, *may) == 1500
+            assert [b['amount'] for b in await db_ops.get_budgets(1)] == [5050]
+            print("✅ REAL amounts converted to cents and yen on upgrade; 0.1 + 0.2 is exactly 0.30")
+            
+            api = FakeBotAPI()
+            for _ in range(3):
+                update, context = make_update(api, 1, '/log 0.1 on #coffee')
+                await log_expense_command(update, context)
+            assert '$0.10 on #coffee' in update.message.replies[-1], update.message.replies[-1]
+            update, context = make_update(api, 1, '/budget #coffee 0.305')
+            await budget_command(update, context)
+            assert update.message.replies[-1] == '✅ Budget set: #coffee = $0.31/month', update.message.replies[-1]
+            status = await db_ops.get_category_budget_status(1, '#coffee', current_year_month())
+            assert status == {'amount': 31, 'spent': 30}, status
+            print("✅ /log and /budget store exact minor units")
+        
+        print("🪙 Integer minor units: ALL TESTS PASSED\n")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Integer minor units test failed: {e}")
+        return False
+    finally:
+        db_ops.close()
+        db_ops.db_path = original_path
+
+async def test_multi_expense_log():
+    """Test several expenses in one /log: one transaction, one budget query, one reply"""
+    print("🧾 Testing Multi-Expense /log...")
+    
+    from database.db_operations import db_ops
+    original_path = db_ops.db_path
+    try:
+        import tempfile
+        from database.db_setup import create_tables
+        from handlers.expenses import log_expense_command
+        from utils.expense_parser import split_expenses
+        
+        assert split_expenses(' 4 on #food ;\n\n3.5 on #bus;; ') == ['4 on #food', '3.5 on #bus']
+        print("✅ Entries split on newlines and semicolons, blanks dropped")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_ops.close()
+            db_ops.db_path = os.path.join(tmp, 'multi.db')
+            create_tables(db_ops.db_path)
+            await db_ops.add_user(1, 'USD')
+            await db_ops.set_budget(1, '#food', 1000)
+            
+            writes = []
+            queries = []
+            run_in_pool = db_ops._run_in_pool
+            execute_query = db_ops.execute_query
+            async def counting_pool(func, *args, write):
+                if write:
+                    writes.append(func)
+                return await run_in_pool(func, *args, write=write)
+            async def counting_query(query, *args, **kwargs):
+                queries.append(query)
+                return await execute_query(query, *args, **kwargs)
+            notified = []
+            on_logged = lambda user_id, **details: notified.append(details['category'])
+            db_ops.add_listener('expense_logged', on_logged)
+            
+            api = FakeBotAPI()
+            update, context = make_update(api, 1, '/log 4 on #food for lunch\n3.5 on #transport; 7 on #food')
+            db_ops._run_in_pool, db_ops.execute_query = counting_pool, counting_query
+            try:
+                await log_expense_command(update, context)
+            finally:
+                db_ops._run_in_pool, db_ops.execute_query = run_in_pool, execute_query
+                db_ops._listeners['expense_logged'].remove(on_logged)
+            
+            reply = update.message.replies[-1]
+            assert len(update.message.replies) == 1 and 'Logged 3 expenses' in reply, reply
+            assert 'Total:** $14.50' in reply and 'exceeded your #food budget by 10.0%' in reply, reply
+            assert 'Set a budget for #transport' in reply and '📝 lunch' in reply, reply
+            assert len(writes) == 1, f"expected one write transaction, got {len(writes)}"
+            assert sum('FROM budgets' in query for query in queries) == 1, queries
+            assert sorted(notified) == ['#food', '#food', '#transport'], notified
+            history = await db_ops.get_transaction_history(1, limit=10)
+            assert sorted(t['amount'] for t in history) == [350, 400, 700]
+            print("✅ 3 expenses: one insert transaction, one budget query, one reply")
+            
+            # A bad entry anywhere rejects the whole message
+            update, context = make_update(api, 1, '/log 5 on #food\nfive on #fun')
+            await log_expense_command(update, context)
+            assert 'nothing was logged' in update.message.replies[-1] and '`five on #fun`' in update.message.replies[-1]
+            assert len(await db_ops.get_transaction_history(1, limit=10)) == 3
+            
+            # A single expense still gets the familiar reply
+            update, context = make_update(api, 1, '/log 1 on #food')
+            await log_expense_command(update, context)
+            assert update.message.replies[-1].startswith('✅ **Logged successfully!**\n💰 $1.00 on #food\n\n🚨')
+            print("✅ Invalid entries log nothing; single expenses reply as before")
+        
+        print("🧾 Multi-expense /log: ALL TESTS PASSED\n")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Multi-expense /log test failed: {e}")
+        return False
+    finally:
+        db_ops.close()
+        db_ops.db_path = original_path
+
+async def test_currency_conversion():
+    """Test per-transaction currencies, exchange rates from CSV and converted reports"""
+    print("💱 Testing Currency Conversion...")
+    
+    from database.db_operations import db_ops, current_year_month
+    original_path = db_ops.db_path
+    try:
+        import sqlite3
+        import tempfile
+        from database import migrations
+        from database.db_setup import create_tables
+        from database.exchange_rates import read_rates_csv
+        from database.rollup import check_rollup
+        from handlers.expenses import log_expense_command, list_history_command
+        from handlers.reports import summary_command
+        from utils.money import convert_totals
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            rates_path = os.path.join(tmp, 'rates.csv')
+            with open(rates_path, 'w') as stream:
+                stream.write("Currency,Rate\nusd,1\nEUR,0.5\nJPY,150\n")
+            rates = read_rates_csv(rates_path)
+            assert rates == {'USD': 1.0, 'EUR': 0.5, 'JPY': 150.0}, rates
+            with open(rates_path, 'a') as stream:
+                stream.write("GBP,-1\n")
+            try:
+                read_rates_csv(rates_path)
+                raise AssertionError("a negative rate should be rejected")
+            except ValueError as e:
+                assert 'Line 5' in str(e), e
+            # 19.99 EUR is 39.98 USD, plus 1 cent; 300 yen is 2.00 USD
+            totals = [('#a', 'EUR', 1999), ('#a', 'USD', 1), ('#b', 'JPY', 300)]
+            assert convert_totals(totals, 'USD', rates) == {'#a': 3999, '#b': 200}
+            print("✅ Rates read from CSV; per-currency sums converted with each currency's decimals")
+            
+            db_ops.close()
+            db_ops.db_path = os.path.join(tmp, 'currency.db')
+            # A database from before migration 7, when every amount was in its user's currency
+            all_migrations = list(migrations.MIGRATIONS)
+            migrations.MIGRATIONS[:] = [entry for entry in all_migrations if entry[0] < 7]
+            try:
+                create_tables(db_ops.db_path)
+            finally:
+                migrations.MIGRATIONS[:] = all_migrations
+            conn = sqlite3.connect(db_ops.db_path)
+            with conn:
+                conn.execute("INSERT INTO users (user_id, currency) VALUES (1, 'USD'), (2, 'JPY')")
+                conn.executemany(
+                    "INSERT INTO transactions (user_id, amount, category, transaction_date) VALUES (?, ?, ?, ?)",
+                    [(1, 1000, '#food', '2024-05-01 10:00:00'), (2, 1500, '#food', '2024-05-01 10:00:00')]
+                )
+                conn.execute("INSERT INTO budgets (user_id, category, amount) VALUES (1, '#food', 5000)")
+            conn.close()
+            create_tables(db_ops.db_path)
+            conn = sqlite3.connect(db_ops.db_path)
+            assert conn.execute("SELECT user_id, currency FROM transactions ORDER BY user_id").fetchall() == \
+                [(1, 'USD'), (2, 'JPY')]
+            assert check_rollup(conn) == []
+            conn.close()
+            print("✅ Existing transactions take their user's currency on upgrade")
+            
+            # A trip: expenses before it in USD, then /setcurrency EUR and expenses in EUR
+            await db_ops.set_exchange_rates(rates)
+            await db_ops.log_expense(1, 1000, '#food', 'before the trip', currency='USD')
+            assert await db_ops.update_user_currency(1, 'EUR')
+            assert [b['amount'] for b in await db_ops.get_budgets(1)] == [2500], "budgets are converted"
+            api = FakeBotAPI()
+            update, context = make_update(api, 1, '/log 4 on #food; 3 on #fun')
+            await log_expense_command(update, context)
+            assert '€4.00 on #food' in update.message.replies[-1], update.message.replies[-1]
+            
+            everything = (datetime(2024, 1, 1), datetime.now() + timedelta(days=1))
+            assert await db_ops.get_spending_by_category(1, *everything) == {'#food': 1400, '#fun': 300}
+            assert await db_ops.get_spending_by_category(1, *everything, currency='USD') == {'#food': 2800, '#fun': 600}
+            status = await db_ops.get_budget_status(1, current_year_month())
+            assert status == [{'category': '#food', 'amount': 2500, 'spent': 900}], status
+            
+            update, context = make_update(api, 1, '/summary month')
+            await summary_command(update, context)
+            assert 'Total Spent: €12.00' in update.message.replies[0] and '#food: €9.00' in update.message.replies[0], \
+                update.message.replies[0]
+            update, context = make_update(api, 1, '/listhistory')
+            await list_history_command(update, context)
+            assert '$10.00' in update.message.replies[-1] and '€4.00' in update.message.replies[-1]
+            conn = sqlite3.connect(db_ops.db_path)
+            assert check_rollup(conn) == []
+            conn.close()
+            print("✅ Summaries and budgets convert USD history into EUR; history shows what was logged")
+            
+            # Without a rate the amount counts at face value: 2.50 GBP as 3 yen (rounded)
+            await db_ops.log_expense(2, 250, '#food', currency='GBP')
+            assert await db_ops.get_spending_by_category(2, *everything) == {'#food': 1503}
+            print("✅ Currencies without a rate fall back to face value")
+        
+        print("💱 Currency conversion: ALL TESTS PASSED\n")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Currency conversion test failed: {e}")
+        return False
+    finally:
+        db_ops.close()
+        db_ops.db_path = original_path
+
 def test_configuration():
     """Test configuration loading"""
     print("⚙️ Testing Configuration...")
@@ -125,8 +1856,31 @@ async def main():
     tests = [
         ('Configuration', test_configuration),
         ('Handler Imports', test_handler_imports),
+        ('Startup Imports', test_startup_imports),
         ('Chart Generation', test_chart_generation),
-        ('Database Operations', lambda: asyncio.create_task(test_database_operations()))
+        ('Database Operations', lambda: asyncio.create_task(test_database_operations())),
+        ('Connection Pool', lambda: asyncio.create_task(test_connection_pool())),
+        ('Mixed Workload', lambda: asyncio.create_task(test_mixed_workload())),
+        ('Query Plans', lambda: asyncio.create_task(test_query_plans())),
+        ('Monthly Rollup', lambda: asyncio.create_task(test_monthly_rollup())),
+        ('Write-Behind Inserts', lambda: asyncio.create_task(test_write_behind())),
+        ('Chart Render Service', lambda: asyncio.create_task(test_chart_service())),
+        ('Chart Cache', lambda: asyncio.create_task(test_chart_cache())),
+        ('Chart file_id Reuse', lambda: asyncio.create_task(test_chart_file_id_reuse())),
+        ('Statement Import', lambda: asyncio.create_task(test_statement_import())),
+        ('Export', lambda: asyncio.create_task(test_export())),
+        ('History Pagination', lambda: asyncio.create_task(test_history_pagination())),
+        ('Metrics', lambda: asyncio.create_task(test_metrics())),
+        ('Sampling Profiler', lambda: asyncio.create_task(test_sampling_profiler())),
+        ('User Cache', lambda: asyncio.create_task(test_user_cache())),
+        ('Concurrent Updates', lambda: asyncio.create_task(test_concurrent_updates())),
+        ('Sharded Workers', lambda: asyncio.create_task(test_sharding())),
+        ('Admission Control', lambda: asyncio.create_task(test_admission_control())),
+        ('Analytics Cache', lambda: asyncio.create_task(test_analytics_cache())),
+        ('Epoch Timestamps', lambda: asyncio.create_task(test_timestamps())),
+        ('Integer Minor Units', lambda: asyncio.create_task(test_minor_units())),
+        ('Multi-Expense Log', lambda: asyncio.create_task(test_multi_expense_log())),
+        ('Currency Conversion', lambda: asyncio.create_task(test_currency_conversion()))
     ]
     
     passed = 0
@@ -134,10 +1888,10 @@ async def main():
     
     for test_name, test_func in tests:
         try:
-            if asyncio.iscoroutine(test_func()) or hasattr(test_func(), '__await__'):
-                result = await test_func()
-            else:
-                result = test_func()
+            # Call once: async tests hand back a task that must be awaited
+            result = test_func()
+            if hasattr(result, '__await__'):
+                result = await result
             
             if result:
                 passed += 1
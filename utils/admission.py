@@ -0,0 +1,206 @@
+import asyncio
+import functools
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from telegram.ext import CommandHandler
+from config import (
+    RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST, RATE_LIMIT_COSTS, EXPENSIVE_COMMANDS,
+    MAX_EXPENSIVE_CONCURRENT, EXPENSIVE_QUEUE_TIMEOUT
+)
+
+# How often idle users are dropped from memory
+SWEEP_INTERVAL = 60.0
+
+# Non-command handlers that are charged as the command they continue
+CALLBACK_COMMANDS = {
+    'history_page_callback': 'listhistory'
+}
+
+class AdmissionController:
+    """
+    Per-user token buckets plus a global cap on expensive commands.
+    
+    Each user regains `rate_per_minute` cost units a minute and can spend at
+    most `burst` back to back; /summary costs more than /log. A bucket is kept
+    as one float per user, the moment it will be full again (the "theoretical
+    arrival time" of GCRA), instead of a token count and a timestamp. Once
+    that moment has passed the entry says nothing a missing one wouldn't, so
+    the periodic sweep drops it and memory only grows with recently active
+    users.
+    """
+    
+    def __init__(self, rate_per_minute: float = RATE_LIMIT_PER_MINUTE, burst: float = RATE_LIMIT_BURST,
+                 costs: Optional[Dict[str, float]] = None, expensive: Optional[Iterable[str]] = None,
+                 max_expensive: int = MAX_EXPENSIVE_CONCURRENT, queue_timeout: float = EXPENSIVE_QUEUE_TIMEOUT,
+                 clock: Callable[[], float] = time.monotonic):
+        self.interval = 60.0 / rate_per_minute  # Seconds to regain one cost unit
+        self.burst = burst
+        self.costs = dict(RATE_LIMIT_COSTS if costs is None else costs)
+        self.expensive = set(EXPENSIVE_COMMANDS if expensive is None else expensive)
+        self.max_expensive = max_expensive
+        self.queue_timeout = queue_timeout
+        self.clock = clock
+        self._full_at: Dict[int, float] = {}
+        self._warned_until: Dict[int, float] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._next_sweep = clock() + SWEEP_INTERVAL
+        self.admitted = 0
+        self.rejected = 0
+        self.busy = 0
+        self.evicted = 0
+        self.expensive_running = 0
+    
+    def cost(self, command: str) -> float:
+        # A cost above the burst could never be paid; cap it so the command stays usable
+        return min(self.costs.get(command, 1.0), self.burst)
+    
+    def try_acquire(self, user_id: int, command: str) -> Tuple[bool, float]:
+        """
+        Charge a user for one command.
+        
+        Returns (True, 0.0) if admitted, or (False, seconds) with how long the
+        user has to wait before this command would be admitted.
+        """
+        now = self.clock()
+        if now >= self._next_sweep:
+            self.sweep(now)
+        
+        full_at = max(self._full_at.get(user_id, now), now)
+        new_full_at = full_at + self.cost(command) * self.interval
+        # The bucket holds `burst` units, so it may run at most burst * interval ahead of now
+        retry_after = new_full_at - now - self.burst * self.interval
+        if retry_after > 1e-9:
+            self.rejected += 1
+            return False, retry_after
+        self._full_at[user_id] = new_full_at
+        self.admitted += 1
+        return True, 0.0
+    
+    def should_warn(self, user_id: int, retry_after: float) -> bool:
+        """Reply to a rejected user once per backoff window, so a flood doesn't turn into a reply flood."""
+        now = self.clock()
+        if self._warned_until.get(user_id, 0.0) > now:
+            return False
+        self._warned_until[user_id] = now + retry_after
+        return True
+    
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Forget users whose bucket has refilled; returns how many were dropped."""
+        now = self.clock() if now is None else now
+        idle = [user_id for user_id, full_at in self._full_at.items() if full_at <= now]
+        for user_id in idle:
+            del self._full_at[user_id]
+        for user_id in [user_id for user_id, until in self._warned_until.items() if until <= now]:
+            del self._warned_until[user_id]
+        self.evicted += len(idle)
+        self._next_sweep = now + SWEEP_INTERVAL
+        return len(idle)
+    
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        # Created on first use so it binds to the running event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_expensive)
+        return self._slots
+    
+    @property
+    def tracked_users(self) -> int:
+        return len(self._full_at)
+    
+    def stats(self) -> dict:
+        return {
+            'tracked_users': self.tracked_users,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'busy': self.busy,
+            'evicted': self.evicted,
+            'expensive_running': self.expensive_running
+        }
+    
+    async def _acquire_slot(self) -> bool:
+        """
+        Take an expensive-command slot; False if none is free.
+        
+        The wait happens inside a handler, where it holds one of the update
+        processor's concurrency slots, so by default a busy cap turns the
+        command away at once instead of tying up slots that /log needs.
+        """
+        if not self.slots.locked():
+            await self.slots.acquire()
+            return True
+        if self.queue_timeout <= 0:
+            return False
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+    
+    def wrap(self, callback: Callable, command: str) -> Callable:
+        """Wrap a handler callback so it only runs once the user's bucket and the expensive-command cap allow it."""
+        expensive = command in self.expensive
+        
+        @functools.wraps(callback)
+        async def wrapper(update, context):
+            user = update.effective_user
+            if user is None:
+                return await callback(update, context)
+            
+            admitted, retry_after = self.try_acquire(user.id, command)
+            if not admitted:
+                if self.should_warn(user.id, retry_after):
+                    await reply_backoff(update, f"🐢 Whoa, that's a lot at once! Please wait {format_wait(retry_after)} "
+                                                f"and try again.")
+                elif update.callback_query is not None:
+                    # Unanswered, the button would spin until the client gives up
+                    await update.callback_query.answer()
+                return None
+            if not expensive:
+                return await callback(update, context)
+            
+            if not await self._acquire_slot():
+                self.busy += 1
+                await reply_backoff(update, f"⏳ Lots of people are asking for /{command} right now. "
+                                            f"Please try again in a minute!")
+                return None
+            self.expensive_running += 1
+            try:
+                return await callback(update, context)
+            finally:
+                self.expensive_running -= 1
+                self.slots.release()
+        
+        wrapper.__admission_handler__ = callback
+        return wrapper
+
+async def reply_backoff(update, text: str):
+    """Tell the user to slow down, as a message or as a toast for button presses."""
+    if update.callback_query is not None:
+        await update.callback_query.answer(text)
+    elif update.message is not None:
+        await update.message.reply_text(text)
+
+def format_wait(seconds: float) -> str:
+    if seconds < 60:
+        return f"{max(1, round(seconds))}s"
+    return f"{round(seconds / 60)} min"
+
+def handler_command(handler) -> str:
+    """The name costs are looked up by: the command, or the callback name for other handlers."""
+    if isinstance(handler, CommandHandler):
+        return sorted(handler.commands)[0]
+    name = getattr(handler.callback, '__name__', 'handler')
+    if name in CALLBACK_COMMANDS:
+        return CALLBACK_COMMANDS[name]
+    return name[:-len('_command')] if name.endswith('_command') else name
+
+def admit_application(application, controller: Optional[AdmissionController] = None):
+    """Put admission control in front of every handler registered on a telegram Application."""
+    controller = controller or admission
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            if not hasattr(handler.callback, '__admission_handler__'):
+                handler.callback = controller.wrap(handler.callback, handler_command(handler))
+
+# Global instance
+admission = AdmissionController()
@@ -0,0 +1,286 @@
+import asyncio
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from config import ANALYTICS_CACHE_MAX_BYTES
+from utils.money import convert_totals
+
+# Running totals are kept this many days past today, so new expenses rarely force a rebuild
+HEADROOM_DAYS = 31
+
+# Day ordinal (date.toordinal()) of a stored timestamp; julianday('0001-01-01') is 1721425.5
+LOAD_QUERY = '''
+    SELECT amount, category, currency, CAST(julianday(date(transaction_date)) - 1721424.5 AS INTEGER)
+    FROM transactions
+    WHERE user_id = ?
+'''
+
+def utc_today() -> int:
+    """Day ordinal of today in UTC, the days stored timestamps are counted in."""
+    return datetime.now(timezone.utc).date().toordinal()
+
+def day_ordinal(timestamp: Optional[str]) -> int:
+    """Day of a stored 'YYYY-MM-DD HH:MM:SS' value; None means CURRENT_TIMESTAMP, which is UTC."""
+    if timestamp is None:
+        return utc_today()
+    return date.fromisoformat(timestamp[:10]).toordinal()
+
+def day_range(start_date: datetime, end_date: datetime) -> Optional[Tuple[int, int]]:
+    """
+    First and last day ordinal of a range that covers whole days, else None.
+    
+    /summary ranges run from midnight to 23:59:59; anything finer, or days
+    that don't start at UTC midnight, need SQL.
+    """
+    for value in (start_date, end_date):
+        if value.utcoffset() not in (None, timedelta(0)):
+            return None
+    if start_date.time() != time.min or end_date.time() < time(23, 59, 59):
+        return None
+    return start_date.toordinal(), end_date.toordinal()
+
+class UserSeries:
+    """
+    One user's transactions as NumPy columns plus running totals by day per (category, currency).
+    
+    Amounts are integer minor units of their own currency, so running totals
+    and their differences are exact however many writes have been applied;
+    conversion happens on the few per-currency sums a lookup returns.
+    
+    prefix[i, c] is the sum of column c's amounts on days before
+    first_day + i, so the spending of any whole-day range is the difference
+    of two rows: one lookup per column, however many transactions there are.
+    """
+    
+    def __init__(self, amounts, days, codes, columns: List[Tuple[str, str]], today: int):
+        import numpy as np
+        self.size = len(amounts)
+        capacity = max(self.size, 16)
+        self.amounts = np.zeros(capacity, dtype=np.int64)
+        self.days = np.zeros(capacity, dtype=np.int32)
+        self.codes = np.zeros(capacity, dtype=np.int16)
+        self.amounts[:self.size] = amounts
+        self.days[:self.size] = days
+        self.codes[:self.size] = codes
+        self.columns = list(columns)
+        self.column_codes = {column: code for code, column in enumerate(self.columns)}
+        self._rebuild(today)
+    
+    @classmethod
+    def from_rows(cls, rows: List[Tuple[int, str, str, int]], today: int) -> 'UserSeries':
+        """Build from (amount, category, currency, day ordinal) rows as returned by LOAD_QUERY."""
+        import numpy as np
+        if not rows:
+            return cls([], [], [], [], today)
+        amounts, categories, currencies, days = zip(*rows)
+        names, category_codes = np.unique(np.array(categories, dtype=object), return_inverse=True)
+        units, currency_codes = np.unique(np.array(currencies, dtype=object), return_inverse=True)
+        pairs, codes = np.unique(category_codes * len(units) + currency_codes, return_inverse=True)
+        columns = [(str(names[pair // len(units)]), str(units[pair % len(units)])) for pair in pairs.tolist()]
+        return cls(np.array(amounts, dtype=np.int64), np.array(days, dtype=np.int32), codes, columns, today)
+    
+    def _rebuild(self, today: int):
+        """Recompute the running totals from the columns, covering every row and HEADROOM_DAYS past today."""
+        import numpy as np
+        days = self.days[:self.size]
+        self.first_day = int(days.min()) if self.size else today
+        last_day = max(int(days.max()) if self.size else today, today) + HEADROOM_DAYS
+        daily = np.zeros((last_day - self.first_day + 1, len(self.columns)), dtype=np.int64)
+        np.add.at(daily, (days - self.first_day, self.codes[:self.size]), self.amounts[:self.size])
+        self.prefix = np.zeros((daily.shape[0] + 1, daily.shape[1]), dtype=np.int64)
+        np.cumsum(daily, axis=0, out=self.prefix[1:])
+    
+    @property
+    def span(self) -> int:
+        return self.prefix.shape[0] - 1
+    
+    @property
+    def nbytes(self) -> int:
+        return self.amounts.nbytes + self.days.nbytes + self.codes.nbytes + self.prefix.nbytes
+    
+    def add(self, amount: int, category: str, currency: str, day: int):
+        import numpy as np
+        if self.size == len(self.amounts):
+            self.amounts = np.resize(self.amounts, self.size * 2)
+            self.days = np.resize(self.days, self.size * 2)
+            self.codes = np.resize(self.codes, self.size * 2)
+        code = self.column_codes.get((category, currency))
+        if code is None:
+            code = self.column_codes[(category, currency)] = len(self.columns)
+            self.columns.append((category, currency))
+            self.prefix = np.hstack([self.prefix, np.zeros((self.prefix.shape[0], 1), dtype=np.int64)])
+        self.amounts[self.size] = amount
+        self.days[self.size] = day
+        self.codes[self.size] = code
+        self.size += 1
+        
+        offset = day - self.first_day
+        if 0 <= offset < self.span:
+            self.prefix[offset + 1:, code] += amount
+        else:
+            self._rebuild(utc_today())
+    
+    def remove(self, amount: int, category: str, currency: str, day: int) -> bool:
+        """Take one matching row out; False if there was none, and the caller should reload."""
+        import numpy as np
+        code = self.column_codes.get((category, currency))
+        if code is None:
+            return False
+        n = self.size
+        matches = np.flatnonzero(
+            (self.days[:n] == day) & (self.codes[:n] == code) & (self.amounts[:n] == amount)
+        )
+        if not len(matches):
+            return False
+        # Order doesn't matter for sums: move the last row into the gap
+        index, last = matches[0], n - 1
+        self.amounts[index], self.days[index], self.codes[index] = self.amounts[last], self.days[last], self.codes[last]
+        self.size -= 1
+        offset = day - self.first_day
+        if 0 <= offset < self.span:
+            self.prefix[offset + 1:, code] -= amount
+        return True
+    
+    def spending_by_category(self, start_day: int, end_day: int) -> List[Tuple[str, str, int]]:
+        """(category, currency, total) for the days start_day..end_day inclusive, in minor units of that currency."""
+        low = min(max(start_day - self.first_day, 0), self.span)
+        high = min(max(end_day - self.first_day + 1, 0), self.span)
+        if high <= low:
+            return []
+        totals = self.prefix[high] - self.prefix[low]
+        # Columns whose rows were all deleted are left at exactly zero
+        return [(category, currency, total) for (category, currency), total in zip(self.columns, totals.tolist()) if total]
+
+class AnalyticsCache:
+    """
+    Per-user UserSeries, kept current from database write events and evicted LRU under a byte budget.
+    
+    Only whole-day ranges are answered here; callers fall back to SQL when a
+    lookup returns None.
+    """
+    
+    def __init__(self, max_bytes: int = ANALYTICS_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._series: 'OrderedDict[int, UserSeries]' = OrderedDict()
+        # Loads in flight per user, and writes seen since they started, so a load that raced a write is not kept
+        self._loading: Dict[int, int] = {}
+        self._writes: Dict[int, int] = {}
+        self._db_ops = None
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def attach(self, db_ops):
+        """Load from db_ops and follow its writes."""
+        self._db_ops = db_ops
+        db_ops.add_listener('expense_logged', self._on_logged)
+        db_ops.add_listener('transaction_deleted', self._on_deleted)
+        db_ops.add_listener('expenses_imported', self._on_imported)
+    
+    async def spending_by_category(self, user_id: int, start_date: datetime, end_date: datetime,
+                                   currency: str) -> Optional[Dict[str, int]]:
+        """Spending per category for a whole-day range in currency, or None if the range needs SQL."""
+        days = day_range(start_date, end_date)
+        if days is None:
+            return None
+        series = await self._get(user_id)
+        # A handful of per-currency sums, converted the same way as the SQL path's
+        totals = series.spending_by_category(*days)
+        rates = await self._db_ops.get_exchange_rates() if any(row[1] != currency for row in totals) else {}
+        return convert_totals(totals, currency, rates)
+    
+    async def total_spending(self, user_id: int, start_date: datetime, end_date: datetime,
+                             currency: str) -> Optional[int]:
+        spending = await self.spending_by_category(user_id, start_date, end_date, currency)
+        return None if spending is None else sum(spending.values())
+    
+    async def _get(self, user_id: int) -> UserSeries:
+        series = self._series.get(user_id)
+        if series is not None:
+            self._series.move_to_end(user_id)
+            self.hits += 1
+            return series
+        
+        self.misses += 1
+        self._loading[user_id] = self._loading.get(user_id, 0) + 1
+        writes = self._writes.get(user_id, 0)
+        try:
+            rows = await self._db_ops.execute_query(LOAD_QUERY, (user_id,), fetch_all=True)
+            loop = asyncio.get_running_loop()
+            series = await loop.run_in_executor(None, UserSeries.from_rows, rows, utc_today())
+            # A write landed while loading: answer from this copy, but don't keep it
+            if self._writes.get(user_id, 0) == writes and user_id not in self._series:
+                self._store(user_id, series)
+            return series
+        finally:
+            self._loading[user_id] -= 1
+            if not self._loading[user_id]:
+                del self._loading[user_id]
+                self._writes.pop(user_id, None)
+    
+    def _store(self, user_id: int, series: UserSeries):
+        if series.nbytes > self.max_bytes:
+            return
+        self._series[user_id] = series
+        self.size_bytes += series.nbytes
+        self._evict()
+    
+    def _evict(self):
+        while self.size_bytes > self.max_bytes and self._series:
+            _, series = self._series.popitem(last=False)
+            self.size_bytes -= series.nbytes
+            self.evictions += 1
+    
+    def _written(self, user_id: int):
+        if user_id in self._loading:
+            self._writes[user_id] = self._writes.get(user_id, 0) + 1
+    
+    def invalidate_user(self, user_id: int, **_):
+        self._written(user_id)
+        series = self._series.pop(user_id, None)
+        if series is not None:
+            self.size_bytes -= series.nbytes
+    
+    def _on_logged(self, user_id: int, amount: int = 0, category: str = '', currency: Optional[str] = None,
+                   transaction_date: Optional[str] = None, **_):
+        if currency is None:
+            # The row took the user's currency inside SQLite; reload rather than guess it
+            self.invalidate_user(user_id)
+            return
+        self._written(user_id)
+        series = self._series.get(user_id)
+        if series is not None:
+            before = series.nbytes
+            series.add(amount, category, currency, day_ordinal(transaction_date))
+            self.size_bytes += series.nbytes - before
+            self._evict()
+    
+    def _on_deleted(self, user_id: int, amount: Optional[int] = None, category: Optional[str] = None,
+                    currency: Optional[str] = None, transaction_date: Optional[str] = None, **_):
+        series = self._series.get(user_id)
+        if series is None or amount is None or not series.remove(amount, category, currency,
+                                                                 day_ordinal(transaction_date)):
+            self.invalidate_user(user_id)
+    
+    def _on_imported(self, user_id: int, **_):
+        # A bulk import is cheaper to reload than to replay row by row
+        self.invalidate_user(user_id)
+    
+    def clear(self):
+        self._series.clear()
+        self.size_bytes = 0
+    
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'users': len(self._series),
+            'size_bytes': self.size_bytes,
+            'hit_ratio': self.hits / lookups if lookups else 0.0
+        }
+
+# Global instance
+analytics_cache = AnalyticsCache()
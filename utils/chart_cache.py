@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+from config import CHART_CACHE_MAX_BYTES, CHART_CACHE_DIR, CHART_CACHE_DISK_MAX_BYTES
+
+def make_chart_key(spending_data: Dict[str, int], currency: str, options: Optional[Dict] = None) -> str:
+    """
+    Hash the inputs that determine a chart's pixels.
+    
+    Categories are sorted and amounts are exact minor units, so equal
+    spending always maps to the same key no matter how the dict was built.
+    """
+    normalized = {
+        'data': sorted(spending_data.items()),
+        'currency': currency.upper(),
+        'options': options or {}
+    }
+    payload = json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ChartCache:
+    """
+    Content-addressed LRU cache of rendered chart PNGs, bounded by total bytes.
+    
+    The optional disk tier has its own byte budget and LRU order, rebuilt
+    from file modification times on startup. A user's charts are tracked
+    for as long as they are in either tier, so invalidation reaches files
+    that have already left memory.
+    """
+    
+    def __init__(self, max_bytes: int = CHART_CACHE_MAX_BYTES, disk_dir: Optional[str] = CHART_CACHE_DIR or None,
+                 disk_max_bytes: int = CHART_CACHE_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._disk: 'OrderedDict[str, int]' = OrderedDict()
+        self._owners: Dict[str, int] = {}
+        self._keys_by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.disk_size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._load_disk_index()
+    
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f'{key}.png')
+    
+    def _load_disk_index(self):
+        """Index charts left by earlier runs, oldest first, and trim them to the disk budget."""
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if not name.endswith('.png'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, name[:-len('.png')], stat.st_size))
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+            self.disk_size_bytes += size
+        self._remove_files(self._trim_disk())
+    
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return a cached chart, checking memory first and then the disk tier."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+        
+        if self.disk_dir:
+            # Disk reads run on the default executor so a slow disk never stalls the event loop
+            data = await asyncio.get_running_loop().run_in_executor(None, self._read_disk, key)
+            if data is not None:
+                with self._lock:
+                    self.hits += 1
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    self._store(key, data, self._owners.get(key))
+                return data
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    async def put(self, key: str, data: bytes, user_id: Optional[int] = None):
+        """Cache a rendered chart, evicting least recently used charts to stay under max_bytes."""
+        with self._lock:
+            self._store(key, data, user_id)
+        
+        if self.disk_dir and len(data) <= self.disk_max_bytes:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_disk, key, data, user_id)
+    
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        """Read a chart from the disk tier, or None. Runs on an executor thread."""
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # The modification time is the LRU order the next startup sees
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+    
+    def _write_disk(self, key: str, data: bytes, user_id: Optional[int]):
+        """Write a chart to the disk tier and evict over its budget. Runs on an executor thread."""
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.disk_size_bytes += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            if user_id is not None:
+                self._set_owner(key, user_id)
+            evicted = self._trim_disk()
+        self._remove_files(evicted)
+    
+    def _store(self, key: str, data: bytes, user_id: Optional[int]):
+        """Insert into the memory tier. Caller holds the lock."""
+        if len(data) > self.max_bytes:
+            return
+        if key in self._entries:
+            self.size_bytes -= len(self._entries.pop(key))
+        self._entries[key] = data
+        self.size_bytes += len(data)
+        if user_id is not None:
+            self._set_owner(key, user_id)
+        
+        while self.size_bytes > self.max_bytes:
+            old_key, old_data = self._entries.popitem(last=False)
+            self.size_bytes -= len(old_data)
+            self.evictions += 1
+            if old_key not in self._disk:
+                self._forget_owner(old_key)
+    
+    def _trim_disk(self) -> List[str]:
+        """Evict least recently used files over the disk budget and return their paths. Caller holds the lock."""
+        paths = []
+        while self.disk_size_bytes > self.disk_max_bytes:
+            old_key, size = self._disk.popitem(last=False)
+            self.disk_size_bytes -= size
+            self.disk_evictions += 1
+            paths.append(self._disk_path(old_key))
+            if old_key not in self._entries:
+                self._forget_owner(old_key)
+        return paths
+    
+    @staticmethod
+    def _remove_files(paths: List[str]):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    
+    def _set_owner(self, key: str, user_id: int):
+        """Record which user a chart was rendered for. Caller holds the lock."""
+        self._owners[key] = user_id
+        self._keys_by_user.setdefault(user_id, set()).add(key)
+    
+    def _forget_owner(self, key: str):
+        """Drop ownership bookkeeping for a key. Caller holds the lock."""
+        owner = self._owners.pop(key, None)
+        if owner is not None:
+            keys = self._keys_by_user.get(owner)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_user[owner]
+    
+    def invalidate_user(self, user_id: int, **_):
+        """Drop every chart rendered for a user whose spending just changed, in memory and on disk."""
+        with self._lock:
+            keys = self._keys_by_user.pop(user_id, set())
+            paths = []
+            for key in keys:
+                data = self._entries.pop(key, None)
+                if data is not None:
+                    self.size_bytes -= len(data)
+                size = self._disk.pop(key, None)
+                if size is not None:
+                    self.disk_size_bytes -= size
+                    paths.append(self._disk_path(key))
+                self._owners.pop(key, None)
+        # Called from database write listeners, which are synchronous. A user has a handful of
+        # charts at most, and unlinking them now keeps a re-render of the same key from being
+        # deleted by a removal that ran late
+        self._remove_files(paths)
+    
+    def attach(self, db_ops):
+        """Invalidate a user's charts whenever their transactions change."""
+        db_ops.add_listener('expense_logged', self.invalidate_user)
+        db_ops.add_listener('expenses_imported', self.invalidate_user)
+        db_ops.add_listener('transaction_deleted', self.invalidate_user)
+    
+    def stats(self) -> Dict:
+        """Return hit, miss and eviction counters along with the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'size_bytes': self.size_bytes,
+                'disk_entries': len(self._disk),
+                'disk_size_bytes': self.disk_size_bytes,
+                'disk_evictions': self.disk_evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
+
+# Global instance
+chart_cache = ChartCache()
@@ -1,20 +1,38 @@
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 from typing import Dict
+from utils.money import format_amount
 import io
 import os
 
-def generate_pie_chart(spending_data: Dict[str, float], currency: str = 'INR') -> io.BytesIO:
+_pyplot = None
+
+def get_pyplot():
+    """
+    Import matplotlib.pyplot on first use with the non-interactive Agg backend.
+    
+    Keeping matplotlib (and its font cache) off the import path means the bot
+    starts without paying for it, and only the chart renderer ever loads it.
+    """
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        _pyplot = plt
+    return _pyplot
+
+def generate_pie_chart(spending_data: Dict[str, int], currency: str = 'INR') -> io.BytesIO:
     """
     Generate a pie chart for spending data and return as BytesIO object.
     
     Args:
-        spending_data: Dictionary with category as key and amount as value
+        spending_data: Dictionary with category as key and amount in minor units as value
         currency: Currency symbol to display
     
     Returns:
         BytesIO object containing the chart image
     """
+    plt = get_pyplot()
+    
     if not spending_data:
         # Create empty chart
         fig, ax = plt.subplots(figsize=(8, 6))
@@ -45,22 +63,14 @@ def generate_pie_chart(spending_data: Dict[str, float], currency: str = 'INR') -
         
         # Add title
         total_amount = sum(amounts)
-        currency_symbols = {
-            'INR': '₹',
-            'USD': '$',
-            'EUR': '€',
-            'GBP': '£'
-        }
-        symbol = currency_symbols.get(currency, currency)
-        
-        ax.set_title(f'Spending Breakdown\nTotal: {symbol}{total_amount:.2f}', 
+        ax.set_title(f'Spending Breakdown\nTotal: {format_currency(total_amount, currency)}', 
                     fontsize=16, fontweight='bold', pad=20)
         
         # Equal aspect ratio ensures that pie is drawn as a circle
         ax.axis('equal')
         
         # Add legend with amounts
-        legend_labels = [f'{cat}: {symbol}{amt:.2f}' for cat, amt in spending_data.items()]
+        legend_labels = [f'{cat}: {format_currency(amt, currency)}' for cat, amt in spending_data.items()]
         ax.legend(wedges, legend_labels, title="Categories", loc="center left", 
                  bbox_to_anchor=(1, 0, 0.5, 1))
     
@@ -78,8 +88,8 @@ def generate_pie_chart(spending_data: Dict[str, float], currency: str = 'INR') -
     
     return img_buffer
 
-def format_currency(amount: float, currency: str) -> str:
-    """Format amount with appropriate currency symbol."""
+def format_currency(amount: int, currency: str) -> str:
+    """Format an amount in minor units with the currency's symbol and decimal places."""
     currency_symbols = {
         'INR': '₹',
         'USD': '$',
@@ -91,4 +101,4 @@ def format_currency(amount: float, currency: str) -> str:
     }
     
     symbol = currency_symbols.get(currency.upper(), currency)
-    return f'{symbol}{amount:.2f}'
+    return f'{symbol}{format_amount(amount, currency)}'
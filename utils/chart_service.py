@@ -0,0 +1,158 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+from config import CHART_RENDER_WORKERS, CHART_QUEUE_DEPTH, CHART_RENDER_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+class ChartRenderError(Exception):
+    """Raised when a chart could not be rendered."""
+
+class ChartQueueFullError(ChartRenderError):
+    """Raised when too many renders are already waiting for a worker."""
+
+class ChartTimeoutError(ChartRenderError):
+    """Raised when a render does not finish within the configured timeout."""
+
+def _init_worker():
+    """Load matplotlib with the Agg backend once per worker process."""
+    from utils.chart_generator import get_pyplot
+    get_pyplot()
+
+def _render_pie_chart(spending_data: Dict[str, float], currency: str, submitted_at: float) -> Tuple[bytes, float, float]:
+    """Render a pie chart in a worker and return (png bytes, queue wait, render time)."""
+    from utils.chart_generator import generate_pie_chart
+    from utils.profiling import handler_profiler
+    started_at = time.time()
+    start = time.perf_counter()
+    with handler_profiler.sample('generate_pie_chart'):
+        buffer = generate_pie_chart(spending_data, currency)
+    render_seconds = time.perf_counter() - start
+    return buffer.getvalue(), started_at - submitted_at, render_seconds
+
+class ChartRenderService:
+    """Renders charts in a bounded pool of worker processes, off the event loop."""
+    
+    def __init__(self, workers: int = CHART_RENDER_WORKERS, queue_depth: int = CHART_QUEUE_DEPTH,
+                 timeout: float = CHART_RENDER_TIMEOUT):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.metrics = {
+            'renders': 0,
+            'rejected': 0,
+            'timeouts': 0,
+            'errors': 0,
+            'pool_restarts': 0,
+            'render_seconds_total': 0.0,
+            'render_seconds_max': 0.0,
+            'queue_wait_seconds_total': 0.0,
+            'queue_wait_seconds_max': 0.0
+        }
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Get the worker pool, starting it on first use."""
+        with self._lock:
+            if self._executor is None:
+                # spawn keeps workers free of the parent's threads and event loop
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+            return self._executor
+    
+    def _restart_executor(self, broken: ProcessPoolExecutor):
+        """Drop a pool whose worker died; the next render starts a fresh one."""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+            self.metrics['pool_restarts'] += 1
+        logger.error("Chart render worker died; restarting the pool")
+        broken.shutdown(wait=False, cancel_futures=True)
+    
+    def _submit(self, *args) -> Tuple[ProcessPoolExecutor, Future]:
+        """Submit a render, replacing the pool once if it is already broken."""
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(_render_pie_chart, *args)
+        except BrokenProcessPool:
+            self._restart_executor(executor)
+            executor = self._get_executor()
+            return executor, executor.submit(_render_pie_chart, *args)
+    
+    def _release(self, _future: Optional[Future] = None):
+        with self._lock:
+            self._in_flight -= 1
+    
+    @property
+    def in_flight(self) -> int:
+        """Renders that are running or waiting for a worker."""
+        return self._in_flight
+    
+    async def render_pie_chart(self, spending_data: Dict[str, float], currency: str = 'INR') -> io.BytesIO:
+        """Render a spending pie chart in a worker process and return it as a BytesIO."""
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_depth:
+                self.metrics['rejected'] += 1
+                raise ChartQueueFullError("Too many charts are being rendered right now")
+            self._in_flight += 1
+        
+        try:
+            executor, future = self._submit(dict(spending_data), currency, time.time())
+        except Exception as e:
+            self._release()
+            self.metrics['errors'] += 1
+            raise ChartRenderError(f"Chart render failed: {e}") from e
+        # A render that already started can't be cancelled, so its slot is held until the worker is done
+        future.add_done_callback(self._release)
+        
+        try:
+            png, queue_wait, render_seconds = await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            future.cancel()
+            self.metrics['timeouts'] += 1
+            raise ChartTimeoutError(f"Chart render exceeded {self.timeout:.0f}s")
+        except BrokenProcessPool as e:
+            self._restart_executor(executor)
+            self.metrics['errors'] += 1
+            raise ChartRenderError(f"Chart render worker died: {e}") from e
+        except Exception as e:
+            self.metrics['errors'] += 1
+            raise ChartRenderError(f"Chart render failed: {e}") from e
+        
+        self._record(queue_wait, render_seconds)
+        return io.BytesIO(png)
+    
+    def _record(self, queue_wait: float, render_seconds: float):
+        """Update render latency and queue wait metrics."""
+        queue_wait = max(queue_wait, 0.0)
+        metrics = self.metrics
+        metrics['renders'] += 1
+        metrics['render_seconds_total'] += render_seconds
+        metrics['render_seconds_max'] = max(metrics['render_seconds_max'], render_seconds)
+        metrics['queue_wait_seconds_total'] += queue_wait
+        metrics['queue_wait_seconds_max'] = max(metrics['queue_wait_seconds_max'], queue_wait)
+        logger.debug(f"Chart rendered in {render_seconds * 1000:.0f}ms after {queue_wait * 1000:.0f}ms in queue")
+    
+    def close(self):
+        """Shut down the worker processes."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+# Global instance
+chart_service = ChartRenderService()
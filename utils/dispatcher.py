@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import multiprocessing
+from typing import List, Optional
+from telegram import Update
+from telegram.ext import ContextTypes
+from config import (
+    DATABASE_PATH, CONCURRENT_UPDATES, METRICS_ENABLED, METRICS_PORT, METRICS_HOST, ANALYTICS_CACHE_ENABLED
+)
+from database.sharding import shard_for_user, shard_path
+from utils.update_processor import PerUserUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# Worker startup imports telegram and opens the shard; give slow disks room
+WORKER_START_TIMEOUT = 60
+WORKER_STOP_TIMEOUT = 30
+
+def worker_main(index: int, shard_count: int, queue, ready, token: str,
+                base_url: Optional[str] = None, db_path: str = DATABASE_PATH, restarts=None):
+    """
+    Entry point of one worker process.
+    
+    Runs the normal handlers against this worker's shard file and feeds them
+    the updates the dispatcher routes here, until it receives None.
+    restarts is the dispatcher's shared per-worker restart count, for /stats.
+    """
+    asyncio.run(_serve(index, shard_count, queue, ready, token, base_url, db_path, restarts))
+
+async def _serve(index, shard_count, queue, ready, token, base_url, db_path, restarts):
+    from database.db_setup import create_tables
+    from database.db_operations import db_ops
+    from utils.chart_service import chart_service
+    from utils.chart_cache import chart_cache
+    from utils.analytics_cache import analytics_cache
+    from utils.metrics import (
+        metrics, instrument_database, chart_collector, user_cache_collector, admission_collector,
+        analytics_collector, worker_collector, start_metrics_server
+    )
+    from utils.admission import admission
+    from main import build_application, startup, shutdown
+    
+    db_ops.db_path = shard_path(db_path, index, shard_count)
+    create_tables(db_ops.db_path)
+    chart_cache.attach(db_ops)
+    if ANALYTICS_CACHE_ENABLED:
+        analytics_cache.attach(db_ops)
+    if METRICS_ENABLED:
+        instrument_database(db_ops)
+        metrics.add_collector(chart_collector(chart_service, chart_cache))
+        metrics.add_collector(user_cache_collector(db_ops.user_cache))
+        metrics.add_collector(admission_collector(admission))
+        if ANALYTICS_CACHE_ENABLED:
+            metrics.add_collector(analytics_collector(analytics_cache))
+        if restarts is not None:
+            metrics.add_collector(worker_collector(restarts))
+        if METRICS_PORT:
+            # The dispatcher serves METRICS_PORT; each worker takes the next port up
+            start_metrics_server(METRICS_PORT + 1 + index, METRICS_HOST)
+    
+    application = build_application(token, concurrent_updates=CONCURRENT_UPDATES, base_url=base_url)
+    application.bot_data['worker_restarts'] = restarts
+    loop = asyncio.get_running_loop()
+    async with application:
+        await application.start()
+        # post_init only runs under run_polling/run_webhook
+        await startup(application)
+        logger.info(f"👷 Worker {index + 1}/{shard_count} serving {db_ops.db_path}")
+        ready.set()
+        while True:
+            data = await loop.run_in_executor(None, queue.get)
+            if data is None:
+                break
+            await application.update_queue.put(Update.de_json(data, application.bot))
+        # stop() lets the updates already queued finish first
+        await application.stop()
+    await shutdown(application)
+
+class ShardedDispatcher:
+    """
+    Routes updates to worker processes by user, one SQLite shard per worker.
+    
+    Every update from a user goes to the same worker, through one FIFO queue,
+    so a user's data lives in exactly one shard and their updates keep their
+    order. The dispatcher itself never touches the database. A worker found
+    dead when an update is routed to it is logged and started again.
+    """
+    
+    def __init__(self, workers: int, token: str, base_url: Optional[str] = None, db_path: str = DATABASE_PATH):
+        self.workers = workers
+        self.token = token
+        self.base_url = base_url
+        self.db_path = db_path
+        self._context = multiprocessing.get_context('spawn')
+        self._queues: List = []
+        self._processes: List = []
+        # Kept alive with the process: a spawned child unpickles its Event after start() returns
+        self._ready: List = []
+        self.dispatched = [0] * workers
+        # Shared with the workers so /stats in any of them can show restarts
+        self.restarts = self._context.Array('i', workers)
+    
+    def _start_worker(self, index: int):
+        """Start one worker process with a fresh queue and return its ready event."""
+        queue = self._context.Queue()
+        ready = self._context.Event()
+        process = self._context.Process(
+            target=worker_main,
+            args=(index, self.workers, queue, ready, self.token, self.base_url, self.db_path, self.restarts),
+            name=f'shard-worker-{index + 1}'
+        )
+        process.start()
+        if index < len(self._processes):
+            self._queues[index], self._processes[index], self._ready[index] = queue, process, ready
+        else:
+            self._queues.append(queue)
+            self._processes.append(process)
+            self._ready.append(ready)
+        return ready
+    
+    def start(self) -> 'ShardedDispatcher':
+        """Start every worker and wait until each has its shard open and its bot initialized."""
+        events = [self._start_worker(index) for index in range(self.workers)]
+        for index, ready in enumerate(events):
+            if not ready.wait(WORKER_START_TIMEOUT):
+                self.stop()
+                raise RuntimeError(f"Worker {index + 1} did not start within {WORKER_START_TIMEOUT}s")
+        logger.info(f"🧩 {self.workers} workers started, one shard each")
+        return self
+    
+    def stop(self):
+        """Let each worker finish its queued updates, then wait for it to exit."""
+        for queue in self._queues:
+            queue.put(None)
+        for process in self._processes:
+            process.join(WORKER_STOP_TIMEOUT)
+            if process.is_alive():
+                logger.warning(f"⚠️ {process.name} did not stop in time, terminating")
+                process.terminate()
+                process.join()
+        self._queues.clear()
+        self._processes.clear()
+        self._ready.clear()
+    
+    def route(self, key: Optional[int]) -> int:
+        """The worker that owns a user (or chat, for updates without a user)."""
+        return shard_for_user(key or 0, self.workers)
+    
+    def ensure_alive(self, index: int) -> bool:
+        """Restart a worker that has died; False if it had to be restarted."""
+        process = self._processes[index]
+        if process.is_alive():
+            return True
+        self.restarts[index] += 1
+        logger.error(
+            f"💥 {process.name} died (exit code {process.exitcode}); restarting it. "
+            f"Updates already queued to it are lost"
+        )
+        # Its queue may be mid-read by the dead process, so the new worker gets a new one
+        self._start_worker(index)
+        return False
+    
+    @property
+    def dead_workers(self) -> List[int]:
+        """Indexes of workers that are not running right now."""
+        return [index for index, process in enumerate(self._processes) if not process.is_alive()]
+    
+    def submit(self, index: int, data: dict):
+        """Queue an update's JSON for one worker, restarting it first if it died."""
+        self.ensure_alive(index)
+        self.dispatched[index] += 1
+        self._queues[index].put(data)
+    
+    def dispatch(self, update: Update) -> int:
+        """Send an update to the worker that owns its user and return that worker's index."""
+        index = self.route(PerUserUpdateProcessor.ordering_key(update))
+        self.submit(index, update.to_dict())
+        return index
+    
+    async def forward(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """TypeHandler callback for the front Application."""
+        self.dispatch(update)
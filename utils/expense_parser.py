@@ -0,0 +1,19 @@
+import re
+from typing import List
+
+# Shared validation rules for anything that becomes a transaction, compiled once
+AMOUNT_PATTERN = r'\d+(?:\.\d+)?'
+CATEGORY_PATTERN = r'#\w+'
+
+EXPENSE_RE = re.compile(
+    rf'^({AMOUNT_PATTERN})\s+on\s+({CATEGORY_PATTERN})(?:\s+for\s+(.+))?$', re.IGNORECASE
+)
+BUDGET_RE = re.compile(rf'^({CATEGORY_PATTERN})\s+({AMOUNT_PATTERN})$', re.IGNORECASE)
+AMOUNT_RE = re.compile(rf'^{AMOUNT_PATTERN}$')
+CATEGORY_RE = re.compile(rf'^{CATEGORY_PATTERN}$')
+# Several expenses in one /log message are separated by newlines or semicolons
+EXPENSE_SEPARATOR_RE = re.compile(r'\s*[;\n]\s*')
+
+def split_expenses(text: str) -> List[str]:
+    """Split a /log message into one entry per line or semicolon, dropping empty ones."""
+    return [entry for entry in EXPENSE_SEPARATOR_RE.split(text.strip()) if entry]
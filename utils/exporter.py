@@ -0,0 +1,57 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
+from typing import IO, List, Tuple
+from utils.money import format_amount, to_major
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_COLUMNS = ('id', 'date', 'amount', 'category', 'description', 'currency')
+
+# Exports stay in memory up to this size, then spill to a temp file on disk
+SPOOL_MAX_BYTES = 1024 * 1024
+
+class TransactionExportWriter:
+    """Encodes transaction rows incrementally into a gzip-compressed spooled temp file."""
+    
+    def __init__(self, fmt: str = 'csv'):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format '{fmt}'")
+        self.fmt = fmt
+        self.rows = 0
+        self.file: IO[bytes] = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        self._gzip = gzip.GzipFile(fileobj=self.file, mode='wb')
+        self._text = io.TextIOWrapper(self._gzip, encoding='utf-8', newline='')
+        if fmt == 'csv':
+            self._csv = csv.writer(self._text)
+            self._csv.writerow(EXPORT_COLUMNS)
+    
+    def write_rows(self, rows: List[Tuple]):
+        """Append (id, date, amount, category, description, currency) rows, amounts in minor units of their currency."""
+        if self.fmt == 'csv':
+            # Decimal text with the currency's digits, e.g. 1250 cents -> 12.50
+            self._csv.writerows(
+                (id_, date, format_amount(amount, currency), category, description, currency)
+                for id_, date, amount, category, description, currency in rows
+            )
+        else:
+            # A float's repr is the shortest text that reads back the same, so 12.5 is written as 12.5
+            self._text.writelines(
+                json.dumps(dict(zip(EXPORT_COLUMNS, (id_, date, to_major(amount, currency), category, description, currency))),
+                           ensure_ascii=False) + '\n'
+                for id_, date, amount, category, description, currency in rows
+            )
+        self.rows += len(rows)
+    
+    def finish(self) -> IO[bytes]:
+        """Flush the gzip trailer and return the compressed file positioned at the start."""
+        self._text.flush()
+        self._text.detach()
+        self._gzip.close()
+        self.file.seek(0)
+        return self.file
+    
+    @property
+    def filename_suffix(self) -> str:
+        return f'.{self.fmt}.gz'
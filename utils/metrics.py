@@ -0,0 +1,291 @@
+import functools
+import inspect
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from sub-millisecond SQLite lookups to slow chart uploads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# A collector returns (name, type, labels, value) samples when metrics are read
+Sample = Tuple[str, str, Dict[str, str], float]
+
+class Histogram:
+    """Fixed-bucket latency histogram, cheap enough to update on every call."""
+    
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+    
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+    
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+class MetricsRegistry:
+    """Histograms and counters keyed by name and labels, rendered in Prometheus text format."""
+    
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms: Dict[str, Dict[Tuple, Histogram]] = {}
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+    
+    def observe(self, name: str, seconds: float, **labels):
+        """Record one latency sample."""
+        key = tuple(labels.items())
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+    
+    def inc(self, name: str, value: float = 1, **labels):
+        """Increase a counter."""
+        key = tuple(labels.items())
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+    
+    @contextmanager
+    def time(self, name: str, **labels):
+        """Time the body of a with block, whether it raises or not."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+    
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """Register a callable whose samples are read each time metrics are rendered."""
+        self._collectors.append(collector)
+    
+    def histograms(self, name: str) -> Dict[Tuple, Histogram]:
+        """Return the histograms recorded under a name, keyed by their label tuples."""
+        with self._lock:
+            return dict(self._histograms.get(name, {}))
+    
+    def counters(self, name: str) -> Dict[Tuple, float]:
+        """Return the counters recorded under a name, keyed by their label tuples."""
+        with self._lock:
+            return dict(self._counters.get(name, {}))
+    
+    def reset(self):
+        """Forget every recorded sample; collectors stay registered."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+    
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(key + (('le', repr(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_labels(key + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{_labels(key)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_labels(key)} {histogram.count}")
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_labels(key)} {value:g}")
+        
+        typed = set()
+        for collector in self._collectors:
+            try:
+                samples = list(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector {collector!r} failed: {e}")
+                continue
+            for name, kind, labels, value in samples:
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name}{_labels(tuple(labels.items()))} {value:g}")
+        return '\n'.join(lines) + '\n'
+
+def _labels(key: Tuple) -> str:
+    if not key:
+        return ''
+    pairs = ','.join(f'{label}="{_escape(value)}"' for label, value in key)
+    return '{' + pairs + '}'
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def instrument_handler(callback: Callable, registry: Optional['MetricsRegistry'] = None,
+                       name: Optional[str] = None) -> Callable:
+    """Wrap a handler callback to record its latency and errors."""
+    registry = registry or metrics
+    name = name or getattr(callback, '__name__', 'handler')
+    
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        start = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            registry.inc('bot_handler_errors_total', handler=name)
+            raise
+        finally:
+            registry.observe('bot_handler_seconds', time.perf_counter() - start, handler=name)
+    
+    wrapper.__wrapped_handler__ = callback
+    return wrapper
+
+def instrument_application(application, registry: Optional['MetricsRegistry'] = None):
+    """Wrap every handler registered on a telegram Application."""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            if not hasattr(handler.callback, '__wrapped_handler__'):
+                handler.callback = instrument_handler(handler.callback, registry)
+
+def instrument_database(db_ops, registry: Optional['MetricsRegistry'] = None):
+    """
+    Time every public coroutine method of a DatabaseOperations instance.
+    
+    Also records how long each pooled query waited for the writer or a free reader thread.
+    """
+    registry = registry or metrics
+    for name, method in inspect.getmembers(type(db_ops), inspect.iscoroutinefunction):
+        if name.startswith('_') or name in vars(db_ops):
+            continue
+        setattr(db_ops, name, _timed_method(getattr(db_ops, name), name, registry))
+    db_ops.add_listener(
+        'pool_wait', lambda seconds, pool: registry.observe('bot_db_pool_wait_seconds', seconds, pool=pool)
+    )
+
+def _timed_method(method: Callable, name: str, registry: 'MetricsRegistry') -> Callable:
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        except Exception:
+            registry.inc('bot_db_errors_total', method=name)
+            raise
+        finally:
+            registry.observe('bot_db_call_seconds', time.perf_counter() - start, method=name)
+    return wrapper
+
+def chart_collector(chart_service, chart_cache) -> Callable[[], Iterable[Sample]]:
+    """Expose the chart render service and chart cache counters."""
+    def collect():
+        service = chart_service.metrics
+        yield ('bot_chart_renders_total', 'counter', {}, service['renders'])
+        yield ('bot_chart_rejected_total', 'counter', {}, service['rejected'])
+        yield ('bot_chart_timeouts_total', 'counter', {}, service['timeouts'])
+        yield ('bot_chart_errors_total', 'counter', {}, service['errors'])
+        yield ('bot_chart_pool_restarts_total', 'counter', {}, service['pool_restarts'])
+        yield ('bot_chart_render_seconds_total', 'counter', {}, service['render_seconds_total'])
+        yield ('bot_chart_queue_wait_seconds_total', 'counter', {}, service['queue_wait_seconds_total'])
+        yield ('bot_chart_renders_in_flight', 'gauge', {}, chart_service.in_flight)
+        
+        cache = chart_cache.stats()
+        yield ('bot_chart_cache_hits_total', 'counter', {}, cache['hits'])
+        yield ('bot_chart_cache_misses_total', 'counter', {}, cache['misses'])
+        yield ('bot_chart_cache_evictions_total', 'counter', {}, cache['evictions'])
+        yield ('bot_chart_cache_entries', 'gauge', {}, cache['entries'])
+        yield ('bot_chart_cache_bytes', 'gauge', {}, cache['size_bytes'])
+        yield ('bot_chart_cache_disk_bytes', 'gauge', {}, cache['disk_size_bytes'])
+        yield ('bot_chart_cache_disk_evictions_total', 'counter', {}, cache['disk_evictions'])
+    return collect
+
+def worker_collector(restarts) -> Callable[[], Iterable[Sample]]:
+    """Expose how often each shard worker had to be restarted."""
+    def collect():
+        for index, count in enumerate(list(restarts)):
+            yield ('bot_worker_restarts_total', 'counter', {'worker': str(index + 1)}, count)
+    return collect
+
+def user_cache_collector(user_cache) -> Callable[[], Iterable[Sample]]:
+    """Expose the user cache counters."""
+    def collect():
+        stats = user_cache.stats()
+        yield ('bot_user_cache_hits_total', 'counter', {}, stats['hits'])
+        yield ('bot_user_cache_misses_total', 'counter', {}, stats['misses'])
+        yield ('bot_user_cache_evictions_total', 'counter', {}, stats['evictions'])
+        yield ('bot_user_cache_entries', 'gauge', {}, stats['entries'])
+    return collect
+
+def admission_collector(admission) -> Callable[[], Iterable[Sample]]:
+    """Expose the admission controller counters."""
+    def collect():
+        stats = admission.stats()
+        yield ('bot_admission_admitted_total', 'counter', {}, stats['admitted'])
+        yield ('bot_admission_rejected_total', 'counter', {}, stats['rejected'])
+        yield ('bot_admission_busy_total', 'counter', {}, stats['busy'])
+        yield ('bot_admission_tracked_users', 'gauge', {}, stats['tracked_users'])
+        yield ('bot_admission_expensive_running', 'gauge', {}, stats['expensive_running'])
+    return collect
+
+def analytics_collector(analytics_cache) -> Callable[[], Iterable[Sample]]:
+    """Expose the per-user analytics cache counters."""
+    def collect():
+        stats = analytics_cache.stats()
+        yield ('bot_analytics_cache_hits_total', 'counter', {}, stats['hits'])
+        yield ('bot_analytics_cache_misses_total', 'counter', {}, stats['misses'])
+        yield ('bot_analytics_cache_evictions_total', 'counter', {}, stats['evictions'])
+        yield ('bot_analytics_cache_users', 'gauge', {}, stats['users'])
+        yield ('bot_analytics_cache_bytes', 'gauge', {}, stats['size_bytes'])
+    return collect
+
+def start_metrics_server(port: int, host: str = '127.0.0.1',
+                         registry: Optional['MetricsRegistry'] = None):
+    """Serve GET /metrics in Prometheus text format from a daemon thread and return the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    registry = registry or metrics
+    
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would drown out the bot's own logging
+            pass
+    
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True)
+    thread.start()
+    logger.info(f"📈 Metrics available at http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+# Global instance
+metrics = MetricsRegistry()
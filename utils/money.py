@@ -0,0 +1,83 @@
+import logging
+import math
+from typing import Dict, Hashable, Iterable, Tuple
+from config import CURRENCY_EXPONENTS, DEFAULT_CURRENCY_EXPONENT
+from utils.expense_parser import AMOUNT_RE
+
+logger = logging.getLogger(__name__)
+
+# Currency pairs already warned about, so a missing rate is logged once per process
+_missing_rates = set()
+
+def currency_exponent(currency: str) -> int:
+    """Digits after the decimal point in a currency, e.g. 2 for USD and 0 for JPY."""
+    return CURRENCY_EXPONENTS.get((currency or '').upper(), DEFAULT_CURRENCY_EXPONENT)
+
+def parse_amount(text: str, currency: str) -> int:
+    """
+    Convert a typed amount such as '12.5' to integer minor units of a currency.
+    
+    Works on the digits directly, so no amount ever passes through a float.
+    Digits beyond the currency's exponent are rounded half up. Raises
+    ValueError for anything that isn't a plain non-negative decimal number.
+    """
+    if not AMOUNT_RE.match(text):
+        raise ValueError(f"invalid amount '{text}'")
+    exponent = currency_exponent(currency)
+    whole, _, fraction = text.partition('.')
+    fraction = fraction.ljust(exponent + 1, '0')
+    minor = int(whole + fraction[:exponent])
+    return minor + 1 if fraction[exponent] >= '5' else minor
+
+def format_amount(minor: int, currency: str) -> str:
+    """Minor units as a decimal string with the currency's digits, e.g. 1250 USD -> '12.50'."""
+    exponent = currency_exponent(currency)
+    sign = '-' if minor < 0 else ''
+    whole, fraction = divmod(abs(int(minor)), 10 ** exponent)
+    return f'{sign}{whole}.{fraction:0{exponent}d}' if exponent else f'{sign}{whole}'
+
+def to_major(minor: int, currency: str) -> float:
+    """Minor units as a float in whole units, for JSON and charts; never for storage or sums."""
+    return minor / 10 ** currency_exponent(currency)
+
+def conversion_factor(from_currency: str, to_currency: str, rates: Dict[str, float]) -> float:
+    """
+    Multiplier from minor units of one currency to minor units of another.
+    
+    rates maps currency codes to units per one unit of a common base, as
+    loaded by database.exchange_rates. Without a rate for either side the
+    amount is taken at face value (only the decimals are adjusted) and a
+    warning is logged.
+    """
+    from_currency, to_currency = from_currency.upper(), to_currency.upper()
+    scale = 10.0 ** (currency_exponent(to_currency) - currency_exponent(from_currency))
+    if from_currency == to_currency:
+        return 1.0
+    if from_currency not in rates or to_currency not in rates:
+        if (from_currency, to_currency) not in _missing_rates:
+            _missing_rates.add((from_currency, to_currency))
+            logger.warning(f"No exchange rate for {from_currency} -> {to_currency}; counting amounts at face value")
+        return scale
+    return scale * rates[to_currency] / rates[from_currency]
+
+def convert_totals(totals: Iterable[Tuple[Hashable, str, int]], to_currency: str,
+                   rates: Dict[str, float]) -> Dict[Hashable, int]:
+    """
+    Add up (key, currency, minor units) totals in to_currency, per key.
+    
+    Meant for sums already grouped by currency: amounts in to_currency stay
+    exact integers, the rest are converted per group and rounded half up
+    once per key.
+    """
+    exact: Dict[Hashable, int] = {}
+    converted: Dict[Hashable, float] = {}
+    factors: Dict[str, float] = {}
+    for key, currency, minor in totals:
+        exact.setdefault(key, 0)
+        if currency == to_currency:
+            exact[key] += minor
+            continue
+        if currency not in factors:
+            factors[currency] = conversion_factor(currency, to_currency, rates)
+        converted[key] = converted.get(key, 0.0) + minor * factors[currency]
+    return {key: total + math.floor(converted.get(key, 0.0) + 0.5) for key, total in exact.items()}
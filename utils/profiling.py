@@ -0,0 +1,165 @@
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Optional
+from config import (
+    PROFILE_SAMPLE_RATE, PROFILE_DIR, PROFILE_MAX_FILES, PROFILE_MIN_MS,
+    PROFILE_TRACEMALLOC, PROFILE_TOP_ALLOCATIONS
+)
+
+logger = logging.getLogger(__name__)
+
+SAFE_TAG = re.compile(r'[^A-Za-z0-9_.-]+')
+
+class SamplingProfiler:
+    """
+    Profiles a random fraction of calls under cProfile and tracemalloc.
+    
+    Each sampled call leaves two files in the output directory, named after
+    its tag and duration: a .prof file for pstats/snakeviz and a .txt report
+    with the hottest functions and top allocation sites. Only the newest
+    max_files reports are kept.
+    
+    cProfile follows the thread that enabled it, so a sampled handler shows
+    everything the event loop ran meanwhile but not the SQL on pool threads;
+    chart renders are sampled separately inside the worker processes.
+    """
+    
+    def __init__(self, sample_rate: float = PROFILE_SAMPLE_RATE, directory: str = PROFILE_DIR,
+                 max_files: int = PROFILE_MAX_FILES, min_ms: float = PROFILE_MIN_MS,
+                 trace_memory: bool = PROFILE_TRACEMALLOC, top_allocations: int = PROFILE_TOP_ALLOCATIONS):
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.max_files = max_files
+        self.min_ms = min_ms
+        self.trace_memory = trace_memory
+        self.top_allocations = top_allocations
+        self._active = False
+        self._lock = threading.Lock()
+        self.samples = 0
+        self.dumps = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+    
+    def _acquire(self) -> bool:
+        """Decide whether to sample this call; only one profile runs at a time per process."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return False
+        with self._lock:
+            if self._active:
+                return False
+            self._active = True
+            return True
+    
+    @contextmanager
+    def sample(self, tag: str):
+        """Profile the body of a with block if this call is picked for sampling."""
+        if not self._acquire():
+            yield
+            return
+        
+        self.samples += 1
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        profile = cProfile.Profile()
+        started_at = datetime.now()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            try:
+                snapshot = tracemalloc.take_snapshot() if self.trace_memory and tracemalloc.is_tracing() else None
+                peak = tracemalloc.get_traced_memory()[1] if snapshot is not None else 0
+                if started_tracing:
+                    tracemalloc.stop()
+                if elapsed_ms >= self.min_ms:
+                    self._dump(tag, started_at, elapsed_ms, profile, snapshot, peak)
+            except Exception as e:
+                logger.warning(f"Could not write profile for {tag}: {e}")
+            finally:
+                with self._lock:
+                    self._active = False
+    
+    def wrap(self, callback: Callable, tag: Optional[str] = None) -> Callable:
+        """Wrap an async handler so a sample of its invocations is profiled."""
+        tag = tag or getattr(callback, '__name__', 'handler')
+        
+        @functools.wraps(callback)
+        async def wrapper(update, context):
+            with self.sample(tag):
+                return await callback(update, context)
+        
+        wrapper.__profiled_handler__ = callback
+        return wrapper
+    
+    def _dump(self, tag: str, started_at: datetime, elapsed_ms: float, profile: cProfile.Profile,
+              snapshot: Optional[tracemalloc.Snapshot], peak: int):
+        """Write the .prof and .txt report for one sampled call, then rotate old ones out."""
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(
+            self.directory,
+            f"{started_at:%Y%m%d-%H%M%S-%f}-{SAFE_TAG.sub('_', tag)}-{elapsed_ms:.0f}ms-{os.getpid()}"
+        )
+        profile.dump_stats(base + '.prof')
+        
+        stats_text = io.StringIO()
+        stats = pstats.Stats(profile, stream=stats_text)
+        stats.sort_stats('cumulative').print_stats(30)
+        
+        with open(base + '.txt', 'w', encoding='utf-8') as report:
+            report.write(f"tag: {tag}\n")
+            report.write(f"started: {started_at.isoformat()}\n")
+            report.write(f"elapsed_ms: {elapsed_ms:.1f}\n")
+            report.write(f"pid: {os.getpid()}\n")
+            if snapshot is not None:
+                report.write(f"traced_peak_bytes: {peak}\n")
+                report.write(f"\nTop {self.top_allocations} allocation sites still held at the end of the call:\n")
+                for stat in snapshot.statistics('lineno')[:self.top_allocations]:
+                    frame = stat.traceback[0]
+                    report.write(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {frame.filename}:{frame.lineno}\n")
+            report.write("\n")
+            report.write(stats_text.getvalue())
+        
+        self.dumps += 1
+        logger.info(f"🔬 Profiled {tag} ({elapsed_ms:.0f}ms) -> {base}.prof")
+        self._rotate()
+    
+    def _rotate(self):
+        """Delete the oldest reports beyond max_files."""
+        reports = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.prof')),
+            key=lambda entry: entry.name
+        )
+        for entry in reports[:max(len(reports) - self.max_files, 0)]:
+            for path in (entry.path, entry.path[:-len('.prof')] + '.txt'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+def profile_application(application, profiler: Optional[SamplingProfiler] = None):
+    """Wrap every handler registered on a telegram Application with the sampling profiler."""
+    profiler = profiler or handler_profiler
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            if not hasattr(handler.callback, '__profiled_handler__'):
+                handler.callback = profiler.wrap(handler.callback)
+
+# Global instance
+handler_profiler = SamplingProfiler()
@@ -0,0 +1,71 @@
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+READY_MARKER = 'STARTUP_READY'
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Parse `python -X importtime` output into per-module timings in milliseconds."""
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        modules.append({
+            'module': match.group(4),
+            'self_ms': int(match.group(1)) / 1000,
+            'cumulative_ms': int(match.group(2)) / 1000,
+            'depth': (len(match.group(3)) - 1) // 2
+        })
+    return modules
+
+def profile_startup(script: str, top: int = 20) -> int:
+    """
+    Start the bot in probe mode under -X importtime and report where startup time goes.
+    
+    The probe performs every startup step up to the point where polling would
+    begin, prints READY_MARKER with the elapsed time, and exits.
+    """
+    command = [sys.executable, '-X', 'importtime', script, '--startup-probe']
+    start = time.perf_counter()
+    proc = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(script)))
+    wall_ms = (time.perf_counter() - start) * 1000
+    
+    ready_ms = None
+    loaded = ''
+    for line in proc.stdout.splitlines():
+        if line.startswith(READY_MARKER):
+            fields = line.split()
+            ready_ms = float(fields[1])
+            loaded = ' '.join(fields[2:])
+    if proc.returncode != 0 or ready_ms is None:
+        print(proc.stdout)
+        print(proc.stderr, file=sys.stderr)
+        print("❌ Startup probe failed")
+        return 1
+    
+    modules = parse_importtime(proc.stderr)
+    slowest = sorted(modules, key=lambda m: m['self_ms'], reverse=True)[:top]
+    top_level = sorted((m for m in modules if m['depth'] == 0), key=lambda m: m['cumulative_ms'], reverse=True)[:top]
+    
+    print("⏱️  Startup profile")
+    print("=" * 60)
+    print(f"{'top-level import':<40} {'cumulative ms':>15}")
+    for m in top_level:
+        print(f"{m['module']:<40} {m['cumulative_ms']:>15.1f}")
+    print()
+    print(f"{'module (self time)':<40} {'self ms':>15}")
+    for m in slowest:
+        print(f"{m['module']:<40} {m['self_ms']:>15.1f}")
+    print()
+    print(f"Modules imported:        {len(modules)}")
+    print(f"Import time (total):     {sum(m['self_ms'] for m in modules):.1f} ms")
+    print(f"main.py until polling:   {ready_ms:.1f} ms")
+    print(f"Process start to ready:  {wall_ms:.1f} ms")
+    if loaded:
+        print(f"Heavy modules loaded:    {loaded}")
+    return 0
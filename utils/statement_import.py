@@ -0,0 +1,105 @@
+import csv
+from datetime import datetime, tzinfo
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+from utils.expense_parser import CATEGORY_RE
+from utils.money import parse_amount
+
+# Header names accepted for each field, compared case-insensitively
+COLUMN_ALIASES = {
+    'amount': ('amount', 'debit', 'withdrawal', 'value', 'spent'),
+    'category': ('category', 'tag', 'type'),
+    'description': ('description', 'narration', 'details', 'memo', 'payee', 'note'),
+    'date': ('date', 'transaction date', 'posted', 'posting date', 'value date')
+}
+
+DATE_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d',
+    '%d/%m/%Y',
+    '%d-%m-%Y',
+    '%d.%m.%Y',
+    '%d %b %Y'
+)
+
+DEFAULT_CATEGORY = '#imported'
+
+ParsedRow = Tuple[int, str, Optional[str], Optional[datetime]]
+
+class StatementFormatError(Exception):
+    """Raised when a CSV has no usable header."""
+
+def map_columns(header: List[str]) -> Dict[str, int]:
+    """Map field names to column indexes using COLUMN_ALIASES."""
+    normalized = [name.strip().lower() for name in header]
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in normalized:
+                columns[field] = normalized.index(alias)
+                break
+    if 'amount' not in columns:
+        raise StatementFormatError(
+            "No amount column found. Expected a header such as: date, amount, category, description"
+        )
+    return columns
+
+def parse_date(value: str) -> datetime:
+    """Parse a statement date in any of DATE_FORMATS."""
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised date '{value}'")
+
+def parse_row(row: List[str], columns: Dict[str, int], currency: str, tz: Optional[tzinfo] = None) -> ParsedRow:
+    """
+    Validate one CSV row with the same rules /log applies to typed expenses; amounts become minor units.
+    
+    Dates are wall time in tz, the user's zone, as /export writes them.
+    """
+    def field(name: str) -> str:
+        index = columns.get(name)
+        return row[index].strip() if index is not None and index < len(row) else ''
+    
+    try:
+        amount = parse_amount(field('amount').replace(',', ''), currency)
+    except ValueError:
+        raise ValueError(f"invalid amount '{field('amount')}'")
+    if amount <= 0:
+        raise ValueError("amount must be greater than 0")
+    
+    category = field('category').lower() or DEFAULT_CATEGORY
+    if not category.startswith('#'):
+        category = f'#{category}'
+    if not CATEGORY_RE.match(category):
+        raise ValueError(f"invalid category '{field('category')}'")
+    
+    description = field('description') or None
+    date_text = field('date')
+    transaction_date = parse_date(date_text).replace(tzinfo=tz) if date_text else None
+    return amount, category, description, transaction_date
+
+def iter_statement(stream: TextIO, currency: str,
+                   tz: Optional[tzinfo] = None) -> Iterator[Tuple[int, Optional[ParsedRow], Optional[str]]]:
+    """
+    Stream a CSV statement one row at a time.
+    
+    Yields (line number, parsed row, None) for valid rows and
+    (line number, None, error) for rows that fail validation.
+    """
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        raise StatementFormatError("The file is empty")
+    columns = map_columns(header)
+    
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        try:
+            yield reader.line_num, parse_row(row, columns, currency, tz), None
+        except ValueError as e:
+            yield reader.line_num, None, str(e)
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Awaitable, Dict, Optional
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processes updates concurrently across users but strictly in order for each user.
+    
+    Different users' updates run side by side, up to max_concurrent_updates at
+    once, while one user's /log and /delete still run one after another in
+    the order Telegram delivered them. An update waits for its user's turn
+    before it takes a concurrency slot, so a burst from one user queues
+    behind that user alone instead of holding slots everyone else needs.
+    """
+    
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._waiting: Dict[int, int] = {}
+    
+    @staticmethod
+    def ordering_key(update: object) -> Optional[int]:
+        """The user (or chat, for updates without a user) whose updates must stay in order."""
+        if isinstance(update, Update):
+            if update.effective_user is not None:
+                return update.effective_user.id
+            if update.effective_chat is not None:
+                return update.effective_chat.id
+        return None
+    
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        # Overrides the base class, which takes the semaphore first and only then calls do_process_update
+        key = self.ordering_key(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+        
+        # asyncio.Lock wakes waiters first-in, first-out, so arrival order is kept
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        try:
+            async with lock:
+                await super().process_update(update, coroutine)
+        finally:
+            self._waiting[key] -= 1
+            if not self._waiting[key]:
+                # Nobody else queued for this user: drop the lock so idle users cost nothing
+                del self._waiting[key]
+                del self._locks[key]
+    
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await coroutine
+    
+    @property
+    def active_users(self) -> int:
+        """Users with an update running or waiting."""
+        return len(self._locks)
+    
+    async def initialize(self) -> None:
+        pass
+    
+    async def shutdown(self) -> None:
+        pass